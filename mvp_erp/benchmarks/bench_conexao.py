@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Benchmark de latência por chamada: conexão nova a cada consulta (modelo
+antigo) versus a conexão persistente com PRAGMAs de database.py.
+
+Uso:
+    python3 mvp_erp/benchmarks/bench_conexao.py [--chamadas N]
+
+Roda sobre um banco temporário; o banco de produção não é tocado.
+"""
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+from services.operacoes import cadastrar_empresa, registrar_operacao, buscar_operacao
+
+
+def _medir(funcao, chamadas: int) -> float:
+    """Retorna a latência média por chamada em microssegundos."""
+    inicio = time.perf_counter()
+    for i in range(chamadas):
+        funcao(i)
+    return (time.perf_counter() - inicio) / chamadas * 1e6
+
+
+def _leitura_antiga(caminho: str, operacao_id: int):
+    """Replica o padrão anterior: connect, consulta, close."""
+    conn = sqlite3.connect(caminho)
+    conn.row_factory = sqlite3.Row
+    conn.execute('''
+        SELECT o.*, e.nome as empresa_nome
+        FROM operacoes o
+        JOIN empresas e ON o.empresa_id = e.id
+        WHERE o.id = ?
+    ''', (operacao_id,)).fetchone()
+    conn.close()
+
+
+def _escrita_antiga(caminho: str, empresa_id: int):
+    """Replica o padrão anterior: connect, insert, commit, close."""
+    conn = sqlite3.connect(caminho)
+    conn.execute('''
+        INSERT INTO operacoes
+        (tipo, empresa_id, valor, prazo_dias, data_operacao, data_vencimento)
+        VALUES ('COMPRA', ?, 100.0, 7, '2026-01-01', '2026-01-08')
+    ''', (empresa_id,))
+    conn.commit()
+    conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--chamadas', type=int, default=2000)
+    args = parser.parse_args()
+    n = args.chamadas
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # Banco "antigo": journal padrão (DELETE), sem PRAGMAs
+        caminho_antigo = os.path.join(tmp, 'antigo.db')
+        database.DB_PATH = caminho_antigo
+        database.configurar_pragmas(journal_mode='DELETE', synchronous='FULL')
+        database.init_db()
+        empresa_id = cadastrar_empresa('BENCH')
+        database.fechar_conexao()
+
+        escrita_antes = _medir(lambda i: _escrita_antiga(caminho_antigo, empresa_id), n)
+        leitura_antes = _medir(lambda i: _leitura_antiga(caminho_antigo, i % n + 1), n)
+
+        # Banco "novo": conexão persistente com os PRAGMAs padrão
+        database.configurar_pragmas(journal_mode='WAL', synchronous='NORMAL')
+        database.DB_PATH = os.path.join(tmp, 'novo.db')
+        database.init_db()
+        empresa_id = cadastrar_empresa('BENCH')
+
+        escrita_depois = _medir(
+            lambda i: registrar_operacao('COMPRA', empresa_id, 100.0), n)
+        leitura_depois = _medir(lambda i: buscar_operacao(i % n + 1), n)
+        database.fechar_conexao()
+
+    print(f"{'CHAMADA':<22} {'ANTES (us)':>12} {'DEPOIS (us)':>12} {'GANHO':>8}")
+    print("-" * 57)
+    for nome, antes, depois in (
+        ('buscar_operacao', leitura_antes, leitura_depois),
+        ('registrar_operacao', escrita_antes, escrita_depois),
+    ):
+        print(f"{nome:<22} {antes:>12.1f} {depois:>12.1f} {antes / depois:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Benchmark de construção e memória dos modelos: dataclass comum com
+leitura das colunas por nome (modelo antigo) versus dataclass com
+__slots__ e mapeamento por posição (models.operacao_de_linha).
+
+Uso:
+    python3 mvp_erp/benchmarks/bench_modelos.py [--linhas N]
+
+Roda sobre um banco temporário; o banco de produção não é tocado.
+"""
+import argparse
+import dataclasses
+import gc
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+from models import Operacao, operacao_de_linha
+from services.operacoes import _select_operacao
+
+# Mesmo conjunto de campos de Operacao, sem __slots__ (como antes)
+OperacaoSemSlots = dataclasses.make_dataclass(
+    'OperacaoSemSlots',
+    [(f.name, f.type, dataclasses.field(default=f.default))
+     for f in dataclasses.fields(Operacao)],
+)
+
+
+def _por_nome(row):
+    """Mapeamento antigo: um acesso por nome de coluna em cada campo."""
+    return OperacaoSemSlots(
+        id=row['id'],
+        tipo=row['tipo'],
+        empresa_id=row['empresa_id'],
+        descricao=row['descricao'],
+        valor=row['valor'],
+        prazo_dias=row['prazo_dias'],
+        data_operacao=row['data_operacao'],
+        data_vencimento=row['data_vencimento'],
+        data_liquidacao=row['data_liquidacao'],
+        status=row['status'],
+        observacao=row['observacao'],
+        criado_em=row['criado_em'],
+        empresa_nome=row['empresa_nome']
+    )
+
+
+def _popular(linhas: int):
+    """Insere `linhas` operações diretamente, em uma transação."""
+    hoje = date.today()
+    with database.transacao() as conn:
+        conn.execute("INSERT INTO empresas (nome) VALUES ('BENCH')")
+        conn.executemany('''
+            INSERT INTO operacoes
+            (tipo, empresa_id, descricao, valor, prazo_dias, data_operacao, data_vencimento)
+            VALUES (?, 1, ?, ?, 7, ?, ?)
+        ''', (
+            ('COMPRA' if i % 2 else 'VENDA', f'lote {i}', 100.0 + i,
+             (hoje - timedelta(days=i % 365)).isoformat(),
+             (hoje - timedelta(days=i % 365 - 7)).isoformat())
+            for i in range(linhas)
+        ))
+
+
+def _medir(mapeador, rows) -> tuple:
+    """Retorna (segundos para construir, bytes alocados pelos objetos)."""
+    gc.collect()
+    tracemalloc.start()
+    inicio = time.perf_counter()
+    objetos = [mapeador(row) for row in rows]
+    segundos = time.perf_counter() - inicio
+    memoria, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del objetos
+    return segundos, memoria
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--linhas', type=int, default=100_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_PATH = os.path.join(tmp, 'modelos.db')
+        database.init_db()
+        _popular(args.linhas)
+        rows = database.get_connection().execute(_select_operacao()).fetchall()
+        database.fechar_conexao()
+
+    t_antes, m_antes = _medir(_por_nome, rows)
+    t_depois, m_depois = _medir(operacao_de_linha, rows)
+
+    n = len(rows)
+    print(f"{n} operações")
+    print(f"{'':<22} {'ANTES':>12} {'DEPOIS':>12}")
+    print("-" * 48)
+    print(f"{'construção (ms)':<22} {t_antes * 1000:>12.1f} {t_depois * 1000:>12.1f}")
+    print(f"{'memória total (MB)':<22} {m_antes / 2**20:>12.1f} {m_depois / 2**20:>12.1f}")
+    print(f"{'bytes por objeto':<22} {m_antes / n:>12.0f} {m_depois / n:>12.0f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Benchmark do desenho de uma tabela de operações: datas como texto ISO
+reconvertidas com strptime em cada célula (modelo antigo) versus datas
+decodificadas uma vez pelo banco (detect_types) e formatadores memorizados
+(utils.helpers.formatar_data / formatar_moeda). Mede também a escrita de
+uma página: um print() por linha versus a tabela montada por
+utils.render.tabela e escrita de uma vez.
+
+Uso:
+    python3 mvp_erp/benchmarks/bench_render.py [--linhas N]
+
+Roda sobre um banco temporário gerado por benchmarks/dados.py; o banco de
+produção não é tocado. Nos desenhos a saída das linhas é descartada (mede
+só a montagem do texto); na escrita as páginas vão para os.devnull com
+buffer de linha, como o stdout de um terminal.
+"""
+import argparse
+import contextlib
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+from benchmarks.dados import gerar_dados
+from models import VISAO_LISTA, operacao_de_linha
+from services.operacoes import _nao_lidas_operacao, _select_operacao
+from utils import helpers
+from utils.render import Coluna, tabela
+
+# Linhas por página na medição da escrita (como menu.LINHAS_POR_PAGINA)
+LINHAS_PAGINA = 20
+
+COLUNAS = [Coluna("ID", 5), Coluna("TIPO", 7), Coluna("EMPRESA", 20, flexivel=True),
+           Coluna("VALOR", 15, '>', helpers.formatar_moeda),
+           Coluna("VENCIMENTO", 12, formato=helpers.formatar_data), Coluna("STATUS", 10)]
+
+
+def _moeda_antiga(valor: float) -> str:
+    return f"R$ {valor:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+
+
+def _data_antiga(data) -> str:
+    """formatar_data antes dos conversores: texto ISO reconvertido a cada chamada."""
+    if data is None:
+        return "-"
+    if isinstance(data, str):
+        try:
+            data = datetime.strptime(data, "%Y-%m-%d").date()
+        except ValueError:
+            return data
+    return data.strftime("%d/%m/%Y")
+
+
+def _linha(op, moeda, data) -> str:
+    """Mesma linha de tela_listar_operacoes."""
+    return (f"{op.id:<5} {op.tipo:<7} {op.empresa_nome[:20]:<20} "
+            f"{moeda(op.valor):>15} {data(op.data_vencimento):<12} {op.status:<10}")
+
+
+def _ler(conn) -> list:
+    """Lê e mapeia todas as operações (visão de listagem) com a conexão dada."""
+    cursor = conn.execute(_select_operacao(visao=VISAO_LISTA)
+                          + ' ORDER BY o.data_vencimento, o.id')
+    nao_lidas = _nao_lidas_operacao(VISAO_LISTA)
+    return [operacao_de_linha(row, nao_lidas) for row in cursor]
+
+
+def _medir(ler, moeda, data) -> tuple:
+    """Retorna (segundos lendo, segundos no 1º desenho, segundos redesenhando)."""
+    inicio = time.perf_counter()
+    operacoes = ler()
+    leitura = time.perf_counter() - inicio
+
+    desenhos = []
+    for _ in range(2):
+        inicio = time.perf_counter()
+        for op in operacoes:
+            _linha(op, moeda, data)
+        desenhos.append(time.perf_counter() - inicio)
+    return leitura, desenhos[0], desenhos[1]
+
+
+def _escrever_paginas(operacoes, buffer: bool) -> float:
+    """Segundos escrevendo todas as páginas, linha a linha ou de uma vez."""
+    # Com buffer de linha, como o stdout de um terminal: uma escrita por '\n'
+    with open(os.devnull, 'w', buffering=1, encoding='utf-8') as saida, \
+            contextlib.redirect_stdout(saida):
+        inicio = time.perf_counter()
+        for i in range(0, len(operacoes), LINHAS_PAGINA):
+            pagina = operacoes[i:i + LINHAS_PAGINA]
+            if buffer:
+                saida.write(tabela(COLUNAS, ((op.id, op.tipo, op.empresa_nome, op.valor,
+                                              op.data_vencimento, op.status) for op in pagina),
+                                   largura_maxima=80) + "\n")
+                saida.flush()
+            else:
+                print(f"{'ID':<5} {'TIPO':<7} {'EMPRESA':<20} {'VALOR':>15} {'VENCIMENTO':<12} {'STATUS':<10}")
+                print("-" * 74)
+                for op in pagina:
+                    print(_linha(op, helpers.formatar_moeda, helpers.formatar_data))
+                print("-" * 74)
+        return time.perf_counter() - inicio
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--linhas', type=int, default=100_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_PATH = os.path.join(tmp, 'render.db')
+        gerar_dados(args.linhas)
+
+        # Antes: conexão sem detect_types, datas chegam como texto
+        texto = sqlite3.connect(database.DB_PATH)
+        texto.row_factory = sqlite3.Row
+        antes = _medir(lambda: _ler(texto), _moeda_antiga, _data_antiga)
+        texto.close()
+
+        helpers.formatar_data.cache_clear()
+        helpers.formatar_moeda.cache_clear()
+        depois = _medir(lambda: _ler(database.get_connection()),
+                        helpers.formatar_moeda, helpers.formatar_data)
+        operacoes = _ler(database.get_connection())
+        escrita = (_escrever_paginas(operacoes, buffer=False),
+                   _escrever_paginas(operacoes, buffer=True))
+        database.fechar_conexao()
+
+    print(f"{args.linhas} operações")
+    print(f"{'':<22} {'ANTES':>12} {'DEPOIS':>12}")
+    print("-" * 48)
+    for nome, a, d in zip(('leitura (ms)', '1º desenho (ms)', 'redesenho (ms)'),
+                          antes, depois):
+        print(f"{nome:<22} {a * 1000:>12.1f} {d * 1000:>12.1f}")
+    total_antes, total_depois = sum(antes[:2]), sum(depois[:2])
+    print(f"{'leitura + desenho (ms)':<22} {total_antes * 1000:>12.1f} {total_depois * 1000:>12.1f}")
+    print(f"{'escrita páginas (ms)':<22} {escrita[0] * 1000:>12.1f} {escrita[1] * 1000:>12.1f}"
+          "   (print por linha / buffer único)")
+
+
+if __name__ == '__main__':
+    main()
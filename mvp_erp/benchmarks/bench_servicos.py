@@ -0,0 +1,341 @@
+#!/usr/bin/env python3
+"""
+Benchmark de todas as funções públicas de services/ sobre dados sintéticos.
+
+Gera (ou copia) um banco com benchmarks/dados.py, mede cada chamada e
+grava um JSON com chamadas, ops/s, p50/p99 (ms) e pico de memória (KiB)
+por função. Com --baseline, compara com um JSON anterior e termina com
+código 1 se alguma função ficou mais lenta que a tolerância.
+
+Uso:
+    python3 mvp_erp/benchmarks/bench_servicos.py --escala 100k --saida atual.json
+    python3 mvp_erp/benchmarks/bench_servicos.py --escala 100k --baseline base.json
+
+Roda sobre um banco temporário; o banco de produção não é tocado.
+"""
+import argparse
+import csv
+import inspect
+import json
+import os
+import platform
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import date, datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+from benchmarks.dados import ESCALAS, gerar_dados
+from services import (
+    arquivamento, busca, exportacao, financeiro, importacao, operacoes, pedidos, projecao
+)
+
+MODULOS = (operacoes, financeiro, pedidos, importacao, exportacao, projecao, busca,
+           arquivamento)
+
+# Tempo máximo medindo cada função (a função roda ao menos uma vez)
+ORCAMENTO_SEGUNDOS = 2.0
+
+# Linhas por chamada de importar_operacoes / importar_operacoes_csv
+LINHAS_IMPORTACAO = 1000
+
+# Ids por chamada de liquidar_operacoes / cancelar_operacoes
+LOTE_OPERACOES = 50
+
+
+def _consumir(resultado):
+    """Esgota geradores para que o tempo inclua a leitura de todas as linhas."""
+    if inspect.isgenerator(resultado):
+        for _ in resultado:
+            pass
+
+
+def _ids(sql: str) -> list:
+    return [linha[0] for linha in database.get_connection().execute(sql)]
+
+
+def _casos(tmp: str) -> list:
+    """
+    Retorna [(nome, chamada)], onde chamada(i) executa a função pela i-ésima vez.
+    Leituras vêm antes das escritas, para que as escritas não invalidem os
+    caches medidos; as escritas consomem ids de pools lidos do banco.
+    """
+    hoje = date.today()
+    empresa = operacoes.listar_empresas()[0]
+    ultima_operacao = _ids('SELECT MAX(id) FROM operacoes')[0]
+    ultimo_pedido = _ids('SELECT MAX(id) FROM pedidos')[0]
+    abertas = _ids("SELECT id FROM operacoes WHERE status = 'ABERTO' ORDER BY id")
+    pedidos_abertos = _ids("SELECT id FROM pedidos WHERE status = 'ABERTO' ORDER BY id")
+
+    def proximo(pool):
+        """Consome o pool; esgotado, repete o último id (a chamada vira no-op)."""
+        return lambda i: pool[i] if i < len(pool) else pool[-1]
+
+    def lotes(pool, tamanho=LOTE_OPERACOES):
+        """Fatias de `tamanho` ids do pool; esgotado, repete a última."""
+        fatias = [pool[n:n + tamanho] for n in range(0, len(pool), tamanho)] or [[]]
+        return lambda i: fatias[min(i, len(fatias) - 1)]
+
+    liquidar = proximo(abertas[0::4])
+    cancelar = proximo(abertas[1::4])
+    liquidar_lote = lotes(abertas[2::4])
+    cancelar_lote = lotes(abertas[3::4])
+    baixar = proximo(pedidos_abertos or [ultimo_pedido])
+
+    linhas_importacao = [
+        {'tipo': 'VENDA', 'empresa': empresa.nome, 'valor': '1.234,56',
+         'prazo_dias': '30', 'descricao': f'importado {n}'}
+        for n in range(LINHAS_IMPORTACAO)
+    ]
+    arquivo_csv = os.path.join(tmp, 'importacao.csv')
+    with open(arquivo_csv, 'w', newline='', encoding='utf-8') as arquivo:
+        escritor = csv.DictWriter(arquivo, fieldnames=list(linhas_importacao[0]),
+                                  delimiter=';')
+        escritor.writeheader()
+        escritor.writerows(linhas_importacao)
+
+    novas_empresas = []
+    itens = [{'tipo_embalagem': 'FARDO_30x1', 'quantidade': 50.0,
+              'peso_por_unidade': 30.0, 'preco_unitario': 1.5, 'icms': True}] * 5
+
+    def nova_empresa(i):
+        """Empresas do caso cadastrar_empresa; sem ele (--filtro), cria uma."""
+        if not novas_empresas:
+            novas_empresas.append(operacoes.cadastrar_empresa('BENCH DESATIVAR'))
+        return novas_empresas[i % len(novas_empresas)]
+
+    return [
+        # operacoes
+        ('operacoes.estatisticas_cache_empresas',
+         lambda i: operacoes.estatisticas_cache_empresas()),
+        ('operacoes.listar_empresas', lambda i: operacoes.listar_empresas()),
+        ('operacoes.buscar_empresa', lambda i: operacoes.buscar_empresa(empresa.id)),
+        ('operacoes.buscar_empresa_por_nome',
+         lambda i: operacoes.buscar_empresa_por_nome(empresa.nome)),
+        ('operacoes.pesquisar_empresas', lambda i: operacoes.pesquisar_empresas('SILVA')),
+        ('operacoes.buscar_operacao',
+         lambda i: operacoes.buscar_operacao(i % ultima_operacao + 1)),
+        ('operacoes.paginar_operacoes',
+         lambda i: operacoes.paginar_operacoes(status='ABERTO')),
+        ('operacoes.iterar_operacoes',
+         lambda i: operacoes.iterar_operacoes(status='ABERTO')),
+        ('operacoes.listar_operacoes',
+         lambda i: operacoes.listar_operacoes(empresa_id=empresa.id)),
+        # financeiro
+        ('financeiro.resumo_financeiro', lambda i: financeiro.resumo_financeiro()),
+        ('financeiro.paginar_contas_a_pagar',
+         lambda i: financeiro.paginar_contas_a_pagar()),
+        ('financeiro.iterar_contas_a_pagar', lambda i: financeiro.iterar_contas_a_pagar()),
+        ('financeiro.listar_contas_a_pagar', lambda i: financeiro.listar_contas_a_pagar()),
+        ('financeiro.paginar_contas_a_receber',
+         lambda i: financeiro.paginar_contas_a_receber()),
+        ('financeiro.iterar_contas_a_receber',
+         lambda i: financeiro.iterar_contas_a_receber()),
+        ('financeiro.listar_contas_a_receber',
+         lambda i: financeiro.listar_contas_a_receber()),
+        ('financeiro.paginar_vencidas', lambda i: financeiro.paginar_vencidas()),
+        ('financeiro.iterar_vencidas', lambda i: financeiro.iterar_vencidas()),
+        ('financeiro.listar_vencidas', lambda i: financeiro.listar_vencidas()),
+        ('financeiro.relatorio_aging', lambda i: financeiro.relatorio_aging()),
+        ('financeiro.verificar_saldos', lambda i: financeiro.verificar_saldos()),
+        # pedidos
+        ('pedidos.calcular_item',
+         lambda i: pedidos.calcular_item('FARDO_30x1', 50.0, 30.0, 1.5, True)),
+        ('pedidos.buscar_pedido', lambda i: pedidos.buscar_pedido(i % ultimo_pedido + 1)),
+        ('pedidos.paginar_pedidos', lambda i: pedidos.paginar_pedidos()),
+        ('pedidos.iterar_pedidos', lambda i: pedidos.iterar_pedidos(status='ABERTO')),
+        ('pedidos.listar_pedidos', lambda i: pedidos.listar_pedidos(empresa_id=empresa.id)),
+        ('pedidos.verificar_totais_pedidos', lambda i: pedidos.verificar_totais_pedidos()),
+        # projecao / busca / exportacao
+        ('projecao.projetar_fluxo_caixa', lambda i: projecao.projetar_fluxo_caixa()),
+        ('busca.pesquisar_texto', lambda i: busca.pesquisar_texto('soja lote')),
+        ('busca.ranking_parcial', lambda i: busca.ranking_parcial('soja lote')),
+        ('exportacao.exportar',
+         lambda i: exportacao.exportar('contas_a_receber',
+                                       os.path.join(tmp, 'exportacao.xlsx'), 'xlsx')),
+        # escritas
+        ('operacoes.invalidar_cache_empresas',
+         lambda i: operacoes.invalidar_cache_empresas()),
+        ('operacoes.cadastrar_empresa',
+         lambda i: novas_empresas.append(
+             operacoes.cadastrar_empresa(f'BENCH {i}', f'{i:014d}'))),
+        ('operacoes.desativar_empresa',
+         lambda i: operacoes.desativar_empresa(nova_empresa(i))),
+        ('operacoes.registrar_operacao',
+         lambda i: operacoes.registrar_operacao('VENDA', empresa.id, 100.0, 30,
+                                                f'bench {i}')),
+        ('operacoes.liquidar_operacao', lambda i: operacoes.liquidar_operacao(liquidar(i))),
+        ('operacoes.cancelar_operacao', lambda i: operacoes.cancelar_operacao(cancelar(i))),
+        ('operacoes.liquidar_operacoes',
+         lambda i: operacoes.liquidar_operacoes(liquidar_lote(i))),
+        ('operacoes.cancelar_operacoes',
+         lambda i: operacoes.cancelar_operacoes(cancelar_lote(i))),
+        ('pedidos.cadastrar_pedido',
+         lambda i: pedidos.cadastrar_pedido(empresa.id, 30, hoje + timedelta(days=30))),
+        ('pedidos.adicionar_item_pedido',
+         lambda i: pedidos.adicionar_item_pedido(ultimo_pedido, 'BAG', 2.0,
+                                                 1000.0, 1.2, False)),
+        ('pedidos.criar_pedido_completo',
+         lambda i: pedidos.criar_pedido_completo(empresa.id, 30, hoje + timedelta(days=30),
+                                                 itens)),
+        ('pedidos.atualizar_data_entrega',
+         lambda i: pedidos.atualizar_data_entrega(baixar(i), hoje + timedelta(days=i % 60))),
+        ('pedidos.baixar_pedido', lambda i: pedidos.baixar_pedido(baixar(i), 'BEN1234')),
+        ('importacao.importar_operacoes',
+         lambda i: importacao.importar_operacoes(linhas_importacao)),
+        ('importacao.importar_operacoes_csv',
+         lambda i: importacao.importar_operacoes_csv(arquivo_csv)),
+        # Por último: a primeira chamada esvazia o histórico do banco principal
+        ('arquivamento.arquivar', lambda i: arquivamento.arquivar()),
+    ]
+
+
+def _sem_caso(casos) -> list:
+    """Funções públicas de services/ que não têm caso no benchmark."""
+    medidas = {nome for nome, _ in casos}
+    faltando = []
+    for modulo in MODULOS:
+        prefixo = modulo.__name__.rsplit('.', 1)[-1]
+        for nome, funcao in inspect.getmembers(modulo, inspect.isfunction):
+            if (not nome.startswith('_') and funcao.__module__ == modulo.__name__
+                    and f'{prefixo}.{nome}' not in medidas):
+                faltando.append(f'{prefixo}.{nome}')
+    return faltando
+
+
+def _percentil(ordenadas: list, p: float) -> float:
+    """Percentil por posição mais próxima (amostras já ordenadas)."""
+    indice = max(0, min(len(ordenadas) - 1, round(p / 100 * len(ordenadas)) - 1))
+    return ordenadas[indice]
+
+
+def _medir(chamada, repeticoes: int, orcamento: float) -> dict:
+    """Executa `chamada` até `repeticoes` vezes ou até esgotar o orçamento."""
+    tempos = []
+    limite = time.perf_counter() + orcamento
+    i = 0
+    while len(tempos) < repeticoes:
+        t0 = time.perf_counter()
+        _consumir(chamada(i))
+        tempos.append(time.perf_counter() - t0)
+        i += 1
+        if time.perf_counter() > limite:
+            break
+
+    # Pico de memória numa execução separada: o tracemalloc deixa as
+    # alocações bem mais lentas e distorceria os tempos acima.
+    tracemalloc.start()
+    _consumir(chamada(i))
+    pico = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    tempos.sort()
+    return {
+        'chamadas': len(tempos),
+        'ops_por_segundo': len(tempos) / sum(tempos) if sum(tempos) > 0 else 0.0,
+        'p50_ms': _percentil(tempos, 50) * 1000,
+        'p99_ms': _percentil(tempos, 99) * 1000,
+        'pico_memoria_kb': pico / 1024,
+    }
+
+
+def _comparar(resultados: dict, baseline: dict, tolerancia: float) -> list:
+    """Imprime a comparação de p50 e retorna as funções que regrediram."""
+    if baseline['meta'].get('operacoes') != resultados['meta']['operacoes']:
+        print(f"Atenção: baseline com {baseline['meta'].get('operacoes')} operações, "
+              f"execução atual com {resultados['meta']['operacoes']}.")
+    print(f"\n{'FUNÇÃO':<40} {'BASE p50':>10} {'ATUAL p50':>10} {'RAZÃO':>7}")
+    print("-" * 70)
+    regressoes = []
+    for nome, atual in resultados['funcoes'].items():
+        anterior = baseline['funcoes'].get(nome)
+        if not anterior or anterior['p50_ms'] <= 0:
+            continue
+        razao = atual['p50_ms'] / anterior['p50_ms']
+        marca = ''
+        if razao > 1 + tolerancia:
+            regressoes.append(nome)
+            marca = '  <- REGRESSÃO'
+        print(f"{nome:<40} {anterior['p50_ms']:>10.3f} {atual['p50_ms']:>10.3f} "
+              f"{razao:>6.2f}x{marca}")
+    return regressoes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--escala', choices=ESCALAS, default='10k')
+    parser.add_argument('--operacoes', type=int, help='sobrepõe a escala')
+    parser.add_argument('--banco', help='banco já gerado por dados.py (é copiado)')
+    parser.add_argument('--repeticoes', type=int, default=200,
+                        help='máximo de chamadas por função')
+    parser.add_argument('--orcamento', type=float, default=ORCAMENTO_SEGUNDOS,
+                        help='segundos medindo cada função')
+    parser.add_argument('--filtro', help='mede só as funções cujo nome contém o texto')
+    parser.add_argument('--saida', help='grava os resultados neste JSON')
+    parser.add_argument('--baseline', help='JSON de uma execução anterior para comparar')
+    parser.add_argument('--tolerancia', type=float, default=0.25,
+                        help='piora aceita no p50 antes de acusar regressão (0.25 = 25%%)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_PATH = os.path.join(tmp, 'bench.db')
+        if args.banco:
+            shutil.copyfile(args.banco, database.DB_PATH)
+            database.init_db()
+            total = database.get_connection().execute(
+                'SELECT COUNT(*) FROM operacoes').fetchone()[0]
+        else:
+            total = args.operacoes or ESCALAS[args.escala]
+            print(f"Gerando {total} operações...")
+            gerar_dados(total)
+
+        casos = _casos(tmp)
+        for nome in _sem_caso(casos):
+            print(f"Atenção: {nome} não tem caso no benchmark.")
+        if args.filtro:
+            casos = [caso for caso in casos if args.filtro in caso[0]]
+
+        resultados = {
+            'meta': {
+                'operacoes': total,
+                'data': datetime.now().isoformat(timespec='seconds'),
+                'python': platform.python_version(),
+                'sqlite': sqlite3.sqlite_version,
+                'repeticoes': args.repeticoes,
+            },
+            'funcoes': {},
+        }
+        print(f"\n{'FUNÇÃO':<40} {'N':>5} {'OPS/S':>10} {'p50 ms':>9} "
+              f"{'p99 ms':>9} {'PICO KiB':>9}")
+        print("-" * 86)
+        for nome, chamada in casos:
+            medida = _medir(chamada, args.repeticoes, args.orcamento)
+            resultados['funcoes'][nome] = medida
+            print(f"{nome:<40} {medida['chamadas']:>5} {medida['ops_por_segundo']:>10.1f} "
+                  f"{medida['p50_ms']:>9.3f} {medida['p99_ms']:>9.3f} "
+                  f"{medida['pico_memoria_kb']:>9.1f}")
+        database.fechar_conexao()
+
+    if args.saida:
+        with open(args.saida, 'w', encoding='utf-8') as arquivo:
+            json.dump(resultados, arquivo, indent=2, ensure_ascii=False)
+        print(f"\nResultados gravados em {args.saida}")
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as arquivo:
+            baseline = json.load(arquivo)
+        regressoes = _comparar(resultados, baseline, args.tolerancia)
+        if regressoes:
+            print(f"\n{len(regressoes)} função(ões) acima da tolerância de "
+                  f"{args.tolerancia:.0%}: {', '.join(regressoes)}")
+            sys.exit(1)
+        print("\nNenhuma regressão acima da tolerância.")
+
+
+if __name__ == '__main__':
+    main()
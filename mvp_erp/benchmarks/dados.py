@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Gerador de dados sintéticos para benchmarks.
+
+Popula o banco de database.DB_PATH (criado com o schema real de init_db)
+com empresas, operações e pedidos em distribuição parecida com a de
+produção: dois anos de histórico, a maior parte já liquidada/baixada,
+poucos registros em aberto e textos livres com contratos e lotes.
+As linhas são inseridas em lote (executemany), com os triggers ativos.
+
+Uso:
+    python3 mvp_erp/benchmarks/dados.py --escala 100k --destino /tmp/bench.db
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+from services.pedidos import calcular_item, PESO_POR_EMBALAGEM
+
+# Quantidade de operações por escala nomeada
+ESCALAS = {'10k': 10_000, '100k': 100_000, '1m': 1_000_000}
+
+# Linhas por transação
+TAMANHO_LOTE = 10_000
+
+# Dias de histórico gerado (até hoje)
+DIAS_HISTORICO = 730
+
+_NOMES = ('AGRO', 'FAZENDA', 'COOPERATIVA', 'CEREAIS', 'GRÃOS', 'COMERCIAL',
+          'ARMAZÉNS', 'SEMENTES', 'TRANSPORTES', 'LATICÍNIOS')
+_SOBRENOMES = ('SILVA', 'SANTOS', 'OLIVEIRA', 'SOUZA', 'PEREIRA', 'LIMA',
+               'COSTA', 'FERREIRA', 'ALMEIDA', 'RIBEIRO', 'BOA VISTA', 'SÃO JOÃO')
+_PRODUTOS = ('soja', 'milho', 'trigo', 'feno', 'sorgo', 'aveia', 'farelo')
+_PRAZOS = (0, 7, 7, 14, 28, 30, 30, 45, 60)
+
+_INSERT_OPERACAO = '''
+    INSERT INTO operacoes
+    (tipo, empresa_id, descricao, valor, prazo_dias, data_operacao,
+     data_vencimento, data_liquidacao, status, observacao)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+_INSERT_PEDIDO = '''
+    INSERT INTO pedidos
+    (id, empresa_id, data_pedido, prazo_dias, data_prevista_entrega,
+     status, placa, data_baixa, observacao)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+_INSERT_ITEM = '''
+    INSERT INTO itens_pedido
+    (pedido_id, tipo_embalagem, quantidade, peso_por_unidade,
+     peso_kg, preco_unitario, icms, valor_total)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+
+def _gravar(sql: str, linhas):
+    """Insere as linhas em transações de TAMANHO_LOTE."""
+    lote = []
+    for linha in linhas:
+        lote.append(linha)
+        if len(lote) >= TAMANHO_LOTE:
+            with database.transacao() as conn:
+                conn.executemany(sql, lote)
+            lote.clear()
+    if lote:
+        with database.transacao() as conn:
+            conn.executemany(sql, lote)
+
+
+def _status(vencimento: date, hoje: date, rnd: random.Random) -> str:
+    """Quanto mais antigo o vencimento, mais provável estar liquidado."""
+    atraso = (hoje - vencimento).days
+    sorteio = rnd.random()
+    if atraso > 30:
+        aberto = 0.02
+    elif atraso > 0:
+        aberto = 0.30
+    else:
+        aberto = 0.85
+    if sorteio < aberto:
+        return 'ABERTO'
+    return 'CANCELADO' if sorteio > 0.97 else 'LIQUIDADO'
+
+
+def _operacoes(quantidade: int, empresas: int, hoje: date, rnd: random.Random):
+    inicio = hoje - timedelta(days=DIAS_HISTORICO)
+    for _ in range(quantidade):
+        data_operacao = inicio + timedelta(days=rnd.randrange(DIAS_HISTORICO + 1))
+        prazo = rnd.choice(_PRAZOS)
+        vencimento = data_operacao + timedelta(days=prazo)
+        status = _status(vencimento, hoje, rnd)
+        liquidacao = None
+        if status == 'LIQUIDADO':
+            liquidacao = min(vencimento + timedelta(days=rnd.randint(-3, 10)), hoje)
+        produto = rnd.choice(_PRODUTOS)
+        yield (
+            'VENDA' if rnd.random() < 0.55 else 'COMPRA',
+            rnd.randint(1, empresas),
+            f"{produto} contrato {rnd.randint(1000, 99999)}",
+            round(rnd.lognormvariate(8, 1.2), 2),
+            prazo,
+            data_operacao.isoformat(),
+            vencimento.isoformat(),
+            liquidacao.isoformat() if liquidacao else None,
+            status,
+            f"lote L-{rnd.randint(1, 5000)} {produto}" if rnd.random() < 0.3 else None,
+        )
+
+
+def _pedidos(quantidade: int, empresas: int, hoje: date, rnd: random.Random,
+             itens: list):
+    """Gera os pedidos (com ids explícitos) e acumula os itens em `itens`."""
+    tipos = list(PESO_POR_EMBALAGEM)
+    for pedido_id in range(1, quantidade + 1):
+        data_pedido = hoje - timedelta(days=rnd.randrange(DIAS_HISTORICO + 1))
+        prazo = rnd.choice(_PRAZOS[1:])
+        entrega = data_pedido + timedelta(days=prazo)
+        antigo = (hoje - entrega).days > 15
+        status = 'BAIXADO' if antigo and rnd.random() < 0.97 else 'ABERTO'
+        if rnd.random() < 0.02:
+            status = 'CANCELADO'
+        yield (
+            pedido_id,
+            rnd.randint(1, empresas),
+            data_pedido.isoformat(),
+            prazo,
+            entrega.isoformat(),
+            status,
+            f"{rnd.choice('ABCDEFGHJK')}{rnd.choice('ABCDEFGHJK')}X{rnd.randint(1000, 9999)}"
+            if status == 'BAIXADO' else None,
+            entrega.isoformat() if status == 'BAIXADO' else None,
+            f"retirar lote {rnd.randint(1, 5000)}" if rnd.random() < 0.2 else None,
+        )
+        for _ in range(rnd.randint(1, 20)):
+            tipo = rnd.choice(tipos)
+            peso_unidade = PESO_POR_EMBALAGEM[tipo] or float(rnd.choice((500, 1000, 1200)))
+            quantidade_item = float(rnd.randint(1, 200))
+            preco = round(rnd.uniform(0.8, 3.5), 2)
+            icms = rnd.random() < 0.4
+            calc = calcular_item(tipo, quantidade_item, peso_unidade, preco, icms)
+            itens.append((pedido_id, tipo, quantidade_item, peso_unidade,
+                          calc['peso_kg'], preco, 1 if icms else 0, calc['valor_total']))
+
+
+def gerar_dados(operacoes: int = ESCALAS['10k'], empresas: int = 300,
+                pedidos: int = None, semente: int = 42) -> dict:
+    """
+    Cria o schema (init_db) e gera os dados no banco de database.DB_PATH.
+    `pedidos` padrão: um pedido para cada 10 operações, com 1 a 20 itens.
+    Retorna as quantidades geradas e o tempo gasto.
+    """
+    rnd = random.Random(semente)
+    hoje = date.today()
+    pedidos = operacoes // 10 if pedidos is None else pedidos
+    inicio = time.perf_counter()
+
+    database.init_db()
+    _gravar('INSERT INTO empresas (nome, cnpj, ativo) VALUES (?, ?, ?)', (
+        (f"{rnd.choice(_NOMES)} {rnd.choice(_SOBRENOMES)} {i:04d}",
+         f"{rnd.randint(10, 99)}.{rnd.randint(100, 999)}.{rnd.randint(100, 999)}"
+         f"/0001-{rnd.randint(10, 99)}",
+         0 if rnd.random() < 0.05 else 1)
+        for i in range(1, empresas + 1)
+    ))
+    _gravar(_INSERT_OPERACAO, _operacoes(operacoes, empresas, hoje, rnd))
+
+    itens = []
+    _gravar(_INSERT_PEDIDO, _pedidos(pedidos, empresas, hoje, rnd, itens))
+    _gravar(_INSERT_ITEM, itens)
+
+    database.get_connection().execute('ANALYZE')
+    return {
+        'empresas': empresas,
+        'operacoes': operacoes,
+        'pedidos': pedidos,
+        'itens_pedido': len(itens),
+        'segundos': time.perf_counter() - inicio,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--escala', choices=ESCALAS, default='10k')
+    parser.add_argument('--operacoes', type=int, help='sobrepõe a escala')
+    parser.add_argument('--empresas', type=int, default=300)
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--destino', required=True, help='arquivo do banco gerado')
+    args = parser.parse_args()
+
+    if os.path.exists(args.destino):
+        parser.error(f"{args.destino} já existe; informe um arquivo novo")
+    database.DB_PATH = args.destino
+    resumo = gerar_dados(args.operacoes or ESCALAS[args.escala],
+                         args.empresas, semente=args.semente)
+    database.fechar_conexao()
+    print(f"{resumo['empresas']} empresas, {resumo['operacoes']} operações, "
+          f"{resumo['pedidos']} pedidos ({resumo['itens_pedido']} itens) "
+          f"em {resumo['segundos']:.1f} s -> {args.destino}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Verificação de comportamento dos serviços em casos de borda.
+
+Cada verificação roda sobre um banco temporário novo (com o schema real
+de init_db), monta o cenário mínimo e confere o resultado do serviço.
+Falha (código de saída 1) se alguma verificação não passar.
+
+Uso:
+    python3 mvp_erp/benchmarks/verificar_consistencia.py [-v]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import sqlite3
+import traceback
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+from models import NAO_LIDO, VISAO_LISTA
+from services import arquivamento, busca, financeiro, importacao, operacoes, pedidos, projecao
+
+# (nome, função) na ordem de execução; a função levanta AssertionError
+VERIFICACOES = []
+
+
+def _verificacao(funcao):
+    VERIFICACOES.append((funcao.__name__.lstrip('_'), funcao))
+    return funcao
+
+
+@_verificacao
+def _commit_recusado_desfaz_transacao():
+    """Se o COMMIT falha, a transação é desfeita e a próxima abre normalmente."""
+    conn = database.get_connection()
+    conn.execute('PRAGMA foreign_keys = ON')
+    try:
+        with database.transacao():
+            # Chave estrangeira adiada: a violação só aparece no COMMIT
+            conn.execute('PRAGMA defer_foreign_keys = ON')
+            conn.execute("""INSERT INTO operacoes (tipo, empresa_id, valor, prazo_dias,
+                            data_operacao, data_vencimento)
+                            VALUES ('VENDA', 999, 10, 0, '2025-01-01', '2025-01-01')""")
+    except sqlite3.IntegrityError:
+        pass
+    else:
+        raise AssertionError('COMMIT com chave estrangeira inválida não falhou')
+    assert not conn.in_transaction
+    assert conn.execute('SELECT count(*) FROM operacoes').fetchone()[0] == 0
+    empresa = operacoes.cadastrar_empresa('EMPRESA TRANSACAO')
+    assert operacoes.buscar_empresa(empresa) is not None
+
+
+@_verificacao
+def _busca_encontra_arquivados():
+    """Uma operação arquivada continua achável por texto com historico=True."""
+    empresa = operacoes.cadastrar_empresa('EMPRESA BUSCA')
+    antiga = date.today() - timedelta(days=2 * arquivamento.DIAS_MANTIDOS)
+    arquivada = operacoes.registrar_operacao(
+        'VENDA', empresa, 100.0, descricao='contrato 4706 soja', data_operacao=antiga)
+    ativa = operacoes.registrar_operacao('VENDA', empresa, 50.0, descricao='contrato 4706 milho')
+    operacoes.liquidar_operacao(arquivada)
+
+    movidos = arquivamento.arquivar()
+    assert movidos['operacoes'] == 1, movidos
+
+    ids = {r['id'] for r in busca.pesquisar_texto('contrato 4706')}
+    assert ids == {ativa}, ids
+    ids = {r['id'] for r in busca.pesquisar_texto('contrato 4706', historico=True)}
+    assert ids == {ativa, arquivada}, ids
+
+
+@_verificacao
+def _busca_indica_ranking_parcial():
+    """ranking_parcial só acusa quando as ocorrências passam de JANELA_RANKING."""
+    empresa = operacoes.cadastrar_empresa('EMPRESA RANKING')
+    janela = busca.JANELA_RANKING
+    busca.JANELA_RANKING = 3
+    try:
+        for i in range(4):
+            operacoes.registrar_operacao('VENDA', empresa, 10.0, descricao=f'lote {i} soja')
+        operacoes.registrar_operacao('VENDA', empresa, 10.0, descricao='lote milho')
+        assert busca.ranking_parcial('soja')
+        assert busca.ranking_parcial('lot')
+        assert not busca.ranking_parcial('milho')
+        assert not busca.ranking_parcial('lote 2 soja')
+        assert len(busca.pesquisar_texto('soja')) == 3
+    finally:
+        busca.JANELA_RANKING = janela
+
+
+@_verificacao
+def _projecao_ignora_vencimento_invalido():
+    """Um data_vencimento malformado não derruba a projeção de caixa."""
+    empresa = operacoes.cadastrar_empresa('EMPRESA PROJECAO')
+    operacoes.registrar_operacao('VENDA', empresa, 100.0, prazo_dias=3)
+    invalida = operacoes.registrar_operacao('COMPRA', empresa, 40.0, prazo_dias=3)
+    database.get_connection().execute(
+        "UPDATE operacoes SET data_vencimento = '15/01/2025' WHERE id = ?", (invalida,))
+
+    for usar_numpy in (False, projecao.np is not None):
+        resultado = projecao.projetar_fluxo_caixa(usar_numpy=usar_numpy)
+        assert resultado['vencimentos_invalidos'] == ('15/01/2025',), resultado
+        assert resultado['entradas'][3] == 100.0, resultado['entradas'][:5]
+        assert sum(resultado['saidas']) == 0.0, resultado['saidas'][:5]
+
+
+@_verificacao
+def _agregados_divergentes_sao_corrigidos():
+    """verificar_saldos/verificar_totais_pedidos acham e regravam agregados adulterados."""
+    empresa = operacoes.cadastrar_empresa('EMPRESA AGREGADOS')
+    operacoes.registrar_operacao('VENDA', empresa, 100.0)
+    pedido = pedidos.criar_pedido_completo(empresa, 30, None, [{
+        'tipo_embalagem': 'BAG', 'quantidade': 10, 'peso_por_unidade': 1.0,
+        'preco_unitario': 2.0, 'icms': False}])
+    conn = database.get_connection()
+    conn.execute("UPDATE saldos_operacoes SET total = total + 1 WHERE tipo = 'VENDA' AND status = 'ABERTO'")
+    conn.execute('UPDATE pedidos SET valor_total = valor_total + 1 WHERE id = ?', (pedido,))
+
+    for verificar in (financeiro.verificar_saldos, pedidos.verificar_totais_pedidos):
+        assert len(verificar()) == 1, verificar.__name__
+        assert len(verificar(corrigir=True)) == 1, verificar.__name__
+        assert verificar() == [], verificar.__name__
+
+
+@_verificacao
+def _caches_valem_so_na_mesma_conexao():
+    """Após reabrir a conexão, empresas e projeção não vêm do cache da anterior."""
+    operacoes.cadastrar_empresa('EMPRESA CACHE')
+    assert len(operacoes.listar_empresas()) == 1
+    assert projecao.projetar_fluxo_caixa()['saldo_final'] == 0.0
+    geracao = database.geracao_conexao()
+
+    database.fechar_conexao()
+    with sqlite3.connect(database.DB_PATH) as externa:   # outro terminal
+        externa.execute("INSERT INTO empresas (nome) VALUES ('EMPRESA EXTERNA')")
+        externa.execute("""INSERT INTO operacoes (tipo, empresa_id, valor, prazo_dias,
+                           data_operacao, data_vencimento) VALUES ('VENDA', 1, 10, 0, ?, ?)""",
+                        (date.today().isoformat(), date.today().isoformat()))
+    externa.close()
+
+    # id(conn) pode se repetir após o fechamento; a geração não
+    assert database.geracao_conexao() != geracao
+    assert len(operacoes.listar_empresas()) == 2, operacoes.listar_empresas()
+    assert projecao.projetar_fluxo_caixa()['saldo_final'] == 10.0
+
+
+@_verificacao
+def _alteracao_em_lote_sem_returning():
+    """liquidar/cancelar_operacoes dão o mesmo resultado com e sem UPDATE ... RETURNING."""
+    empresa = operacoes.cadastrar_empresa('EMPRESA LOTE')
+    outra = operacoes.cadastrar_empresa('EMPRESA LOTE 2')
+    for suporta in (True, False):
+        if suporta and not database.SUPORTA_RETURNING:
+            continue
+        operacoes.SUPORTA_RETURNING = suporta
+        try:
+            ids = [operacoes.registrar_operacao('VENDA', empresa, 10.0) for _ in range(3)]
+            da_outra = operacoes.registrar_operacao('VENDA', outra, 10.0)
+            operacoes.cancelar_operacao(ids[2])
+            resultado = operacoes.liquidar_operacoes(ids + [999999])
+            assert resultado == {ids[0]: operacoes.RESULTADO_OK, ids[1]: operacoes.RESULTADO_OK,
+                                 ids[2]: 'CANCELADO', 999999: operacoes.RESULTADO_INEXISTENTE}, resultado
+            assert operacoes.buscar_operacao(ids[0]).status == 'LIQUIDADO'
+            assert operacoes.cancelar_operacoes(empresa_id=outra) == {da_outra: operacoes.RESULTADO_OK}
+            assert operacoes.buscar_operacao(da_outra).status == 'CANCELADO'
+        finally:
+            operacoes.SUPORTA_RETURNING = database.SUPORTA_RETURNING
+
+
+@_verificacao
+def _importacao_rejeita_linhas_invalidas():
+    """Prazo fora do calendário, nan/inf e 1,234.56 rejeitam a linha, não a importação."""
+    operacoes.cadastrar_empresa('EMPRESA IMPORTACAO')
+    base = {'tipo': 'VENDA', 'empresa': 'EMPRESA IMPORTACAO'}
+    resumo = importacao.importar_operacoes([
+        dict(base, valor='10', prazo_dias='99999999'),
+        dict(base, valor='nan'),
+        dict(base, valor='inf'),
+        dict(base, valor='1,234.56'),
+        dict(base, valor='R$ 1.234,56'),
+    ], tamanho_lote=1)
+    assert resumo['importadas'] == 1, resumo
+    assert [numero for numero, _ in resumo['rejeitadas']] == [1, 2, 3, 4], resumo
+    op, = operacoes.iterar_operacoes()
+    assert op.valor == 1234.56, op
+
+
+@_verificacao
+def _lista_marca_campos_nao_lidos():
+    """Campos fora de VISAO_LISTA valem NAO_LIDO (não None) e não passam por vazios."""
+    empresa = operacoes.cadastrar_empresa('EMPRESA VISAO')
+    operacoes.registrar_operacao('VENDA', empresa, 100.0, prazo_dias=10)
+    pedidos.criar_pedido_completo(empresa, 30, None, [{
+        'tipo_embalagem': 'BAG', 'quantidade': 10, 'peso_por_unidade': 1.0,
+        'preco_unitario': 2.0, 'icms': False}])
+
+    op, = operacoes.paginar_operacoes(visao=VISAO_LISTA).itens
+    assert op.valor == 100.0 and op.prazo_dias is NAO_LIDO and op.observacao is NAO_LIDO, op
+    op, = operacoes.iterar_operacoes(visao=VISAO_LISTA)
+    assert op.prazo_dias is NAO_LIDO, op
+    for uso in (bool, str):
+        try:
+            uso(op.observacao)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError(f'{uso.__name__}(NAO_LIDO) não levantou ValueError')
+    op, = operacoes.iterar_operacoes()
+    assert op.prazo_dias == 10 and op.observacao is None, op
+
+    pedido, = pedidos.paginar_pedidos(visao=VISAO_LISTA).itens
+    assert pedido.prazo_dias is NAO_LIDO and pedido.placa is NAO_LIDO, pedido
+    assert pedido.empresa_nome == 'EMPRESA VISAO' and pedido.valor_total == 20.0, pedido
+    pedido, = pedidos.iterar_pedidos()
+    assert pedido.prazo_dias == 30 and pedido.placa is None, pedido
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('-v', '--verboso', action='store_true')
+    args = parser.parse_args()
+
+    falhas = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        for i, (nome, funcao) in enumerate(VERIFICACOES):
+            database.fechar_conexao()
+            database.DB_PATH = os.path.join(tmp, f'verificacao_{i}.db')
+            database.init_db()
+            try:
+                funcao()
+            except Exception:
+                falhas += 1
+                print(f"FALHOU {nome}")
+                traceback.print_exc()
+            else:
+                if args.verboso:
+                    print(f"ok     {nome}")
+        database.fechar_conexao()
+
+    if falhas:
+        print(f"\n{falhas} verificação(ões) falharam.")
+        sys.exit(1)
+    print(f"\nTodas as {len(VERIFICACOES)} verificações passaram.")
+
+
+if __name__ == '__main__':
+    main()
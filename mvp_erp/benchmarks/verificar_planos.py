@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Verificação de planos de consulta (EXPLAIN QUERY PLAN).
+
+Executa cada função de consulta dos serviços sobre um banco temporário,
+captura o SQL emitido e falha (código de saída 1) se alguma consulta
+frequente varrer uma tabela inteira em vez de usar um índice.
+
+Uso:
+    python3 mvp_erp/benchmarks/verificar_planos.py [-v]
+"""
+import argparse
+import os
+import re
+import sys
+import tempfile
+from datetime import date, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+from services import operacoes, financeiro, pedidos, projecao, busca, arquivamento
+from models import VISAO_LISTA
+
+# Tabelas grandes: uma varredura sem índice nelas é regressão
+TABELAS_GRANDES = ('operacoes', 'pedidos', 'itens_pedido')
+
+# SCAN <tabela|alias> sem "USING ... INDEX"
+_RE_SCAN = re.compile(r'^SCAN (?:\w+\.)?(\w+)$')
+
+
+def _casos():
+    """
+    Chamadas verificadas: (nome, função, permite_varredura_ordenada).
+    Listagens completas podem percorrer a tabela/índice em ordem,
+    mas nunca varrer sem índice e ordenar em B-tree temporária.
+    """
+    hoje = date.today()
+    return [
+        ('listar_operacoes()', lambda: operacoes.listar_operacoes(), True),
+        ('listar_operacoes(status)', lambda: operacoes.listar_operacoes(status='ABERTO'), False),
+        ('listar_operacoes(tipo)', lambda: operacoes.listar_operacoes(tipo='VENDA'), False),
+        ('listar_operacoes(empresa)', lambda: operacoes.listar_operacoes(empresa_id=1), False),
+        ('paginar_operacoes(status, apos)',
+         lambda: operacoes.paginar_operacoes(status='ABERTO', apos=(hoje.isoformat(), 1)), False),
+        ('paginar_operacoes(apos)',
+         lambda: operacoes.paginar_operacoes(apos=(hoje.isoformat(), 1)), False),
+        # Visão de listagem: respondida pelos índices de cobertura
+        ('paginar_operacoes(status, lista)',
+         lambda: operacoes.paginar_operacoes(status='ABERTO', visao=VISAO_LISTA), False),
+        ('paginar_contas_a_pagar(lista)',
+         lambda: financeiro.paginar_contas_a_pagar(visao=VISAO_LISTA), False),
+        ('paginar_vencidas(lista)', lambda: financeiro.paginar_vencidas(visao=VISAO_LISTA), False),
+        ('paginar_pedidos(status, lista)',
+         lambda: pedidos.paginar_pedidos(status='ABERTO', apenas_totais=True,
+                                         visao=VISAO_LISTA), False),
+        ('buscar_operacao', lambda: operacoes.buscar_operacao(1), False),
+        ('listar_empresas', lambda: operacoes.listar_empresas(), False),
+        ('buscar_empresa', lambda: operacoes.buscar_empresa(1), False),
+        # Trechos do nome saem do FTS e são ordenados só entre os encontrados
+        ('pesquisar_empresas', lambda: operacoes.pesquisar_empresas('LANO'), True),
+        ('pesquisar_empresas(cnpj)', lambda: operacoes.pesquisar_empresas('12.3'), True),
+        ('listar_contas_a_pagar', lambda: financeiro.listar_contas_a_pagar(), False),
+        ('listar_contas_a_pagar(todas)',
+         lambda: financeiro.listar_contas_a_pagar(apenas_abertas=False), False),
+        ('listar_contas_a_receber', lambda: financeiro.listar_contas_a_receber(), False),
+        ('listar_vencidas', lambda: financeiro.listar_vencidas(), False),
+        ('resumo_financeiro', lambda: financeiro.resumo_financeiro(), False),
+        ('relatorio_aging', lambda: financeiro.relatorio_aging(), False),
+        ('projetar_fluxo_caixa', lambda: projecao.projetar_fluxo_caixa(), False),
+        ('listar_pedidos()', lambda: pedidos.listar_pedidos(), True),
+        ('listar_pedidos(status)', lambda: pedidos.listar_pedidos(status='ABERTO'), False),
+        ('listar_pedidos(empresa)', lambda: pedidos.listar_pedidos(empresa_id=1), False),
+        ('listar_pedidos(totais)', lambda: pedidos.listar_pedidos(apenas_totais=True), True),
+        ('listar_pedidos(status, totais)',
+         lambda: pedidos.listar_pedidos(status='ABERTO', apenas_totais=True), False),
+        ('paginar_pedidos(status, apos)',
+         lambda: pedidos.paginar_pedidos(status='ABERTO', apos=50), False),
+        ('paginar_pedidos(apos, totais)',
+         lambda: pedidos.paginar_pedidos(apos=50, apenas_totais=True), True),
+        ('buscar_pedido', lambda: pedidos.buscar_pedido(1), False),
+        # Itens são lidos só no primeiro acesso, para o lote inteiro
+        ('paginar_pedidos(itens)',
+         lambda: [len(p.itens) for p in pedidos.paginar_pedidos(status='ABERTO').itens], False),
+        # Ranqueia só a janela de ocorrências devolvida pelo FTS
+        ('pesquisar_texto', lambda: busca.pesquisar_texto('lote'), True),
+        # Histórico completo: UNION ALL do banco principal com o arquivo morto
+        ('paginar_operacoes(apos, historico)',
+         lambda: operacoes.paginar_operacoes(apos=(hoje.isoformat(), 1), historico=True), False),
+        ('listar_operacoes(empresa, historico)',
+         lambda: operacoes.listar_operacoes(empresa_id=1, historico=True), False),
+        ('paginar_pedidos(apos, historico)',
+         lambda: pedidos.paginar_pedidos(apos=50, limite=10, historico=True), False),
+        ('buscar_pedido(historico)', lambda: pedidos.buscar_pedido(1, historico=True), False),
+    ]
+
+
+def _popular():
+    """
+    Insere uma amostra com a distribuição típica de produção: a maior parte
+    do histórico já liquidada/baixada e poucos registros em aberto, para que
+    o ANALYZE gere estatísticas realistas.
+    """
+    hoje = date.today()
+    empresas = [operacoes.cadastrar_empresa(f'PLANO {i}') for i in range(10)]
+    ids = [operacoes.registrar_operacao(
+               'COMPRA' if i % 2 else 'VENDA', empresas[i % 10], 100.0 + i,
+               prazo_dias=7, data_operacao=hoje - timedelta(days=400 - i))
+           for i in range(400)]
+    operacoes.liquidar_operacoes(ids[:360])
+    for i in range(100):
+        pedido_id = pedidos.cadastrar_pedido(empresas[i % 10], 7, hoje)
+        pedidos.adicionar_item_pedido(pedido_id, 'AGRANEL', 100, 1.0, 2.0, False)
+        if i < 90:
+            pedidos.baixar_pedido(pedido_id, 'AAA0000')
+    arquivamento.arquivar(hoje - timedelta(days=200))
+
+
+def _capturar(funcao) -> list:
+    """Executa a função e devolve os SELECTs emitidos (com parâmetros expandidos)."""
+    emitidos = []
+    conn = database.get_connection()
+    conn.set_trace_callback(emitidos.append)
+    try:
+        resultado = funcao()
+        if hasattr(resultado, '__next__'):
+            list(resultado)
+    finally:
+        conn.set_trace_callback(None)
+    return [sql for sql in emitidos if sql.lstrip().upper().startswith(('SELECT', 'WITH'))]
+
+
+def _problemas(sql: str, permite_varredura: bool) -> list:
+    """Retorna as linhas do plano que indicam varredura indevida."""
+    conn = database.get_connection()
+    plano = [row[3] for row in conn.execute('EXPLAIN QUERY PLAN ' + sql)]
+    aliases = dict(re.findall(r'\b(?:FROM|JOIN)\s+(\w+)\s+(?:AS\s+)?(\w+)', sql, re.I))
+    tabelas = {alias: tabela for tabela, alias in aliases.items()}
+
+    ruins = []
+    # Agrupar o resultado de uma busca por índice em B-tree temporária é
+    # normal; o que não pode é ordenar a tabela inteira para listá-la.
+    ordena_em_temp = any('TEMP B-TREE' in linha and 'GROUP BY' not in linha
+                         for linha in plano)
+    for linha in plano:
+        m = _RE_SCAN.match(linha)
+        if not m:
+            continue
+        tabela = tabelas.get(m.group(1), m.group(1))
+        if tabela not in TABELAS_GRANDES:
+            continue
+        # Varredura pela ordem da chave primária sem ordenação extra é aceitável
+        # apenas em listagens completas.
+        if permite_varredura and not ordena_em_temp:
+            continue
+        ruins.append(linha)
+    if not permite_varredura and ordena_em_temp:
+        ruins.extend(linha for linha in plano
+                     if 'TEMP B-TREE' in linha and 'GROUP BY' not in linha)
+    return plano, ruins
+
+
+def verificar(verboso: bool = False) -> int:
+    """Verifica todos os casos; retorna a quantidade de consultas com problema."""
+    falhas = 0
+    for nome, funcao, permite_varredura in _casos():
+        for sql in _capturar(funcao):
+            plano, ruins = _problemas(sql, permite_varredura)
+            if ruins:
+                falhas += 1
+                print(f"FALHA  {nome}: {'; '.join(ruins)}")
+                print(f"       {' '.join(sql.split())}")
+            elif verboso:
+                print(f"ok     {nome}: {'; '.join(plano)}")
+    return falhas
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('-v', '--verboso', action='store_true')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_PATH = os.path.join(tmp, 'planos.db')
+        database.init_db()
+        _popular()
+
+        print("== sem estatísticas ==")
+        falhas = verificar(args.verboso)
+        database.get_connection().execute('ANALYZE')
+        print("== após ANALYZE ==")
+        falhas += verificar(args.verboso)
+        database.fechar_conexao()
+
+    if falhas:
+        print(f"\n{falhas} consulta(s) com varredura completa.")
+        sys.exit(1)
+    print("\nTodas as consultas usam índices.")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,89 +1,902 @@
 """
 Módulo de conexão e configuração do banco de dados SQLite.
+
+Cada thread mantém uma única conexão aberta durante toda a execução,
+evitando o custo de abrir o arquivo e aquecer o cache de páginas a cada
+consulta. Escritas devem ser feitas dentro de ``transacao()``.
 """
+import itertools
+import logging
 import sqlite3
 import os
+import re
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, datetime
+from functools import lru_cache
+from logging.handlers import RotatingFileHandler
+from typing import Callable, Dict, Iterable, List, Union
 
 DB_PATH = os.path.join(os.path.dirname(__file__), 'data', 'mvp.db')
 
+# PRAGMAs aplicados a toda conexão nova (ordem importa: journal_mode primeiro)
+PRAGMAS = {
+    'journal_mode': 'WAL',      # leitores não bloqueiam o escritor
+    'synchronous': 'NORMAL',    # fsync só no checkpoint (seguro com WAL)
+    'cache_size': -8000,        # negativo = KiB (~8 MB de cache de páginas)
+    'temp_store': 'MEMORY',     # ordenações/temporários em memória
+    'busy_timeout': 5000,       # ms aguardando lock de outro terminal
+}
+
+# UPDATE ... RETURNING só existe a partir do SQLite 3.35; o Python 3.10 de
+# distribuições antigas (ex.: Debian 11) traz 3.34
+SUPORTA_RETURNING = sqlite3.sqlite_version_info >= (3, 35, 0)
+
+_local = threading.local()
+
+# Numera as conexões abertas pelo processo (ver geracao_conexao)
+_geracoes = itertools.count(1)
+
+
+# Colunas declaradas DATE/TIMESTAMP voltam do banco já como date/datetime
+# (detect_types), decodificadas uma vez na leitura em vez de a cada
+# exibição. Vencimentos e datas de pedido se repetem muito entre as
+# linhas, por isso a conversão de datas é memorizada pelo texto gravado.
+@lru_cache(maxsize=4096)
+def _converter_data(valor: bytes) -> Union[date, str]:
+    texto = valor.decode()
+    try:
+        return date.fromisoformat(texto)
+    except ValueError:
+        return texto    # gravado fora do padrão: devolve como está
+
 
-def get_connection():
-    """Retorna uma conexão com o banco de dados."""
-    conn = sqlite3.connect(DB_PATH)
+def _converter_timestamp(valor: bytes) -> Union[datetime, str]:
+    texto = valor.decode()
+    try:
+        return datetime.fromisoformat(texto)
+    except ValueError:
+        return texto
+
+
+sqlite3.register_converter('DATE', _converter_data)
+sqlite3.register_converter('TIMESTAMP', _converter_timestamp)
+# Parâmetros date/datetime são gravados em ISO (o mesmo texto de isoformat())
+sqlite3.register_adapter(date, date.isoformat)
+sqlite3.register_adapter(datetime, lambda valor: valor.isoformat(' '))
+
+
+def configurar_pragmas(**pragmas):
+    """
+    Altera os PRAGMAs usados nas conexões.
+    A conexão da thread atual é fechada para que a próxima use os novos valores.
+    """
+    PRAGMAS.update(pragmas)
+    fechar_conexao()
+
+
+def _abrir_conexao(caminho: str) -> sqlite3.Connection:
+    """Abre uma conexão e aplica os PRAGMAs configurados."""
+    # isolation_level=None: leituras em autocommit, escritas via transacao()
+    fabrica = sqlite3.Connection
+    if DIAGNOSTICO['ativo']:
+        fabrica = ConexaoInstrumentada
+        if not _log_lentas.handlers:
+            _configurar_log()
+    conn = sqlite3.connect(caminho, isolation_level=None, factory=fabrica,
+                           detect_types=sqlite3.PARSE_DECLTYPES)
     conn.row_factory = sqlite3.Row
+    for nome, valor in PRAGMAS.items():
+        conn.execute(f'PRAGMA {nome} = {valor}')
+    return conn
+
+
+def get_connection() -> sqlite3.Connection:
+    """
+    Retorna a conexão persistente da thread atual.
+    A conexão é criada na primeira chamada e reaberta se DB_PATH mudar.
+    Não deve ser fechada por quem chama; use fechar_conexao() ao encerrar.
+    """
+    conn = getattr(_local, 'conn', None)
+    if conn is None or _local.caminho != DB_PATH:
+        fechar_conexao()
+        conn = _abrir_conexao(DB_PATH)
+        _local.conn = conn
+        _local.caminho = DB_PATH
+        _local.geracao = next(_geracoes)
+        _local.profundidade = 0
+        _local.arquivo_anexado = False
     return conn
 
 
-def init_db():
-    """Inicializa o banco de dados criando as tabelas necessárias."""
+def geracao_conexao() -> int:
+    """
+    Número da conexão atual da thread, diferente a cada abertura. Caches
+    validados por PRAGMA data_version (que só se compara dentro da mesma
+    conexão) usam-no no lugar de id(conn), que pode ser reaproveitado.
+    """
+    get_connection()
+    return _local.geracao
+
+
+def fechar_conexao():
+    """Fecha a conexão da thread atual, se houver."""
+    conn = getattr(_local, 'conn', None)
+    if conn is not None:
+        try:
+            conn.execute('PRAGMA optimize')
+        except sqlite3.Error:
+            pass
+        conn.close()
+    _local.conn = None
+    _local.caminho = None
+    _local.profundidade = 0
+    _local.arquivo_anexado = False
+
+
+@contextmanager
+def transacao():
+    """
+    Executa um bloco dentro de uma transação na conexão da thread.
+    Faz COMMIT ao sair normalmente e ROLLBACK em caso de exceção.
+    Transações aninhadas participam da transação externa.
+    """
+    conn = get_connection()
+    if _local.profundidade > 0:
+        _local.profundidade += 1
+        try:
+            yield conn
+        finally:
+            _local.profundidade -= 1
+        return
+
+    conn.execute('BEGIN IMMEDIATE')
+    _local.profundidade = 1
+    try:
+        yield conn
+    except BaseException:
+        _local.profundidade = 0
+        conn.execute('ROLLBACK')
+        raise
+    _local.profundidade = 0
+    try:
+        conn.execute('COMMIT')
+    except BaseException:
+        # COMMIT recusado (ex.: SQLITE_BUSY) deixa a transação aberta
+        if conn.in_transaction:
+            conn.execute('ROLLBACK')
+        raise
+
+
+# ==================== DIAGNÓSTICO DE CONSULTAS ====================
+
+# Coleta de estatísticas por comando SQL e log de consultas lentas.
+# Desativada, as conexões são sqlite3.Connection comuns (custo zero);
+# ativada, usam ConexaoInstrumentada. Alterar via configurar_diagnostico().
+DIAGNOSTICO = {
+    'ativo': False,
+    'limiar_ms': 100.0,     # comandos mais lentos que isso vão para o log
+    'arquivo': None,        # None = consultas_lentas.log ao lado do banco
+    'tamanho_max': 1_000_000,
+    'copias': 3,            # arquivos antigos mantidos pela rotação
+}
+
+# {sql normalizado: [chamadas, segundos, linhas, comandos]}
+_estatisticas: Dict[str, list] = {}
+_trava_estatisticas = threading.Lock()
+_normalizados: Dict[str, str] = {}
+_MAX_NORMALIZADOS = 1000
+_RE_ESPACOS = re.compile(r'\s+')
+
+_log_lentas = logging.getLogger('mvp_erp.consultas_lentas')
+_log_lentas.propagate = False
+_log_lentas.setLevel(logging.INFO)
+
+
+def _normalizar(sql: str) -> str:
+    """SQL em uma linha; os textos são constantes, então o resultado fica em cache."""
+    normalizado = _normalizados.get(sql)
+    if normalizado is None:
+        if len(_normalizados) >= _MAX_NORMALIZADOS:
+            _normalizados.clear()
+        normalizado = _normalizados[sql] = _RE_ESPACOS.sub(' ', sql).strip()
+    return normalizado
+
+
+def _acumular(sql: str, chamadas: int, segundos: float, linhas: int, comandos: int):
+    with _trava_estatisticas:
+        total = _estatisticas.get(sql)
+        if total is None:
+            total = _estatisticas[sql] = [0, 0.0, 0, 0]
+        total[0] += chamadas
+        total[1] += segundos
+        total[2] += linhas
+        total[3] += comandos
+
+
+def _configurar_log():
+    """(Re)aponta o log de consultas lentas para o arquivo configurado."""
+    for handler in list(_log_lentas.handlers):
+        _log_lentas.removeHandler(handler)
+        handler.close()
+    arquivo = DIAGNOSTICO['arquivo'] or os.path.join(
+        os.path.dirname(os.path.abspath(DB_PATH)), 'consultas_lentas.log')
+    handler = RotatingFileHandler(arquivo, maxBytes=DIAGNOSTICO['tamanho_max'],
+                                  backupCount=DIAGNOSTICO['copias'], encoding='utf-8')
+    handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+    _log_lentas.addHandler(handler)
+
+
+class _CursorInstrumentado(sqlite3.Cursor):
+    """
+    Cursor que mede cada comando: execução mais leitura das linhas.
+    O comando é encerrado (e registrado no log se passou do limiar) quando
+    as linhas acabam, o cursor executa outro comando ou é descartado.
+    """
+    _sql = None
+
+    def _iniciar(self, sql: str, executar):
+        self._encerrar()
+        conn = self.connection
+        comandos = conn.comandos
+        inicio = time.perf_counter()
+        try:
+            executar()
+        finally:
+            segundos = time.perf_counter() - inicio
+            self._sql = _normalizar(sql)
+            self._segundos = segundos
+            self._linhas = max(self.rowcount, 0)
+            _acumular(self._sql, 1, segundos, self._linhas, conn.comandos - comandos)
+        return self
+
+    def _marca(self):
+        return time.perf_counter(), self.connection.comandos
+
+    def _medir(self, marca, linhas: int):
+        if self._sql is not None:
+            segundos = time.perf_counter() - marca[0]
+            self._segundos += segundos
+            self._linhas += linhas
+            _acumular(self._sql, 0, segundos, linhas, self.connection.comandos - marca[1])
+
+    def _encerrar(self):
+        sql, self._sql = self._sql, None
+        if sql is not None and self._segundos * 1000 >= DIAGNOSTICO['limiar_ms']:
+            _log_lentas.info('%.1f ms | %d linha(s) | %s',
+                             self._segundos * 1000, self._linhas, sql)
+
+    def execute(self, sql, parametros=()):
+        return self._iniciar(sql, lambda: super(_CursorInstrumentado, self).execute(
+            sql, parametros))
+
+    def executemany(self, sql, parametros):
+        return self._iniciar(sql, lambda: super(_CursorInstrumentado, self).executemany(
+            sql, parametros))
+
+    def fetchone(self):
+        marca = self._marca()
+        linha = super().fetchone()
+        self._medir(marca, 0 if linha is None else 1)
+        if linha is None:
+            self._encerrar()
+        return linha
+
+    def fetchmany(self, size=None):
+        tamanho = self.arraysize if size is None else size
+        marca = self._marca()
+        linhas = super().fetchmany(tamanho)
+        self._medir(marca, len(linhas))
+        if len(linhas) < tamanho:
+            self._encerrar()
+        return linhas
+
+    def fetchall(self):
+        marca = self._marca()
+        linhas = super().fetchall()
+        self._medir(marca, len(linhas))
+        self._encerrar()
+        return linhas
+
+    def __next__(self):
+        marca = self._marca()
+        try:
+            linha = super().__next__()
+        except StopIteration:
+            self._medir(marca, 0)
+            self._encerrar()
+            raise
+        self._medir(marca, 1)
+        return linha
+
+    def close(self):
+        self._encerrar()
+        super().close()
+
+    def __del__(self):
+        self._encerrar()
+
+
+class ConexaoInstrumentada(sqlite3.Connection):
+    """
+    Conexão usada com o diagnóstico ativo. Todo comando passa por
+    _CursorInstrumentado; o trace callback do SQLite conta os comandos
+    realmente executados (inclusive os disparados por triggers).
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.comandos = 0
+        self.set_trace_callback(self._rastrear)
+
+    def _rastrear(self, _sql):
+        self.comandos += 1
+
+    def cursor(self, factory=_CursorInstrumentado):
+        return super().cursor(factory)
+
+    def execute(self, sql, parametros=()):
+        return self.cursor().execute(sql, parametros)
+
+    def executemany(self, sql, parametros):
+        return self.cursor().executemany(sql, parametros)
+
+
+def configurar_diagnostico(**opcoes):
+    """
+    Altera as opções de DIAGNOSTICO (ativo, limiar_ms, arquivo, ...).
+    A conexão da thread atual é fechada para que a próxima seja aberta
+    com (ou sem) instrumentação.
+    """
+    DIAGNOSTICO.update(opcoes)
+    if DIAGNOSTICO['ativo']:
+        _configurar_log()
+    fechar_conexao()
+
+
+def estatisticas_consultas(limite: int = 20) -> List[Dict]:
+    """
+    Retorna os `limite` comandos com maior tempo acumulado desde o último
+    limpar_estatisticas(): sql, chamadas, total_ms, media_ms, linhas e
+    comandos (executados pelo SQLite, incluindo triggers).
+    """
+    with _trava_estatisticas:
+        itens = [(sql, list(total)) for sql, total in _estatisticas.items()]
+    itens.sort(key=lambda item: item[1][1], reverse=True)
+    return [
+        {
+            'sql': sql,
+            'chamadas': chamadas,
+            'total_ms': segundos * 1000,
+            'media_ms': segundos * 1000 / chamadas if chamadas else 0.0,
+            'linhas': linhas,
+            'comandos': comandos,
+        }
+        for sql, (chamadas, segundos, linhas, comandos) in itens[:limite]
+    ]
+
+
+def limpar_estatisticas():
+    """Zera as estatísticas acumuladas pelo diagnóstico."""
+    with _trava_estatisticas:
+        _estatisticas.clear()
+
+
+# CNPJ só com dígitos; a busca usa exatamente esta expressão para que o
+# índice de expressão idx_empresas_cnpj seja aproveitado.
+CNPJ_NORMALIZADO = "replace(replace(replace(replace(cnpj, '.', ''), '/', ''), '-', ''), ' ', '')"
+
+# Índices secundários das consultas frequentes (ver services/*).
+# O rowid entra implicitamente no fim de cada índice, então índices
+# terminados em coluna de filtro também servem para ORDER BY id.
+# Criados pela migração 2; índices novos entram como nova migração.
+INDICES = [
+    # Contas a pagar/receber (inclusive liquidadas) ordenadas por vencimento
+    '''CREATE INDEX IF NOT EXISTS idx_operacoes_tipo_venc
+       ON operacoes (tipo, data_vencimento)''',
+    # listar_operacoes(status=...) ordenado por vencimento
+    '''CREATE INDEX IF NOT EXISTS idx_operacoes_status_venc
+       ON operacoes (status, data_vencimento)''',
+    # Histórico completo ordenado por vencimento
+    '''CREATE INDEX IF NOT EXISTS idx_operacoes_venc
+       ON operacoes (data_vencimento)''',
+    # Filtro por empresa (e chave estrangeira)
+    '''CREATE INDEX IF NOT EXISTS idx_operacoes_empresa_venc
+       ON operacoes (empresa_id, data_vencimento)''',
+    # Somente abertas: contas a pagar/receber e totais do resumo (cobre valor)
+    """CREATE INDEX IF NOT EXISTS idx_operacoes_abertas_tipo_venc
+       ON operacoes (tipo, data_vencimento, valor) WHERE status = 'ABERTO'""",
+    # Somente abertas: vencidas e seus totais (cobre valor)
+    """CREATE INDEX IF NOT EXISTS idx_operacoes_abertas_venc
+       ON operacoes (data_vencimento, valor) WHERE status = 'ABERTO'""",
+    # Pedidos por status e por cliente (ordem por id vem do rowid)
+    '''CREATE INDEX IF NOT EXISTS idx_pedidos_status
+       ON pedidos (status)''',
+    '''CREATE INDEX IF NOT EXISTS idx_pedidos_empresa
+       ON pedidos (empresa_id)''',
+    # Itens de um pedido
+    '''CREATE INDEX IF NOT EXISTS idx_itens_pedido_pedido
+       ON itens_pedido (pedido_id)''',
+    # Seleção de empresas ativas em ordem alfabética
+    '''CREATE INDEX IF NOT EXISTS idx_empresas_ativas_nome
+       ON empresas (nome) WHERE ativo = 1''',
+    # Busca de empresas por prefixo do nome (LIKE 'abc%' sem diferenciar caixa)
+    '''CREATE INDEX IF NOT EXISTS idx_empresas_nome_nocase
+       ON empresas (nome COLLATE NOCASE)''',
+    # Busca por CNPJ digitado com ou sem pontuação
+    f'''CREATE INDEX IF NOT EXISTS idx_empresas_cnpj
+       ON empresas ({CNPJ_NORMALIZADO})''',
+]
+
+# Índices de cobertura das telas de listagem (visão 'lista', ver
+# models.VISOES_*): a consulta é respondida só pelo índice, sem ler as
+# colunas de texto da tabela. O id vem logo após as colunas de filtro e
+# ordem, para que a paginação continue sem ordenação extra. Substituem os
+# índices da migração 2 que eram prefixo deles.
+INDICES_COBERTURA = [
+    # listar_operacoes(status=...) e vencidas
+    '''CREATE INDEX IF NOT EXISTS idx_operacoes_status_lista
+       ON operacoes (status, data_vencimento, id, tipo, empresa_id, valor, data_operacao)''',
+    'DROP INDEX IF EXISTS idx_operacoes_status_venc',
+    # Contas a pagar/receber em aberto e totais do resumo (cobre valor)
+    """CREATE INDEX IF NOT EXISTS idx_operacoes_abertas_tipo_lista
+       ON operacoes (tipo, data_vencimento, id, empresa_id, valor, data_operacao, status)
+       WHERE status = 'ABERTO'""",
+    'DROP INDEX IF EXISTS idx_operacoes_abertas_tipo_venc',
+    # Histórico completo
+    '''CREATE INDEX IF NOT EXISTS idx_operacoes_venc_lista
+       ON operacoes (data_vencimento, id, tipo, empresa_id, valor, data_operacao, status)''',
+    'DROP INDEX IF EXISTS idx_operacoes_venc',
+    # Pedidos por status, com os totais gravados
+    '''CREATE INDEX IF NOT EXISTS idx_pedidos_status_lista
+       ON pedidos (status, id, empresa_id, data_pedido, data_prevista_entrega,
+                   peso_total_kg, valor_total)''',
+    'DROP INDEX IF EXISTS idx_pedidos_status',
+]
+
+
+# Índices FTS5 mantidos por triggers. Opcionais: só são criados se o SQLite
+# tiver FTS5 (e o tokenizador usado); sem eles as buscas usam LIKE.
+
+# Nomes de empresa (trigram) para busca por trecho
+BUSCA_EMPRESAS_DDL = [
+    '''CREATE VIRTUAL TABLE IF NOT EXISTS empresas_fts USING fts5(
+           nome, content='empresas', content_rowid='id', tokenize='trigram'
+       )''',
+    '''CREATE TRIGGER IF NOT EXISTS trg_empresas_fts_insert
+       AFTER INSERT ON empresas
+       BEGIN
+           INSERT INTO empresas_fts (rowid, nome) VALUES (NEW.id, NEW.nome);
+       END''',
+    '''CREATE TRIGGER IF NOT EXISTS trg_empresas_fts_update
+       AFTER UPDATE OF nome ON empresas
+       BEGIN
+           INSERT INTO empresas_fts (empresas_fts, rowid, nome)
+           VALUES ('delete', OLD.id, OLD.nome);
+           INSERT INTO empresas_fts (rowid, nome) VALUES (NEW.id, NEW.nome);
+       END''',
+    '''CREATE TRIGGER IF NOT EXISTS trg_empresas_fts_delete
+       AFTER DELETE ON empresas
+       BEGIN
+           INSERT INTO empresas_fts (empresas_fts, rowid, nome)
+           VALUES ('delete', OLD.id, OLD.nome);
+       END''',
+]
+
+# Descrição e observação das operações (palavras, sem acentos)
+BUSCA_OPERACOES_DDL = [
+    '''CREATE VIRTUAL TABLE IF NOT EXISTS operacoes_fts USING fts5(
+           descricao, observacao, content='operacoes', content_rowid='id',
+           tokenize='unicode61 remove_diacritics 2'
+       )''',
+    '''CREATE TRIGGER IF NOT EXISTS trg_operacoes_fts_insert
+       AFTER INSERT ON operacoes
+       BEGIN
+           INSERT INTO operacoes_fts (rowid, descricao, observacao)
+           VALUES (NEW.id, NEW.descricao, NEW.observacao);
+       END''',
+    '''CREATE TRIGGER IF NOT EXISTS trg_operacoes_fts_update
+       AFTER UPDATE OF descricao, observacao ON operacoes
+       BEGIN
+           INSERT INTO operacoes_fts (operacoes_fts, rowid, descricao, observacao)
+           VALUES ('delete', OLD.id, OLD.descricao, OLD.observacao);
+           INSERT INTO operacoes_fts (rowid, descricao, observacao)
+           VALUES (NEW.id, NEW.descricao, NEW.observacao);
+       END''',
+    '''CREATE TRIGGER IF NOT EXISTS trg_operacoes_fts_delete
+       AFTER DELETE ON operacoes
+       BEGIN
+           INSERT INTO operacoes_fts (operacoes_fts, rowid, descricao, observacao)
+           VALUES ('delete', OLD.id, OLD.descricao, OLD.observacao);
+       END''',
+]
+
+# Observação dos pedidos
+BUSCA_PEDIDOS_DDL = [
+    '''CREATE VIRTUAL TABLE IF NOT EXISTS pedidos_fts USING fts5(
+           observacao, content='pedidos', content_rowid='id',
+           tokenize='unicode61 remove_diacritics 2'
+       )''',
+    '''CREATE TRIGGER IF NOT EXISTS trg_pedidos_fts_insert
+       AFTER INSERT ON pedidos
+       BEGIN
+           INSERT INTO pedidos_fts (rowid, observacao) VALUES (NEW.id, NEW.observacao);
+       END''',
+    '''CREATE TRIGGER IF NOT EXISTS trg_pedidos_fts_update
+       AFTER UPDATE OF observacao ON pedidos
+       BEGIN
+           INSERT INTO pedidos_fts (pedidos_fts, rowid, observacao)
+           VALUES ('delete', OLD.id, OLD.observacao);
+           INSERT INTO pedidos_fts (rowid, observacao) VALUES (NEW.id, NEW.observacao);
+       END''',
+    '''CREATE TRIGGER IF NOT EXISTS trg_pedidos_fts_delete
+       AFTER DELETE ON pedidos
+       BEGIN
+           INSERT INTO pedidos_fts (pedidos_fts, rowid, observacao)
+           VALUES ('delete', OLD.id, OLD.observacao);
+       END''',
+]
+
+# Tabela FTS -> DDL que a cria
+BUSCAS_FTS = {
+    'empresas_fts': BUSCA_EMPRESAS_DDL,
+    'operacoes_fts': BUSCA_OPERACOES_DDL,
+    'pedidos_fts': BUSCA_PEDIDOS_DDL,
+}
+
+
+def existe_tabela(nome: str) -> bool:
+    """Indica se a tabela (inclusive virtual) existe no banco atual."""
+    return get_connection().execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (nome,)
+    ).fetchone() is not None
+
+
+# Saldos por (tipo, status) mantidos pelos triggers de operacoes, para que
+# o resumo financeiro leia totais em O(1) em vez de somar todo o histórico.
+SALDOS_DDL = [
+    '''CREATE TABLE IF NOT EXISTS saldos_operacoes (
+           tipo TEXT NOT NULL,
+           status TEXT NOT NULL,
+           quantidade INTEGER NOT NULL DEFAULT 0,
+           total REAL NOT NULL DEFAULT 0,
+           PRIMARY KEY (tipo, status)
+       ) WITHOUT ROWID''',
+    '''CREATE TRIGGER IF NOT EXISTS trg_saldos_insert
+       AFTER INSERT ON operacoes
+       BEGIN
+           UPDATE saldos_operacoes
+           SET quantidade = quantidade + 1, total = total + NEW.valor
+           WHERE tipo = NEW.tipo AND status = NEW.status;
+       END''',
+    '''CREATE TRIGGER IF NOT EXISTS trg_saldos_update
+       AFTER UPDATE OF tipo, status, valor ON operacoes
+       BEGIN
+           UPDATE saldos_operacoes
+           SET quantidade = quantidade - 1, total = total - OLD.valor
+           WHERE tipo = OLD.tipo AND status = OLD.status;
+           UPDATE saldos_operacoes
+           SET quantidade = quantidade + 1, total = total + NEW.valor
+           WHERE tipo = NEW.tipo AND status = NEW.status;
+       END''',
+    '''CREATE TRIGGER IF NOT EXISTS trg_saldos_delete
+       AFTER DELETE ON operacoes
+       BEGIN
+           UPDATE saldos_operacoes
+           SET quantidade = quantidade - 1, total = total - OLD.valor
+           WHERE tipo = OLD.tipo AND status = OLD.status;
+       END''',
+]
+
+# Recalcula saldos_operacoes a partir de operacoes (uma linha por tipo/status,
+# inclusive as combinações sem nenhuma operação, que os triggers atualizam).
+RECALCULAR_SALDOS = [
+    'DELETE FROM saldos_operacoes',
+    '''INSERT INTO saldos_operacoes (tipo, status, quantidade, total)
+       SELECT t.tipo, s.status, COUNT(o.id), COALESCE(SUM(o.valor), 0)
+       FROM (SELECT 'COMPRA' AS tipo UNION ALL SELECT 'VENDA') t
+       CROSS JOIN (SELECT 'ABERTO' AS status UNION ALL SELECT 'LIQUIDADO'
+                   UNION ALL SELECT 'CANCELADO') s
+       LEFT JOIN operacoes o ON o.tipo = t.tipo AND o.status = s.status
+       GROUP BY t.tipo, s.status''',
+]
+
+
+# Peso e valor totais gravados no cabeçalho do pedido e mantidos pelos
+# triggers de itens_pedido, para que listagens, filtros e relatórios não
+# precisem ler os itens. Bancos existentes ganham as colunas via migração.
+TOTAIS_PEDIDOS_DDL = [
+    'ALTER TABLE pedidos ADD COLUMN peso_total_kg REAL NOT NULL DEFAULT 0',
+    'ALTER TABLE pedidos ADD COLUMN valor_total REAL NOT NULL DEFAULT 0',
+    '''CREATE TRIGGER IF NOT EXISTS trg_totais_pedido_insert
+       AFTER INSERT ON itens_pedido
+       BEGIN
+           UPDATE pedidos
+           SET peso_total_kg = peso_total_kg + NEW.peso_kg,
+               valor_total = valor_total + NEW.valor_total
+           WHERE id = NEW.pedido_id;
+       END''',
+    '''CREATE TRIGGER IF NOT EXISTS trg_totais_pedido_update
+       AFTER UPDATE OF pedido_id, peso_kg, valor_total ON itens_pedido
+       BEGIN
+           UPDATE pedidos
+           SET peso_total_kg = peso_total_kg - OLD.peso_kg,
+               valor_total = valor_total - OLD.valor_total
+           WHERE id = OLD.pedido_id;
+           UPDATE pedidos
+           SET peso_total_kg = peso_total_kg + NEW.peso_kg,
+               valor_total = valor_total + NEW.valor_total
+           WHERE id = NEW.pedido_id;
+       END''',
+    '''CREATE TRIGGER IF NOT EXISTS trg_totais_pedido_delete
+       AFTER DELETE ON itens_pedido
+       BEGIN
+           UPDATE pedidos
+           SET peso_total_kg = peso_total_kg - OLD.peso_kg,
+               valor_total = valor_total - OLD.valor_total
+           WHERE id = OLD.pedido_id;
+       END''',
+]
+
+# Recalcula os totais gravados a partir dos itens; {schema} é 'main' ou
+# 'arquivo' (o arquivo morto não tem triggers, recebe os totais na cópia).
+RECALCULAR_TOTAIS_PEDIDOS = '''
+    UPDATE {schema}.pedidos
+    SET peso_total_kg = (SELECT COALESCE(SUM(i.peso_kg), 0)
+                         FROM {schema}.itens_pedido i WHERE i.pedido_id = pedidos.id),
+        valor_total = (SELECT COALESCE(SUM(i.valor_total), 0)
+                       FROM {schema}.itens_pedido i WHERE i.pedido_id = pedidos.id)
+'''
+
+
+def verificar_agregado(divergencias: Callable[[sqlite3.Connection], List[Dict]],
+                       reconstrucao: Callable[[List[Dict]], Iterable[str]],
+                       corrigir: bool = False) -> List[Dict]:
+    """
+    Compara um agregado gravado (saldos_operacoes, totais dos pedidos) com
+    o recálculo a partir das linhas de origem. divergencias(conn) retorna
+    as diferenças encontradas; com corrigir=True e havendo alguma, executa
+    os comandos de reconstrucao(divergencias). Leitura e correção ficam na
+    mesma transação: nenhuma escrita entra entre a comparação e a
+    reconstrução. Retorna as divergências.
+    """
+    with transacao() as conn:
+        encontradas = divergencias(conn)
+        if corrigir and encontradas:
+            for sql in reconstrucao(encontradas):
+                conn.execute(sql)
+    return encontradas
+
+
+# Tabelas principais
+TABELAS_DDL = [
+    '''CREATE TABLE IF NOT EXISTS empresas (
+           id INTEGER PRIMARY KEY AUTOINCREMENT,
+           nome TEXT NOT NULL UNIQUE,
+           cnpj TEXT,
+           ativo INTEGER DEFAULT 1,
+           criado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+       )''',
+    # Operações (compra/venda)
+    '''CREATE TABLE IF NOT EXISTS operacoes (
+           id INTEGER PRIMARY KEY AUTOINCREMENT,
+           tipo TEXT NOT NULL CHECK(tipo IN ('COMPRA', 'VENDA')),
+           empresa_id INTEGER NOT NULL,
+           descricao TEXT,
+           valor REAL NOT NULL,
+           prazo_dias INTEGER DEFAULT 7,
+           data_operacao DATE NOT NULL,
+           data_vencimento DATE NOT NULL,
+           data_liquidacao DATE,
+           status TEXT DEFAULT 'ABERTO' CHECK(status IN ('ABERTO', 'LIQUIDADO', 'CANCELADO')),
+           observacao TEXT,
+           criado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+           FOREIGN KEY (empresa_id) REFERENCES empresas(id)
+       )''',
+    '''CREATE TABLE IF NOT EXISTS pedidos (
+           id INTEGER PRIMARY KEY AUTOINCREMENT,
+           empresa_id INTEGER NOT NULL,
+           data_pedido DATE NOT NULL,
+           prazo_dias INTEGER DEFAULT 7,
+           data_prevista_entrega DATE,
+           status TEXT DEFAULT 'ABERTO' CHECK(status IN ('ABERTO', 'BAIXADO', 'CANCELADO')),
+           placa TEXT,
+           data_baixa DATE,
+           observacao TEXT,
+           criado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+           FOREIGN KEY (empresa_id) REFERENCES empresas(id)
+       )''',
+    '''CREATE TABLE IF NOT EXISTS itens_pedido (
+           id INTEGER PRIMARY KEY AUTOINCREMENT,
+           pedido_id INTEGER NOT NULL,
+           tipo_embalagem TEXT NOT NULL,
+           quantidade REAL NOT NULL,
+           peso_por_unidade REAL NOT NULL DEFAULT 1.0,
+           peso_kg REAL NOT NULL,
+           preco_unitario REAL NOT NULL,
+           icms INTEGER DEFAULT 0,
+           valor_total REAL NOT NULL,
+           FOREIGN KEY (pedido_id) REFERENCES pedidos(id)
+       )''',
+]
+
+
+# ==================== MIGRAÇÕES ====================
+
+# Cada migração recebe um cursor dentro da transação que também grava
+# PRAGMA user_version; se falhar, nada dela fica aplicado. Bancos criados
+# antes das migrações (user_version 0) já têm parte dos objetos, por isso
+# a DDL usa IF NOT EXISTS. Mudanças de schema entram SEMPRE como uma nova
+# migração no fim da lista; migrações já publicadas não devem ser editadas.
+
+def _executar(*ddls):
+    """Migração que só executa DDL/SQL em sequência."""
+    def aplicar(cursor):
+        for lista in ddls:
+            for sql in lista:
+                cursor.execute(sql)
+    return aplicar
+
+
+def _criar_buscas_fts(cursor):
+    for tabela, ddls in BUSCAS_FTS.items():
+        if existe_tabela(tabela):
+            continue
+        # Savepoint: se o SQLite não suportar, nada fica pela metade
+        cursor.execute('SAVEPOINT busca_fts')
+        try:
+            for ddl in ddls:
+                cursor.execute(ddl)
+            # Indexa o conteúdo que já existia
+            cursor.execute(f"INSERT INTO {tabela} ({tabela}) VALUES ('rebuild')")
+        except sqlite3.OperationalError:
+            cursor.execute('ROLLBACK TO busca_fts')
+        cursor.execute('RELEASE busca_fts')
+
+
+# (descrição, aplicar(cursor)); a migração na posição i leva à versão i + 1
+MIGRACOES = [
+    ('tabelas principais', _executar(TABELAS_DDL)),
+    ('índices das consultas frequentes', _executar(INDICES)),
+    # Recalcula: bancos antigos ganham a tabela já com os saldos atuais
+    ('saldos por tipo/status', _executar(SALDOS_DDL, RECALCULAR_SALDOS)),
+    # Sem FTS5 no SQLite a migração é aplicada sem as tabelas (buscas usam LIKE)
+    ('busca textual (FTS5)', _criar_buscas_fts),
+    ('totais gravados nos pedidos', _executar(
+        TOTAIS_PEDIDOS_DDL, [RECALCULAR_TOTAIS_PEDIDOS.format(schema='main')])),
+    # ANALYZE: o planejador precisa das estatísticas para preferir os novos
+    ('índices de cobertura das listagens', _executar(INDICES_COBERTURA, ['ANALYZE'])),
+]
+
+VERSAO_SCHEMA = len(MIGRACOES)
+
+
+def versao_schema() -> int:
+    """Versão do schema gravada no banco (PRAGMA user_version)."""
+    return get_connection().execute('PRAGMA user_version').fetchone()[0]
+
+
+def init_db() -> List[int]:
+    """
+    Leva o banco até VERSAO_SCHEMA aplicando as migrações pendentes, cada
+    uma em sua transação. Com o schema em dia, custa uma leitura de PRAGMA.
+    Retorna as versões aplicadas agora.
+    """
+    atual = versao_schema()
+    aplicadas = []
+    for versao in range(atual + 1, VERSAO_SCHEMA + 1):
+        with transacao() as conn:
+            # Relido com o lock de escrita: outro terminal pode ter migrado
+            if versao_schema() >= versao:
+                continue
+            _descricao, aplicar = MIGRACOES[versao - 1]
+            aplicar(conn.cursor())
+            conn.execute(f'PRAGMA user_version = {versao}')
+        aplicadas.append(versao)
+    return aplicadas
+
+
+# ==================== ARQUIVO MORTO ====================
+
+# Registros encerrados antigos são movidos para um segundo arquivo SQLite
+# (ver services/arquivamento.py). As telas do dia a dia leem só o banco
+# principal; o histórico completo usa as views TEMP historico_*, que
+# juntam os dois arquivos com UNION ALL.
+
+# Tabela arquivada -> índices criados no arquivo morto
+TABELAS_ARQUIVADAS = {
+    'operacoes': ['data_vencimento', 'empresa_id, data_vencimento'],
+    'pedidos': ['empresa_id'],
+    'itens_pedido': ['pedido_id'],
+}
+
+
+def caminho_arquivo() -> str:
+    """Arquivo morto do banco atual: data/mvp.db -> data/mvp_arquivo.db."""
+    return os.path.splitext(DB_PATH)[0] + '_arquivo.db'
+
+
+def existe_arquivo() -> bool:
+    """Indica se o banco atual já tem arquivo morto."""
+    return os.path.exists(caminho_arquivo())
+
+
+def colunas_tabela(tabela: str, schema: str = 'main') -> List[str]:
+    """Nomes das colunas de `tabela`, na ordem de criação."""
+    return [row[1] for row in get_connection().execute(
+        f'PRAGMA {schema}.table_info({tabela})')]
+
+
+def _sincronizar_arquivo(cursor):
+    """
+    Cria no arquivo morto as tabelas arquivadas que faltam e as colunas
+    acrescentadas depois no banco principal (mesmos nomes e tipos, sem
+    restrições: os dados chegam já validados). Pedidos arquivados antes
+    das colunas de totais têm os totais recalculados a partir dos itens.
+    """
+    totais_novos = False
+    for tabela, indices in TABELAS_ARQUIVADAS.items():
+        colunas = cursor.execute(f'PRAGMA main.table_info({tabela})').fetchall()
+        existentes = set(colunas_tabela(tabela, 'arquivo'))
+        if not existentes:
+            definicoes = ', '.join(
+                f"{c['name']} {c['type']}{' PRIMARY KEY' if c['pk'] else ''}"
+                for c in colunas)
+            cursor.execute(f'CREATE TABLE arquivo.{tabela} ({definicoes})')
+        else:
+            for c in colunas:
+                if c['name'] not in existentes:
+                    cursor.execute(
+                        f"ALTER TABLE arquivo.{tabela} ADD COLUMN {c['name']} {c['type']}")
+                    totais_novos |= tabela == 'pedidos' and c['name'] == 'valor_total'
+        for indice in indices:
+            nome = f"idx_{tabela}_{indice.replace(', ', '_')}"
+            cursor.execute(
+                f'CREATE INDEX IF NOT EXISTS arquivo.{nome} ON {tabela} ({indice})')
+    if totais_novos:
+        cursor.execute(RECALCULAR_TOTAIS_PEDIDOS.format(schema='arquivo'))
+
+
+def anexar_arquivo(criar: bool = False) -> bool:
+    """
+    Anexa o arquivo morto à conexão da thread (schema 'arquivo') e cria as
+    views TEMP historico_<tabela>. Sem arquivo morto e com criar=False,
+    não faz nada e retorna False. Não pode ser chamada dentro de transacao().
+    """
     conn = get_connection()
-    cursor = conn.cursor()
-
-    # Tabela de empresas
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS empresas (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            nome TEXT NOT NULL UNIQUE,
-            cnpj TEXT,
-            ativo INTEGER DEFAULT 1,
-            criado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-
-    # Tabela de operações (compra/venda)
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS operacoes (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            tipo TEXT NOT NULL CHECK(tipo IN ('COMPRA', 'VENDA')),
-            empresa_id INTEGER NOT NULL,
-            descricao TEXT,
-            valor REAL NOT NULL,
-            prazo_dias INTEGER DEFAULT 7,
-            data_operacao DATE NOT NULL,
-            data_vencimento DATE NOT NULL,
-            data_liquidacao DATE,
-            status TEXT DEFAULT 'ABERTO' CHECK(status IN ('ABERTO', 'LIQUIDADO', 'CANCELADO')),
-            observacao TEXT,
-            criado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (empresa_id) REFERENCES empresas(id)
-        )
-    ''')
-
-    # Tabela de pedidos
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS pedidos (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            empresa_id INTEGER NOT NULL,
-            data_pedido DATE NOT NULL,
-            prazo_dias INTEGER DEFAULT 7,
-            data_prevista_entrega DATE,
-            status TEXT DEFAULT 'ABERTO' CHECK(status IN ('ABERTO', 'BAIXADO', 'CANCELADO')),
-            placa TEXT,
-            data_baixa DATE,
-            observacao TEXT,
-            criado_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (empresa_id) REFERENCES empresas(id)
-        )
-    ''')
-
-    # Tabela de itens do pedido
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS itens_pedido (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            pedido_id INTEGER NOT NULL,
-            tipo_embalagem TEXT NOT NULL,
-            quantidade REAL NOT NULL,
-            peso_por_unidade REAL NOT NULL DEFAULT 1.0,
-            peso_kg REAL NOT NULL,
-            preco_unitario REAL NOT NULL,
-            icms INTEGER DEFAULT 0,
-            valor_total REAL NOT NULL,
-            FOREIGN KEY (pedido_id) REFERENCES pedidos(id)
-        )
-    ''')
-
-    conn.commit()
-    conn.close()
+    if _local.arquivo_anexado:
+        return True
+    if not criar and not existe_arquivo():
+        return False
+
+    conn.execute('ATTACH DATABASE ? AS arquivo', (caminho_arquivo(),))
+    for nome in ('journal_mode', 'synchronous'):
+        conn.execute(f'PRAGMA arquivo.{nome} = {PRAGMAS[nome]}')
+    with transacao() as conn:
+        cursor = conn.cursor()
+        _sincronizar_arquivo(cursor)
+        for tabela in TABELAS_ARQUIVADAS:
+            colunas = ', '.join(colunas_tabela(tabela))
+            cursor.execute(f'''
+                CREATE TEMP VIEW IF NOT EXISTS historico_{tabela} AS
+                SELECT {colunas} FROM main.{tabela}
+                UNION ALL
+                SELECT {colunas} FROM arquivo.{tabela}
+            ''')
+    _local.arquivo_anexado = True
+    return True
+
+
+def tabela_historico(tabela: str, historico: bool = False) -> str:
+    """
+    Nome a usar no FROM das consultas de `tabela`: a própria tabela do
+    banco principal ou, com historico=True e havendo arquivo morto, a view
+    que inclui os registros arquivados.
+    """
+    if historico and anexar_arquivo():
+        return f'historico_{tabela}'
+    return tabela
 
 
 if __name__ == '__main__':
@@ -11,7 +11,7 @@ import os
 # Adiciona o diretório atual ao path para imports
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from database import init_db
+from database import init_db, fechar_conexao
 from menu import menu_principal
 from utils.helpers import limpar_tela
 
@@ -32,6 +32,8 @@ def main():
     except Exception as e:
         print(f"\nErro inesperado: {e}")
         sys.exit(1)
+    finally:
+        fechar_conexao()
 
 
 if __name__ == '__main__':
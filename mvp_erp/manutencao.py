@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Comandos de manutenção do banco de dados do ERP.
+
+Uso:
+    python3 mvp_erp/manutencao.py verificar-saldos [--corrigir]
+    python3 mvp_erp/manutencao.py verificar-totais-pedidos [--corrigir]
+    python3 mvp_erp/manutencao.py schema [--aplicar]
+    python3 mvp_erp/manutencao.py arquivar [--dias N | --antes-de AAAA-MM-DD] [--compactar]
+"""
+import argparse
+import os
+import sys
+from datetime import date, timedelta
+
+# Adiciona o diretório atual ao path para imports
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from database import (
+    init_db, fechar_conexao, get_connection, versao_schema, caminho_arquivo, MIGRACOES
+)
+from services.arquivamento import arquivar, DIAS_MANTIDOS
+from services.financeiro import verificar_saldos
+from services.pedidos import verificar_totais_pedidos
+from utils.helpers import formatar_moeda
+
+
+def cmd_verificar_saldos(args) -> int:
+    """Compara saldos_operacoes com o recálculo a partir de operacoes."""
+    divergencias = verificar_saldos(corrigir=args.corrigir)
+    if not divergencias:
+        print("Saldos consistentes.")
+        return 0
+
+    print(f"{'TIPO':<7} {'STATUS':<10} {'QTD GRAV.':>9} {'QTD REAL':>9} "
+          f"{'TOTAL GRAVADO':>18} {'TOTAL REAL':>18}")
+    print("-" * 76)
+    for d in divergencias:
+        print(f"{d['tipo']:<7} {d['status']:<10} {d['quantidade_gravada']:>9} "
+              f"{d['quantidade_real']:>9} {formatar_moeda(d['total_gravado']):>18} "
+              f"{formatar_moeda(d['total_real']):>18}")
+    if args.corrigir:
+        print("\nSaldos recalculados.")
+        return 0
+    print("\nUse --corrigir para recalcular os saldos.")
+    return 1
+
+
+def cmd_verificar_totais_pedidos(args) -> int:
+    """Compara os totais gravados nos pedidos com a soma dos itens."""
+    divergencias = verificar_totais_pedidos(corrigir=args.corrigir)
+    if not divergencias:
+        print("Totais dos pedidos consistentes.")
+        return 0
+
+    print(f"{'BANCO':<8} {'PEDIDO':>7} {'PESO GRAV.':>12} {'PESO REAL':>12} "
+          f"{'VALOR GRAVADO':>18} {'VALOR REAL':>18}")
+    print("-" * 80)
+    for d in divergencias[:50]:
+        peso = '-' if d['peso_gravado'] is None else f"{d['peso_gravado']:.2f}"
+        valor = '-' if d['valor_gravado'] is None else formatar_moeda(d['valor_gravado'])
+        print(f"{d['banco']:<8} {d['pedido_id']:>7} {peso:>12} {d['peso_real']:>12.2f} "
+              f"{valor:>18} {formatar_moeda(d['valor_real']):>18}")
+    if len(divergencias) > 50:
+        print(f"... e mais {len(divergencias) - 50} pedido(s)")
+    if args.corrigir:
+        print(f"\nTotais de {len(divergencias)} pedido(s) recalculados.")
+        return 0
+    print("\nUse --corrigir para recalcular os totais a partir dos itens.")
+    return 1
+
+
+def cmd_schema(args) -> int:
+    """Mostra a versão do schema e as migrações pendentes (ou as aplica)."""
+    atual = versao_schema()
+    print(f"Versão do schema: {atual} (código: {len(MIGRACOES)})\n")
+    for versao, (descricao, _aplicar) in enumerate(MIGRACOES, start=1):
+        situacao = "aplicada" if versao <= atual else "PENDENTE"
+        print(f"  {versao:>3}. {descricao:<45} {situacao}")
+
+    if atual >= len(MIGRACOES):
+        return 0
+    if not args.aplicar:
+        print("\nUse --aplicar para aplicar as migrações pendentes.")
+        return 1
+    aplicadas = init_db()
+    print(f"\n{len(aplicadas)} migração(ões) aplicada(s).")
+    return 0
+
+
+def cmd_arquivar(args) -> int:
+    """Move operações e pedidos encerrados antigos para o arquivo morto."""
+    corte = args.antes_de or date.today() - timedelta(days=args.dias)
+    print(f"Arquivando registros encerrados anteriores a {corte.strftime('%d/%m/%Y')}...")
+    resultado = arquivar(corte)
+    print(f"{resultado['operacoes']} operação(ões), {resultado['pedidos']} pedido(s) e "
+          f"{resultado['itens_pedido']} item(ns) movidos para {caminho_arquivo()} "
+          f"em {resultado['segundos']:.1f} s.")
+    if args.compactar:
+        print("Compactando o banco principal...")
+        get_connection().execute('VACUUM')
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manutenção do banco de dados do ERP.")
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    p = sub.add_parser("verificar-saldos",
+                       help="verifica (e corrige) os saldos agregados de operações")
+    p.add_argument("--corrigir", action="store_true",
+                   help="recalcula os saldos se houver divergência")
+    p.set_defaults(func=cmd_verificar_saldos)
+
+    p = sub.add_parser("verificar-totais-pedidos",
+                       help="verifica (e corrige) peso e valor totais gravados nos pedidos")
+    p.add_argument("--corrigir", action="store_true",
+                   help="recalcula os totais a partir dos itens se houver divergência")
+    p.set_defaults(func=cmd_verificar_totais_pedidos)
+
+    p = sub.add_parser("schema", help="mostra a versão do schema e as migrações pendentes")
+    p.add_argument("--aplicar", action="store_true",
+                   help="aplica as migrações pendentes")
+    p.set_defaults(func=cmd_schema, migrar=False)
+
+    p = sub.add_parser("arquivar",
+                       help="move operações e pedidos encerrados antigos para o arquivo morto")
+    corte = p.add_mutually_exclusive_group()
+    corte.add_argument("--dias", type=int, default=DIAS_MANTIDOS,
+                       help=f"arquiva o que for mais antigo que N dias (padrão: {DIAS_MANTIDOS})")
+    corte.add_argument("--antes-de", type=date.fromisoformat,
+                       help="arquiva o que for anterior a esta data (AAAA-MM-DD)")
+    p.add_argument("--compactar", action="store_true",
+                   help="executa VACUUM no banco principal ao final")
+    p.set_defaults(func=cmd_arquivar)
+
+    args = parser.parse_args()
+    try:
+        if getattr(args, "migrar", True):
+            init_db()
+        codigo = args.func(args)
+    finally:
+        fechar_conexao()
+    sys.exit(codigo)
+
+
+if __name__ == '__main__':
+    main()
@@ -2,29 +2,61 @@
 Sistema de menus e navegação do ERP.
 Interface terminal-first com navegação numérica.
 """
-from datetime import date
+from datetime import date, timedelta
+from typing import List
 
 from utils.helpers import (
     limpar_tela, cabecalho, pausar, confirmar,
     formatar_moeda, formatar_data,
     input_valor, input_inteiro, input_data
 )
+from utils.render import Coluna, exibir, moldura, tabela
+from database import (
+    DIAGNOSTICO, configurar_diagnostico, estatisticas_consultas, limpar_estatisticas,
+    existe_arquivo
+)
+from models import VISAO_LISTA
 from services.operacoes import (
     cadastrar_empresa, listar_empresas, buscar_empresa, desativar_empresa,
-    registrar_operacao, listar_operacoes, buscar_operacao,
-    liquidar_operacao, cancelar_operacao
+    pesquisar_empresas,
+    registrar_operacao, paginar_operacoes,
+    buscar_operacao, cancelar_operacao,
+    liquidar_operacoes, RESULTADO_OK, RESULTADO_INEXISTENTE
 )
 from services.financeiro import (
-    listar_contas_a_pagar, listar_contas_a_receber,
-    listar_vencidas, resumo_financeiro
+    paginar_contas_a_pagar, paginar_contas_a_receber,
+    paginar_vencidas, resumo_financeiro, relatorio_aging, FAIXAS_AGING
+)
+from services.projecao import projetar_fluxo_caixa, DIAS_PROJECAO
+from services.importacao import (
+    importar_operacoes_csv, COLUNAS_OBRIGATORIAS, COLUNAS_OPCIONAIS
 )
+from services.exportacao import exportar, CONJUNTOS
+from services.busca import JANELA_RANKING, LIMITE_BUSCA, pesquisar_texto, ranking_parcial
 from services.pedidos import (
-    cadastrar_pedido, adicionar_item_pedido,
-    listar_pedidos, buscar_pedido,
+    criar_pedido_completo, calcular_item,
+    paginar_pedidos, buscar_pedido,
     atualizar_data_entrega, baixar_pedido,
     PESO_POR_EMBALAGEM, LABEL_EMBALAGEM
 )
 
+# Linhas por página nas tabelas paginadas
+LINHAS_POR_PAGINA = 20
+
+# Empresas sugeridas por busca no seletor de empresa
+SUGESTOES_EMPRESA = 10
+
+# Colunas comuns às tabelas de operações e contas
+COL_ID = Coluna("ID", 5)
+COL_TIPO = Coluna("TIPO", 7)
+COL_EMPRESA = Coluna("EMPRESA", 20, flexivel=True)
+COL_VALOR = Coluna("VALOR", 15, '>', formatar_moeda)
+COL_VENCIMENTO = Coluna("VENCIMENTO", 12, formato=formatar_data)
+COL_STATUS = Coluna("STATUS", 10)
+
+# Contas a pagar/receber (o tipo já está no título)
+COLUNAS_CONTAS = [COL_ID, Coluna("EMPRESA", 25, flexivel=True), COL_VALOR, COL_VENCIMENTO]
+
 
 def menu_principal():
     """Menu principal do sistema."""
@@ -35,6 +67,7 @@ def menu_principal():
         print("  3. Financeiro")
         print("  4. Relatórios")
         print("  5. Pedidos ")
+        print("  6. Diagnóstico")
         print()
         print("  0. Sair")
         print()
@@ -51,6 +84,8 @@ def menu_principal():
             menu_relatorios()
         elif opcao == "5":
             menu_pedidos()
+        elif opcao == "6":
+            tela_diagnostico()
         elif opcao == "0":
             if confirmar("Deseja realmente sair? (S/N): "):
                 limpar_tela()
@@ -61,6 +96,124 @@ def menu_principal():
             pausar()
 
 
+# ==================== TABELA PAGINADA ====================
+
+def _ir_para_vencimento():
+    """Pergunta uma data e devolve o token que inicia a página nela."""
+    data = input_data("Ir para vencimento (DD/MM/AAAA): ")
+    return (data.isoformat(), 0)
+
+
+def _ir_para_pedido():
+    """Pergunta um nº de pedido e devolve o token que inicia a página nele."""
+    pedido_id = input_inteiro("Ir para pedido #: ", minimo=1)
+    return pedido_id + 1
+
+
+def tabela_paginada(titulo: str, colunas: List[Coluna], valores_linha, buscar_pagina,
+                    ir_para=None, totais=None, vazio: str = "Nenhum registro encontrado.",
+                    acoes=None, filtravel: bool = True):
+    """
+    Exibe uma tabela página a página, buscando só a página visível. Cada
+    página (cabeçalho, tabela e rodapé) vai para o terminal numa só escrita.
+
+    buscar_pagina(apos, filtro, limite) deve retornar uma Pagina do serviço;
+    valores_linha(item) retorna os valores das `colunas` (a formatação é da
+    Coluna); ir_para() (opcional) pergunta a posição e devolve o token de
+    continuação equivalente. A linha de totais (totais gerais, mesmas
+    colunas) é omitida enquanto houver filtro. acoes (opcional) é
+    {tecla: (rótulo, funcao)}: opções extras da tela; funcao() retorna True
+    para sair da tabela, senão a página é relida. filtravel=False esconde
+    o filtro por nome da empresa.
+    """
+    anteriores = []   # tokens das páginas já vistas (para voltar)
+    atual = None
+    filtro = None
+    numero = 1
+
+    while True:
+        pagina = buscar_pagina(atual, filtro, LINHAS_POR_PAGINA)
+
+        blocos = [moldura(titulo)]
+        if filtro:
+            blocos.append(f"Filtro: empresa contém '{filtro}'\n")
+        if not pagina.itens and atual is None:
+            blocos.append(vazio)
+        else:
+            blocos.append(tabela(colunas, map(valores_linha, pagina.itens),
+                                 totais=None if filtro else totais))
+        blocos.append(f"\nPágina {numero if numero else '?'}"
+                      f"{'' if pagina.proximo else ' (última)'}")
+        exibir(*blocos, limpar=True)
+        opcoes = []
+        if pagina.proximo:
+            opcoes.append("[ENTER] Próxima")
+        if anteriores:
+            opcoes.append("[A] Anterior")
+        if ir_para:
+            opcoes.append("[I] Ir para")
+        for tecla, (rotulo, _) in (acoes or {}).items():
+            opcoes.append(f"[{tecla}] {rotulo}")
+        if filtravel:
+            opcoes.append("[F] Filtrar")
+        opcoes.append("[0] Voltar")
+        opcao = input("  ".join(opcoes) + ": ").strip().upper()
+
+        if opcao == "" and pagina.proximo:
+            anteriores.append(atual)
+            atual = pagina.proximo
+            if numero:
+                numero += 1
+        elif opcao == "A" and anteriores:
+            atual = anteriores.pop()
+            if numero:
+                numero -= 1
+        elif opcao == "I" and ir_para:
+            anteriores.append(atual)
+            atual = ir_para()
+            numero = None  # posição absoluta desconhecida após o salto
+        elif acoes and opcao in acoes:
+            if acoes[opcao][1]():
+                break
+        elif opcao == "F" and filtravel:
+            filtro = input("Trecho do nome da empresa (vazio limpa o filtro): ").strip() or None
+            anteriores, atual, numero = [], None, 1
+        elif opcao in ("0", ""):
+            break
+
+
+# ==================== SELEÇÃO DE EMPRESA ====================
+
+def selecionar_empresa(rotulo: str = "empresa", vazio: str = "cancela"):
+    """
+    Seletor de empresa por busca: o usuário digita parte do nome ou do CNPJ
+    e escolhe entre as SUGESTOES_EMPRESA primeiras. Retorna a Empresa ou
+    None se a busca ficar vazia; `vazio` diz no prompt o que isso significa
+    para a tela ("cancela", "= todas"...).
+    """
+    while True:
+        termo = input(f"Buscar {rotulo} (nome ou CNPJ, vazio {vazio}): ").strip()
+        if not termo:
+            return None
+
+        empresas = pesquisar_empresas(termo, limite=SUGESTOES_EMPRESA)
+        if not empresas:
+            print(f"Nenhuma {rotulo} encontrada para '{termo}'.")
+            continue
+        if len(empresas) == 1:
+            print(f"  -> {empresas[0].nome}")
+            return empresas[0]
+
+        linhas = [f"  {i:>2}. {emp.nome:<30} {emp.cnpj or '':<18}"
+                  for i, emp in enumerate(empresas, 1)]
+        if len(empresas) == SUGESTOES_EMPRESA:
+            linhas.append("  (refine a busca para ver outras)")
+        exibir(*linhas)
+        escolha = input("Nº da opção (ENTER para nova busca): ").strip()
+        if escolha.isdigit() and 1 <= int(escolha) <= len(empresas):
+            return empresas[int(escolha) - 1]
+
+
 # ==================== CADASTROS ====================
 
 def menu_cadastros():
@@ -120,11 +273,8 @@ def tela_listar_empresas():
     if not empresas:
         print("Nenhuma empresa cadastrada.")
     else:
-        print(f"{'ID':<5} {'NOME':<30} {'CNPJ':<18}")
-        print("-" * 55)
-        for emp in empresas:
-            cnpj = emp.cnpj or "-"
-            print(f"{emp.id:<5} {emp.nome:<30} {cnpj:<18}")
+        exibir(tabela([COL_ID, Coluna("NOME", 30, flexivel=True), Coluna("CNPJ", 18)],
+                      ((emp.id, emp.nome, emp.cnpj or "-") for emp in empresas)))
 
     pausar()
 
@@ -166,6 +316,7 @@ def menu_operacoes():
         print("  3. Listar Operações")
         print("  4. Liquidar Operação")
         print("  5. Cancelar Operação")
+        print("  6. Importar Operações (CSV)")
         print()
         print("  0. Voltar")
         print()
@@ -182,6 +333,8 @@ def menu_operacoes():
             tela_liquidar_operacao()
         elif opcao == "5":
             tela_cancelar_operacao()
+        elif opcao == "6":
+            tela_importar_operacoes()
         elif opcao == "0":
             break
         else:
@@ -194,22 +347,13 @@ def tela_registrar_operacao(tipo: str):
     cabecalho(f"REGISTRAR {tipo}")
 
     # Selecionar empresa
-    empresas = listar_empresas()
-    if not empresas:
+    if not listar_empresas():
         print("Cadastre uma empresa primeiro!")
         pausar()
         return
 
-    print("Empresas disponíveis:")
-    for emp in empresas:
-        print(f"  {emp.id}. {emp.nome}")
-    print()
-
-    empresa_id = input_inteiro("ID da empresa: ", minimo=1)
-    empresa = buscar_empresa(empresa_id)
+    empresa = selecionar_empresa()
     if not empresa:
-        print("Empresa não encontrada!")
-        pausar()
         return
 
     descricao = input("Descrição (opcional): ").strip() or None
@@ -228,7 +372,7 @@ def tela_registrar_operacao(tipo: str):
         try:
             op_id = registrar_operacao(
                 tipo=tipo,
-                empresa_id=empresa_id,
+                empresa_id=empresa.id,
                 valor=valor,
                 prazo_dias=prazo,
                 descricao=descricao
@@ -258,95 +402,180 @@ def tela_listar_operacoes():
     elif filtro == "2":
         status = "LIQUIDADO"
 
-    operacoes = listar_operacoes(status=status)
-
-    limpar_tela()
-    cabecalho("OPERAÇÕES")
-
-    if not operacoes:
-        print("Nenhuma operação encontrada.")
-    else:
-        print(f"{'ID':<5} {'TIPO':<7} {'EMPRESA':<20} {'VALOR':>15} {'VENCIMENTO':<12} {'STATUS':<10}")
-        print("-" * 75)
-        for op in operacoes:
-            print(f"{op.id:<5} {op.tipo:<7} {op.empresa_nome[:20]:<20} {formatar_moeda(op.valor):>15} {formatar_data(op.data_vencimento):<12} {op.status:<10}")
-
-    pausar()
+    tabela_paginada(
+        "OPERAÇÕES",
+        [COL_ID, COL_TIPO, COL_EMPRESA, COL_VALOR, COL_VENCIMENTO, COL_STATUS],
+        lambda op: (op.id, op.tipo, op.empresa_nome, op.valor, op.data_vencimento, op.status),
+        lambda apos, filtro, limite: paginar_operacoes(
+            status=status, limite=limite, apos=apos, empresa_nome=filtro,
+            visao=VISAO_LISTA),
+        ir_para=_ir_para_vencimento,
+        vazio="Nenhuma operação encontrada.",
+    )
+
+
+def _ler_ids(texto: str) -> List[int]:
+    """Converte "12 15, 20-23" em [12, 15, 20, 21, 22, 23]; ValueError se inválido."""
+    ids = []
+    for parte in texto.replace(",", " ").split():
+        inicio, _, fim = parte.partition("-")
+        inicio = int(inicio)
+        fim = int(fim) if fim else inicio
+        if fim < inicio:
+            raise ValueError(parte)
+        ids.extend(range(inicio, fim + 1))
+    return ids
 
 
 def tela_liquidar_operacao():
-    """Tela para liquidar uma operação."""
-    cabecalho("LIQUIDAR OPERAÇÃO")
-
-    # Mostrar operações abertas
-    operacoes = listar_operacoes(status="ABERTO")
-
-    if not operacoes:
-        print("Nenhuma operação em aberto.")
-        pausar()
-        return
-
-    print(f"{'ID':<5} {'TIPO':<7} {'EMPRESA':<20} {'VALOR':>15} {'VENCIMENTO':<12}")
-    print("-" * 65)
-    for op in operacoes:
-        print(f"{op.id:<5} {op.tipo:<7} {op.empresa_nome[:20]:<20} {formatar_moeda(op.valor):>15} {formatar_data(op.data_vencimento):<12}")
-
-    print()
-    op_id = input_inteiro("ID da operação a liquidar (0 para cancelar): ", minimo=0)
-    if op_id == 0:
-        return
-
-    operacao = buscar_operacao(op_id)
-    if not operacao or operacao.status != "ABERTO":
-        print("Operação não encontrada ou já liquidada!")
-        pausar()
-        return
-
-    print(f"\nOperação: {operacao.tipo} - {operacao.empresa_nome} - {formatar_moeda(operacao.valor)}")
-
-    if confirmar("Confirma liquidação? (S/N): "):
-        if liquidar_operacao(op_id):
-            print("Operação liquidada com sucesso!")
+    """
+    Tela para liquidar uma ou várias operações abertas de uma vez. As
+    abertas que atendem aos filtros são mostradas página a página; [L]
+    pede os IDs (ou T para todas as filtradas).
+    """
+    cabecalho("LIQUIDAR OPERAÇÕES")
+
+    print("Filtros (ENTER ignora):")
+    empresa = selecionar_empresa(vazio="= todas")
+    tipo = {"1": "COMPRA", "2": "VENDA"}.get(
+        input("Tipo - 1. Compra  2. Venda [todos]: ").strip())
+    vencimento_ate = input_data("Vencimento até (DD/MM/AAAA) [todos]: ", permitir_vazio=True)
+    filtros = {
+        'tipo': tipo,
+        'empresa_id': empresa.id if empresa else None,
+        'vencimento_antes': vencimento_ate + timedelta(days=1) if vencimento_ate else None,
+    }
+    vistas = {}   # operações das páginas exibidas, para o total da seleção
+
+    def buscar_pagina(apos, filtro, limite):
+        pagina = paginar_operacoes(status="ABERTO", limite=limite, apos=apos,
+                                   visao=VISAO_LISTA, **filtros)
+        vistas.update((op.id, op) for op in pagina.itens)
+        return pagina
+
+    def liquidar() -> bool:
+        texto = input("IDs a liquidar (ex.: 12 15 20-25; T = todas as filtradas; vazio volta): ")
+        texto = texto.strip().upper()
+        if not texto:
+            return False
+        if texto == "T":
+            if not any(filtros.values()):
+                print("T exige ao menos um filtro (empresa, tipo ou vencimento).")
+                pausar()
+                return False
+            ids = None
+            print("\nTodas as operações abertas que atendem aos filtros serão liquidadas.")
         else:
-            print("Erro ao liquidar operação.")
+            try:
+                ids = _ler_ids(texto)
+            except ValueError:
+                print("Lista de IDs inválida!")
+                pausar()
+                return False
+            escolhidas = set(ids)
+            total = sum(vistas[i].valor for i in escolhidas if i in vistas)
+            print(f"\n{len(escolhidas)} operação(ões) selecionada(s) - total listado {formatar_moeda(total)}")
+        data_liquidacao = input_data("Data da liquidação (DD/MM/AAAA) [hoje]: ", permitir_vazio=True)
+
+        if confirmar("Confirma liquidação? (S/N): "):
+            if ids is None:
+                resultado = liquidar_operacoes(data_liquidacao=data_liquidacao, **filtros)
+            else:
+                resultado = liquidar_operacoes(ids, data_liquidacao)
+            liquidadas = sum(1 for r in resultado.values() if r == RESULTADO_OK)
+            print(f"\n{liquidadas} operação(ões) liquidada(s) com sucesso!")
+            for op_id, r in resultado.items():
+                if r == RESULTADO_INEXISTENTE:
+                    print(f"  ID {op_id}: não encontrada")
+                elif r != RESULTADO_OK:
+                    print(f"  ID {op_id}: não estava aberta ({r})")
+            pausar()
+        return False
 
-    pausar()
+    tabela_paginada(
+        "LIQUIDAR OPERAÇÕES",
+        [COL_ID, COL_TIPO, COL_EMPRESA, COL_VALOR, COL_VENCIMENTO],
+        lambda op: (op.id, op.tipo, op.empresa_nome, op.valor, op.data_vencimento),
+        buscar_pagina,
+        ir_para=_ir_para_vencimento,
+        vazio="Nenhuma operação em aberto.",
+        acoes={"L": ("Liquidar", liquidar)},
+        filtravel=False,
+    )
 
 
 def tela_cancelar_operacao():
-    """Tela para cancelar uma operação."""
-    cabecalho("CANCELAR OPERAÇÃO")
-
-    operacoes = listar_operacoes(status="ABERTO")
+    """
+    Tela para cancelar uma operação. As abertas são mostradas página a
+    página; [C] pede o ID da operação a cancelar.
+    """
+    def cancelar() -> bool:
+        op_id = input_inteiro("ID da operação a cancelar (0 para voltar): ", minimo=0)
+        if op_id == 0:
+            return False
+
+        operacao = buscar_operacao(op_id)
+        if not operacao or operacao.status != "ABERTO":
+            print("Operação não encontrada ou não pode ser cancelada!")
+            pausar()
+            return False
 
-    if not operacoes:
-        print("Nenhuma operação em aberto.")
-        pausar()
-        return
+        print(f"\nOperação: {operacao.tipo} - {operacao.empresa_nome} - {formatar_moeda(operacao.valor)}")
 
-    print(f"{'ID':<5} {'TIPO':<7} {'EMPRESA':<20} {'VALOR':>15}")
-    print("-" * 50)
-    for op in operacoes:
-        print(f"{op.id:<5} {op.tipo:<7} {op.empresa_nome[:20]:<20} {formatar_moeda(op.valor):>15}")
+        if confirmar("ATENÇÃO: Esta ação não pode ser desfeita. Confirma? (S/N): "):
+            if cancelar_operacao(op_id):
+                print("Operação cancelada com sucesso!")
+            else:
+                print("Erro ao cancelar operação.")
 
+        pausar()
+        return False
+
+    tabela_paginada(
+        "CANCELAR OPERAÇÃO",
+        [COL_ID, COL_TIPO, COL_EMPRESA, COL_VALOR, COL_VENCIMENTO],
+        lambda op: (op.id, op.tipo, op.empresa_nome, op.valor, op.data_vencimento),
+        lambda apos, filtro, limite: paginar_operacoes(
+            status="ABERTO", limite=limite, apos=apos, empresa_nome=filtro,
+            visao=VISAO_LISTA),
+        ir_para=_ir_para_vencimento,
+        vazio="Nenhuma operação em aberto.",
+        acoes={"C": ("Cancelar", cancelar)},
+    )
+
+
+def tela_importar_operacoes():
+    """Tela de importação de operações a partir de um arquivo CSV."""
+    cabecalho("IMPORTAR OPERAÇÕES (CSV)")
+
+    print("O arquivo deve ter cabeçalho, separado por ';' ou ','.")
+    print(f"Colunas obrigatórias: {', '.join(COLUNAS_OBRIGATORIAS)}")
+    print(f"Colunas opcionais:    {', '.join(COLUNAS_OPCIONAIS)}")
     print()
-    op_id = input_inteiro("ID da operação a cancelar (0 para voltar): ", minimo=0)
-    if op_id == 0:
+
+    caminho = input("Caminho do arquivo (vazio para cancelar): ").strip()
+    if not caminho:
         return
 
-    operacao = buscar_operacao(op_id)
-    if not operacao or operacao.status != "ABERTO":
-        print("Operação não encontrada ou não pode ser cancelada!")
+    try:
+        resultado = importar_operacoes_csv(caminho)
+    except (OSError, ValueError) as e:
+        print(f"\nErro ao importar: {e}")
         pausar()
         return
 
-    print(f"\nOperação: {operacao.tipo} - {operacao.empresa_nome} - {formatar_moeda(operacao.valor)}")
+    rejeitadas = resultado['rejeitadas']
+    print(f"\nImportadas:  {resultado['importadas']}")
+    print(f"Rejeitadas:  {len(rejeitadas)}")
+    print(f"Tempo:       {resultado['segundos']:.2f} s "
+          f"({resultado['linhas_por_segundo']:,.0f} linhas/s)")
 
-    if confirmar("ATENÇÃO: Esta ação não pode ser desfeita. Confirma? (S/N): "):
-        if cancelar_operacao(op_id):
-            print("Operação cancelada com sucesso!")
-        else:
-            print("Erro ao cancelar operação.")
+    if rejeitadas:
+        blocos = ["", tabela([Coluna("LINHA", 7), Coluna("MOTIVO", 60, flexivel=True)],
+                             rejeitadas[:20])]
+        if len(rejeitadas) > 20:
+            blocos.append(f"... e mais {len(rejeitadas) - 20} linha(s).")
+        exibir(*blocos)
 
     pausar()
 
@@ -361,6 +590,8 @@ def menu_financeiro():
         print("  2. Contas a Pagar")
         print("  3. Contas a Receber")
         print("  4. Contas Vencidas")
+        print("  5. Aging (Vencidas por Faixa de Atraso)")
+        print(f"  6. Fluxo de Caixa Projetado ({DIAS_PROJECAO} dias)")
         print()
         print("  0. Voltar")
         print()
@@ -375,6 +606,10 @@ def menu_financeiro():
             tela_contas_a_receber()
         elif opcao == "4":
             tela_contas_vencidas()
+        elif opcao == "5":
+            tela_aging()
+        elif opcao == "6":
+            tela_fluxo_caixa()
         elif opcao == "0":
             break
         else:
@@ -403,63 +638,98 @@ def tela_resumo_financeiro():
 
 def tela_contas_a_pagar():
     """Tela de contas a pagar."""
-    cabecalho("CONTAS A PAGAR")
-
-    contas = listar_contas_a_pagar()
-
-    if not contas:
-        print("Nenhuma conta a pagar em aberto.")
-    else:
-        total = 0
-        print(f"{'ID':<5} {'EMPRESA':<25} {'VALOR':>15} {'VENCIMENTO':<12}")
-        print("-" * 60)
-        for conta in contas:
-            print(f"{conta.id:<5} {conta.empresa_nome[:25]:<25} {formatar_moeda(conta.valor):>15} {formatar_data(conta.data_vencimento):<12}")
-            total += conta.valor
-        print("-" * 60)
-        print(f"{'TOTAL:':<31} {formatar_moeda(total):>15}")
-
-    pausar()
+    resumo = resumo_financeiro()
+    tabela_paginada(
+        "CONTAS A PAGAR",
+        COLUNAS_CONTAS,
+        lambda conta: (conta.id, conta.empresa_nome, conta.valor, conta.data_vencimento),
+        lambda apos, filtro, limite: paginar_contas_a_pagar(
+            limite=limite, apos=apos, empresa_nome=filtro, visao=VISAO_LISTA),
+        ir_para=_ir_para_vencimento,
+        totais=("TOTAL", None, resumo['total_a_pagar'], None),
+        vazio="Nenhuma conta a pagar em aberto.",
+    )
 
 
 def tela_contas_a_receber():
     """Tela de contas a receber."""
-    cabecalho("CONTAS A RECEBER")
-
-    contas = listar_contas_a_receber()
-
-    if not contas:
-        print("Nenhuma conta a receber em aberto.")
-    else:
-        total = 0
-        print(f"{'ID':<5} {'EMPRESA':<25} {'VALOR':>15} {'VENCIMENTO':<12}")
-        print("-" * 60)
-        for conta in contas:
-            print(f"{conta.id:<5} {conta.empresa_nome[:25]:<25} {formatar_moeda(conta.valor):>15} {formatar_data(conta.data_vencimento):<12}")
-            total += conta.valor
-        print("-" * 60)
-        print(f"{'TOTAL:':<31} {formatar_moeda(total):>15}")
-
-    pausar()
+    resumo = resumo_financeiro()
+    tabela_paginada(
+        "CONTAS A RECEBER",
+        COLUNAS_CONTAS,
+        lambda conta: (conta.id, conta.empresa_nome, conta.valor, conta.data_vencimento),
+        lambda apos, filtro, limite: paginar_contas_a_receber(
+            limite=limite, apos=apos, empresa_nome=filtro, visao=VISAO_LISTA),
+        ir_para=_ir_para_vencimento,
+        totais=("TOTAL", None, resumo['total_a_receber'], None),
+        vazio="Nenhuma conta a receber em aberto.",
+    )
 
 
 def tela_contas_vencidas():
     """Tela de contas vencidas."""
-    cabecalho("CONTAS VENCIDAS")
+    resumo = resumo_financeiro()
+    tabela_paginada(
+        "CONTAS VENCIDAS",
+        [COL_ID, COL_TIPO, COL_EMPRESA, COL_VALOR, COL_VENCIMENTO],
+        lambda conta: (conta.id, conta.tipo, conta.empresa_nome, conta.valor, conta.data_vencimento),
+        lambda apos, filtro, limite: paginar_vencidas(
+            limite=limite, apos=apos, empresa_nome=filtro, visao=VISAO_LISTA),
+        ir_para=_ir_para_vencimento,
+        totais=("TOTAL", None, None, resumo['vencidas_valor'], None),
+        vazio="Nenhuma conta vencida. Parabéns!",
+    )
+
+
+def tela_aging():
+    """Tela de aging: valores vencidos por empresa e faixa de dias de atraso."""
+    cabecalho("AGING - VENCIDAS POR FAIXA DE ATRASO")
+
+    relatorio = relatorio_aging()
+    if not relatorio:
+        print("Nenhuma conta vencida. Parabéns!")
+        pausar()
+        return
 
-    contas = listar_vencidas()
+    colunas = [Coluna("EMPRESA", 18, flexivel=True)]
+    colunas += [Coluna(f"{rotulo} DIAS", 14, '>', formatar_moeda) for rotulo, _, _ in FAIXAS_AGING]
+    colunas.append(Coluna("TOTAL", 14, '>', formatar_moeda))
+    blocos = []
+    for tipo, titulo in (('VENDA', "A RECEBER"), ('COMPRA', "A PAGAR")):
+        linhas = [linha for linha in relatorio if linha['tipo'] == tipo]
+        if not linhas:
+            continue
+
+        totais = [sum(valores) for valores in zip(*(linha['faixas'] for linha in linhas))]
+        blocos.append(f"\n{titulo}")
+        blocos.append(tabela(
+            colunas,
+            ((linha['empresa_nome'], *linha['faixas'], linha['total']) for linha in linhas),
+            totais=("TOTAL", *totais, sum(totais))))
+    exibir(*blocos)
 
-    if not contas:
-        print("Nenhuma conta vencida. Parabéns!")
-    else:
-        total = 0
-        print(f"{'ID':<5} {'TIPO':<7} {'EMPRESA':<20} {'VALOR':>15} {'VENCIMENTO':<12}")
-        print("-" * 65)
-        for conta in contas:
-            print(f"{conta.id:<5} {conta.tipo:<7} {conta.empresa_nome[:20]:<20} {formatar_moeda(conta.valor):>15} {formatar_data(conta.data_vencimento):<12}")
-            total += conta.valor
-        print("-" * 65)
-        print(f"{'TOTAL:':<33} {formatar_moeda(total):>15}")
+    pausar()
+
+
+def tela_fluxo_caixa():
+    """Tela de projeção diária do caixa (somente dias com movimento)."""
+    cabecalho(f"FLUXO DE CAIXA PROJETADO - {DIAS_PROJECAO} DIAS")
+
+    projecao = projetar_fluxo_caixa()
+    colunas = [Coluna("DATA", 12, formato=formatar_data)]
+    colunas += [Coluna(titulo, 16, '>', formatar_moeda) for titulo in ("ENTRADAS", "SAÍDAS", "SALDO")]
+    linhas = zip(projecao['datas'], projecao['entradas'], projecao['saidas'], projecao['saldo'])
+    exibir(
+        tabela(colunas, (linha for i, linha in enumerate(linhas)
+                         if not i or linha[1] or linha[2])),
+        "Vencidas em aberto estão consideradas no primeiro dia.",
+        f"\n  Saldo ao fim do período: {formatar_moeda(projecao['saldo_final'])}",
+        f"  Menor saldo:             {formatar_moeda(projecao['menor_saldo'])}"
+        f" em {formatar_data(projecao['data_menor_saldo'])}",
+    )
+    if projecao['vencimentos_invalidos']:
+        print(f"\n  ATENÇÃO: operações com vencimento inválido fora da projeção: "
+              f"{', '.join(projecao['vencimentos_invalidos'])}")
 
     pausar()
 
@@ -471,7 +741,8 @@ def menu_relatorios():
     while True:
         cabecalho("RELATÓRIOS")
         print("  1. Histórico de Operações")
-        print("  2. Exportar para Excel (em breve)")
+        print("  2. Exportar (CSV/Excel)")
+        print("  3. Buscar em Descrições e Observações")
         print()
         print("  0. Voltar")
         print()
@@ -481,8 +752,9 @@ def menu_relatorios():
         if opcao == "1":
             tela_historico()
         elif opcao == "2":
-            print("\nFuncionalidade em desenvolvimento...")
-            pausar()
+            tela_exportar()
+        elif opcao == "3":
+            tela_buscar_texto()
         elif opcao == "0":
             break
         else:
@@ -490,25 +762,98 @@ def menu_relatorios():
             pausar()
 
 
-def tela_historico():
-    """Tela de histórico completo de operações."""
-    cabecalho("HISTÓRICO DE OPERAÇÕES")
+def tela_exportar():
+    """Tela de exportação de relatórios para CSV ou Excel (XLSX)."""
+    cabecalho("EXPORTAR RELATÓRIO")
 
-    operacoes = listar_operacoes()
+    nomes = list(CONJUNTOS)
+    for i, nome in enumerate(nomes, 1):
+        print(f"  {i}. {CONJUNTOS[nome][0]}")
+    print()
+    print("  0. Voltar")
+    print()
 
-    if not operacoes:
-        print("Nenhuma operação registrada.")
-    else:
-        print(f"{'ID':<5} {'DATA':<12} {'TIPO':<7} {'EMPRESA':<18} {'VALOR':>14} {'STATUS':<10}")
-        print("-" * 70)
-        for op in operacoes:
-            print(f"{op.id:<5} {formatar_data(op.data_operacao):<12} {op.tipo:<7} {op.empresa_nome[:18]:<18} {formatar_moeda(op.valor):>14} {op.status:<10}")
+    opcao = input("Relatório: ").strip()
+    if not opcao.isdigit() or not 1 <= int(opcao) <= len(nomes):
+        return
+    conjunto = nomes[int(opcao) - 1]
+
+    formato = input("Formato - 1. Excel (XLSX)  2. CSV [1]: ").strip()
+    formato = 'csv' if formato == "2" else 'xlsx'
+
+    historico = (conjunto in ('operacoes', 'pedidos') and existe_arquivo()
+                 and confirmar("Incluir registros arquivados? (S/N): "))
+
+    padrao = f"{conjunto}_{date.today().strftime('%Y%m%d')}.{formato}"
+    caminho = input(f"Arquivo de destino [{padrao}]: ").strip() or padrao
+
+    print("\nExportando...")
+    try:
+        total = exportar(conjunto, caminho, formato, historico)
+    except (OSError, ValueError) as e:
+        print(f"\nErro ao exportar: {e}")
+        pausar()
+        return
 
+    print(f"\nExportação concluída! {total} linha(s) gravada(s) em {caminho}")
     pausar()
 
 
+def tela_buscar_texto():
+    """Busca textual em operações e pedidos, com os resultados mais relevantes primeiro."""
+    historico = existe_arquivo() and confirmar("Incluir registros arquivados? (S/N): ")
+    while True:
+        cabecalho("BUSCAR EM DESCRIÇÕES E OBSERVAÇÕES")
+        termo = input("Palavras (ex.: contrato 4521, lote 17; vazio volta): ").strip()
+        if not termo:
+            return
+
+        resultados = pesquisar_texto(termo, historico=historico)
+        print()
+        if not resultados:
+            print("Nada encontrado.")
+        else:
+            exibir(tabela(
+                [Coluna("ORIGEM", 10), Coluna("ID", 6), Coluna("EMPRESA", 18, flexivel=True),
+                 COL_STATUS, Coluna("DATA", 11, formato=formatar_data),
+                 Coluna("TRECHO", 40, flexivel=True)],
+                (("PEDIDO" if r['origem'] == 'PEDIDO' else r['tipo'], r['id'],
+                  r['empresa_nome'], r['status'], r['data'], ' '.join(r['trecho'].split()))
+                 for r in resultados)))
+            # Com menos resultados que o limite, nenhuma tabela passou da janela
+            if len(resultados) == LIMITE_BUSCA and ranking_parcial(termo):
+                print(f"\nMuitas ocorrências: ranqueadas só as {JANELA_RANKING} mais recentes "
+                      "de cada tipo. Acrescente palavras para refinar.")
+        pausar()
+
+
+def tela_historico():
+    """Tela de histórico completo de operações (opcionalmente com as arquivadas)."""
+    historico = existe_arquivo() and confirmar("Incluir operações arquivadas? (S/N): ")
+    tabela_paginada(
+        "HISTÓRICO DE OPERAÇÕES",
+        [COL_ID, Coluna("DATA", 12, formato=formatar_data), COL_TIPO,
+         Coluna("EMPRESA", 18, flexivel=True), Coluna("VALOR", 14, '>', formatar_moeda), COL_STATUS],
+        lambda op: (op.id, op.data_operacao, op.tipo, op.empresa_nome, op.valor, op.status),
+        lambda apos, filtro, limite: paginar_operacoes(
+            limite=limite, apos=apos, empresa_nome=filtro, historico=historico,
+            visao=VISAO_LISTA),
+        ir_para=_ir_para_vencimento,
+        vazio="Nenhuma operação registrada.",
+    )
+
+
 # ==================== PEDIDOS ====================
 
+def _formatar_kg(peso: float) -> str:
+    return f"{peso:.2f}"
+
+
+# Colunas das tabelas de pedidos
+COL_KG_TOTAL = Coluna("KG TOTAL", 10, '>', _formatar_kg)
+COL_VALOR_TOTAL = Coluna("VALOR TOTAL", 14, '>', formatar_moeda)
+COL_ENTREGA = Coluna("ENTREGA", 12, '^', formatar_data)
+
 def menu_pedidos():
     """Menu de pedidos."""
     while True:
@@ -574,44 +919,28 @@ def tela_cadastrar_pedido():
     cabecalho("CADASTRAR PEDIDO")
 
     # Selecionar cliente
-    empresas = listar_empresas()
-    if not empresas:
+    if not listar_empresas():
         print("Cadastre um cliente primeiro!")
         pausar()
         return
 
-    print("Clientes disponíveis:")
-    for emp in empresas:
-        print(f"  {emp.id}. {emp.nome}")
-    print()
-
-    empresa_id = input_inteiro("ID do cliente: ", minimo=1)
-    empresa = buscar_empresa(empresa_id)
+    empresa = selecionar_empresa("cliente")
     if not empresa:
-        print("Cliente não encontrado!")
-        pausar()
         return
 
     prazo = input_inteiro("Prazo (dias): ", minimo=1)
     data_entrega = input_data("Data prevista de entrega (DD/MM/AAAA): ", permitir_vazio=False)
     observacao = input("Observação (opcional): ").strip() or None
 
-    # Criar o pedido
-    try:
-        pedido_id = cadastrar_pedido(empresa_id, prazo, data_entrega, observacao)
-    except Exception as e:
-        print(f"\nErro ao criar pedido: {e}")
-        pausar()
-        return
-
-    # Loop para adicionar itens
-    itens_adicionados = []
+    # Itens ficam em memória e o pedido é gravado de uma vez ao final
+    itens = []
+    valores = []
     print()
     print("--- ITENS DO PEDIDO ---")
     print("Adicione os itens. Ao terminar, responda N ao adicionar outro.")
 
     while True:
-        print(f"\n  Item #{len(itens_adicionados) + 1}")
+        print(f"\n  Item #{len(itens) + 1}")
 
         tipo, qtd, peso_uni = _selecionar_embalagem()
 
@@ -623,83 +952,95 @@ def tela_cadastrar_pedido():
         icms_op = input("  Opção [2]: ").strip() or "2"
         icms = icms_op == "1"
 
-        peso_total = qtd * peso_uni
-        valor_base = peso_total * preco
-        valor_item = valor_base * 1.12 if icms else valor_base
+        calc = calcular_item(tipo, qtd, peso_uni, preco, icms)
 
         lbl = LABEL_EMBALAGEM[tipo]
         qtde_fmt = f"{qtd:.2f} kg" if tipo in ("AGRANEL", "BAG") else f"{qtd:.0f} unid."
         print(f"\n  Resumo do item:")
         print(f"    Embalagem:  {lbl}")
         print(f"    Quantidade: {qtde_fmt}")
-        print(f"    Peso total: {peso_total:.2f} kg")
+        print(f"    Peso total: {calc['peso_kg']:.2f} kg")
         print(f"    Preço/kg:   {formatar_moeda(preco)}")
         print(f"    ICMS:       {'Sim (12%)' if icms else 'Não'}")
-        print(f"    Valor item: {formatar_moeda(valor_item)}")
+        print(f"    Valor item: {formatar_moeda(calc['valor_total'])}")
 
         if confirmar("  Confirmar item? (S/N): "):
-            try:
-                adicionar_item_pedido(pedido_id, tipo, qtd, peso_uni, preco, icms)
-                itens_adicionados.append(valor_item)
-                print(f"  Item adicionado! Total parcial: {formatar_moeda(sum(itens_adicionados))}")
-            except Exception as e:
-                print(f"  Erro ao adicionar item: {e}")
+            itens.append({
+                "tipo_embalagem": tipo,
+                "quantidade": qtd,
+                "peso_por_unidade": peso_uni,
+                "preco_unitario": preco,
+                "icms": icms,
+            })
+            valores.append(calc["valor_total"])
+            print(f"  Item adicionado! Total parcial: {formatar_moeda(sum(valores))}")
 
         continuar = input("\nAdicionar outro item? (S/N) [N]: ").strip().upper()
         if continuar != "S":
             break
 
-    if not itens_adicionados:
-        print("\nAVISO: Pedido criado sem itens.")
+    if not itens and not confirmar("\nPedido sem itens. Gravar mesmo assim? (S/N): "):
+        print("\nPedido descartado.")
+        pausar()
+        return
+
+    try:
+        pedido_id = criar_pedido_completo(empresa.id, prazo, data_entrega,
+                                          itens, observacao)
+    except Exception as e:
+        print(f"\nErro ao criar pedido: {e}")
+        pausar()
+        return
 
     print(f"\nPedido #{pedido_id} cadastrado com sucesso!")
     print(f"  Cliente:          {empresa.nome}")
     print(f"  Prazo:            {prazo} dias")
     print(f"  Entrega prevista: {formatar_data(data_entrega)}")
-    print(f"  Itens:            {len(itens_adicionados)}")
-    if itens_adicionados:
-        print(f"  Valor total:      {formatar_moeda(sum(itens_adicionados))}")
+    print(f"  Itens:            {len(itens)}")
+    if itens:
+        print(f"  Valor total:      {formatar_moeda(sum(valores))}")
 
     pausar()
 
 
 def _exibir_pedido_detalhado(pedido):
     """Imprime os detalhes completos de um pedido."""
-    print(f"\n{'='*52}")
-    print(f"  Pedido #: {pedido.id}    Status: {pedido.status}")
-    print(f"  Cliente:  {pedido.empresa_nome}")
-    print(f"  Data:     {formatar_data(pedido.data_pedido)}")
-    print(f"  Prazo:    {pedido.prazo_dias} dias")
-    print(f"  Entrega:  {formatar_data(pedido.data_prevista_entrega)}")
+    blocos = [
+        f"\n{'='*52}",
+        f"  Pedido #: {pedido.id}    Status: {pedido.status}",
+        f"  Cliente:  {pedido.empresa_nome}",
+        f"  Data:     {formatar_data(pedido.data_pedido)}",
+        f"  Prazo:    {pedido.prazo_dias} dias",
+        f"  Entrega:  {formatar_data(pedido.data_prevista_entrega)}",
+    ]
     if pedido.status == "BAIXADO":
-        print(f"  Placa:    {pedido.placa or '-'}")
-        print(f"  Baixa:    {formatar_data(pedido.data_baixa)}")
+        blocos.append(f"  Placa:    {pedido.placa or '-'}")
+        blocos.append(f"  Baixa:    {formatar_data(pedido.data_baixa)}")
     if pedido.observacao:
-        print(f"  Obs:      {pedido.observacao}")
+        blocos.append(f"  Obs:      {pedido.observacao}")
 
     if pedido.itens:
-        print(f"\n  {'#':<3} {'EMBALAGEM':<16} {'QUANTIDADE':>12} {'PESO KG':>9} {'R$/KG':>10} {'ICMS':<6} {'TOTAL':>14}")
-        print(f"  {'-'*74}")
+        linhas = []
         for i, item in enumerate(pedido.itens, 1):
-            lbl = LABEL_EMBALAGEM.get(item.tipo_embalagem, item.tipo_embalagem)[:15]
             if item.tipo_embalagem in ("AGRANEL", "BAG"):
                 qtde_fmt = f"{item.quantidade:.2f} kg"
             else:
                 qtde_fmt = f"{item.quantidade:.0f} unid."
-            icms_txt = "Sim" if item.icms else "Não"
-            print(
-                f"  {i:<3} {lbl:<16} {qtde_fmt:>12} {item.peso_kg:>9.2f} "
-                f"{formatar_moeda(item.preco_unitario):>10} {icms_txt:<6} "
-                f"{formatar_moeda(item.valor_total):>14}"
-            )
-        print(f"  {'-'*74}")
-        print(
-            f"  {'TOTAL':<20} {'':>12} {pedido.peso_total_kg:>9.2f} "
-            f"{'':>10} {'':>6} {formatar_moeda(pedido.valor_total):>14}"
-        )
+            linhas.append((i, LABEL_EMBALAGEM.get(item.tipo_embalagem, item.tipo_embalagem),
+                           qtde_fmt, item.peso_kg, item.preco_unitario,
+                           "Sim" if item.icms else "Não", item.valor_total))
+        blocos.append("")
+        blocos.append(tabela(
+            [Coluna("#", 3), Coluna("EMBALAGEM", 16), Coluna("QUANTIDADE", 12, '>'),
+             Coluna("PESO KG", 9, '>', _formatar_kg), Coluna("R$/KG", 10, '>', formatar_moeda),
+             Coluna("ICMS", 6), Coluna("TOTAL", 14, '>', formatar_moeda)],
+            linhas,
+            totais=(None, "TOTAL", None, pedido.peso_total_kg, None, None, pedido.valor_total),
+            recuo="  "))
     else:
-        print("\n  (sem itens)")
-    print(f"{'='*52}")
+        blocos.append("\n  (sem itens)")
+    blocos.append(f"{'='*52}")
+    exibir(*blocos)
 
 
 def tela_consultar_pedidos():
@@ -743,55 +1084,34 @@ def _tela_listar_pedidos(empresa_id=None, titulo="TODOS OS PEDIDOS"):
     status_map = {"1": "ABERTO", "2": "BAIXADO"}
     status = status_map.get(filtro)
 
-    pedidos = listar_pedidos(empresa_id=empresa_id, status=status)
-
-    limpar_tela()
-    cabecalho(titulo)
-
-    if not pedidos:
-        print("Nenhum pedido encontrado.")
-    else:
-        print(f"{'ID':<5} {'CLIENTE':<22} {'DATA':^12} {'ENTREGA':^12} {'KG TOTAL':>10} {'VALOR TOTAL':>14} {'STATUS':<8}")
-        print("-" * 87)
-        for p in pedidos:
-            print(
-                f"{p.id:<5} {(p.empresa_nome or '')[:22]:<22} "
-                f"{formatar_data(p.data_pedido):^12} "
-                f"{formatar_data(p.data_prevista_entrega):^12} "
-                f"{p.peso_total_kg:>10.2f} "
-                f"{formatar_moeda(p.valor_total):>14} "
-                f"{p.status:<8}"
-            )
-
-    pausar()
+    tabela_paginada(
+        titulo,
+        [COL_ID, Coluna("CLIENTE", 22, flexivel=True), Coluna("DATA", 12, '^', formatar_data),
+         COL_ENTREGA, COL_KG_TOTAL, COL_VALOR_TOTAL, Coluna("STATUS", 8)],
+        lambda p: (p.id, p.empresa_nome, p.data_pedido, p.data_prevista_entrega,
+                   p.peso_total_kg, p.valor_total, p.status),
+        lambda apos, filtro, limite: paginar_pedidos(
+            empresa_id=empresa_id, status=status, apenas_totais=True,
+            limite=limite, apos=apos, empresa_nome=filtro, visao=VISAO_LISTA),
+        ir_para=_ir_para_pedido,
+        vazio="Nenhum pedido encontrado.",
+    )
 
 
 def _tela_listar_pedidos_por_cliente():
     """Lista pedidos filtrando por cliente."""
     cabecalho("PEDIDOS POR CLIENTE")
 
-    empresas = listar_empresas()
-    if not empresas:
+    if not listar_empresas():
         print("Nenhum cliente cadastrado.")
         pausar()
         return
 
-    print("Clientes:")
-    for emp in empresas:
-        print(f"  {emp.id}. {emp.nome}")
-    print()
-
-    empresa_id = input_inteiro("ID do cliente (0 para cancelar): ", minimo=0)
-    if empresa_id == 0:
-        return
-
-    empresa = buscar_empresa(empresa_id)
+    empresa = selecionar_empresa("cliente")
     if not empresa:
-        print("Cliente não encontrado!")
-        pausar()
         return
 
-    _tela_listar_pedidos(empresa_id=empresa_id,
+    _tela_listar_pedidos(empresa_id=empresa.id,
                          titulo=f"PEDIDOS - {empresa.nome.upper()}")
 
 
@@ -843,53 +1163,101 @@ def _tela_alterar_data_entrega():
 
 
 def tela_baixar_pedido():
-    """Tela de baixa de pedido (carregamento realizado)."""
-    cabecalho("BAIXA DE PEDIDO")
+    """
+    Tela de baixa de pedido (carregamento realizado). Os pedidos abertos
+    são mostrados página a página; [B] pede o ID do pedido a baixar.
+    """
+    def baixar() -> bool:
+        pedido_id = input_inteiro("ID do pedido a baixar (0 para cancelar): ", minimo=0)
+        if pedido_id == 0:
+            return False
+
+        pedido = buscar_pedido(pedido_id)
+        if not pedido or pedido.status != "ABERTO":
+            print("Pedido não encontrado ou já baixado!")
+            pausar()
+            return False
 
-    pedidos = listar_pedidos(status="ABERTO")
-    if not pedidos:
-        print("Nenhum pedido em aberto para baixar.")
-        pausar()
-        return
+        _exibir_pedido_detalhado(pedido)
 
-    print(f"{'ID':<5} {'CLIENTE':<25} {'ENTREGA':^12} {'KG TOTAL':>10} {'VALOR TOTAL':>14}")
-    print("-" * 70)
-    for p in pedidos:
-        print(
-            f"{p.id:<5} {(p.empresa_nome or '')[:25]:<25} "
-            f"{formatar_data(p.data_prevista_entrega):^12} "
-            f"{p.peso_total_kg:>10.2f} "
-            f"{formatar_moeda(p.valor_total):>14}"
-        )
+        print()
+        placa = input("Placa do veículo: ").strip().upper()
+        if not placa:
+            print("Placa é obrigatória!")
+            pausar()
+            return False
 
-    print()
-    pedido_id = input_inteiro("ID do pedido a baixar (0 para cancelar): ", minimo=0)
-    if pedido_id == 0:
-        return
+        from datetime import date as _date
+        print(f"\n  Data da baixa: {formatar_data(_date.today())}")
+        print(f"  Placa:         {placa}")
+
+        if confirmar("\nConfirmar baixa do pedido? (S/N): "):
+            if baixar_pedido(pedido_id, placa):
+                print(f"\nPedido #{pedido_id} baixado com sucesso!")
+            else:
+                print("Erro ao realizar baixa do pedido.")
 
-    pedido = buscar_pedido(pedido_id)
-    if not pedido or pedido.status != "ABERTO":
-        print("Pedido não encontrado ou já baixado!")
         pausar()
-        return
+        return False
 
-    _exibir_pedido_detalhado(pedido)
+    tabela_paginada(
+        "BAIXA DE PEDIDO",
+        [COL_ID, Coluna("CLIENTE", 25, flexivel=True), COL_ENTREGA,
+         COL_KG_TOTAL, COL_VALOR_TOTAL],
+        lambda p: (p.id, p.empresa_nome, p.data_prevista_entrega, p.peso_total_kg, p.valor_total),
+        lambda apos, filtro, limite: paginar_pedidos(
+            status="ABERTO", apenas_totais=True, limite=limite, apos=apos,
+            empresa_nome=filtro, visao=VISAO_LISTA),
+        ir_para=_ir_para_pedido,
+        vazio="Nenhum pedido em aberto para baixar.",
+        acoes={"B": ("Baixar", baixar)},
+    )
+
+
+# ==================== DIAGNÓSTICO ====================
+
+# Comandos exibidos na tela de diagnóstico
+COMANDOS_DIAGNOSTICO = 15
 
-    print()
-    placa = input("Placa do veículo: ").strip().upper()
-    if not placa:
-        print("Placa é obrigatória!")
-        pausar()
-        return
 
-    from datetime import date as _date
-    print(f"\n  Data da baixa: {formatar_data(_date.today())}")
-    print(f"  Placa:         {placa}")
+def tela_diagnostico():
+    """Estatísticas dos comandos SQL e controle do log de consultas lentas."""
+    while True:
+        cabecalho("DIAGNÓSTICO DE CONSULTAS")
+        situacao = "ATIVA" if DIAGNOSTICO['ativo'] else "DESATIVADA"
+        print(f"Coleta: {situacao}    Limiar de consulta lenta: {DIAGNOSTICO['limiar_ms']:g} ms")
+        print(f"Log: {DIAGNOSTICO['arquivo'] or 'consultas_lentas.log (pasta do banco)'}")
+        print()
 
-    if confirmar("\nConfirmar baixa do pedido? (S/N): "):
-        if baixar_pedido(pedido_id, placa):
-            print(f"\nPedido #{pedido_id} baixado com sucesso!")
+        estatisticas = estatisticas_consultas(COMANDOS_DIAGNOSTICO)
+        if not estatisticas:
+            print("Nenhum comando registrado. Ative a coleta e use o sistema.")
         else:
-            print("Erro ao realizar baixa do pedido.")
+            exibir(tabela(
+                [Coluna("CHAMADAS", 8, '>'), Coluna("TOTAL ms", 10, '>', lambda v: f"{v:.1f}"),
+                 Coluna("MÉDIA ms", 9, '>', lambda v: f"{v:.2f}"), Coluna("LINHAS", 8, '>'),
+                 Coluna("CMDS", 6, '>'), Coluna("SQL", 52, flexivel=True)],
+                ((e['chamadas'], e['total_ms'], e['media_ms'], e['linhas'], e['comandos'], e['sql'])
+                 for e in estatisticas)))
 
-    pausar()
+        print()
+        print("  1. Ativar/Desativar coleta")
+        print("  2. Alterar limiar de consulta lenta")
+        print("  3. Zerar estatísticas")
+        print()
+        print("  0. Voltar")
+        print()
+
+        opcao = input("Opção: ").strip()
+
+        if opcao == "1":
+            configurar_diagnostico(ativo=not DIAGNOSTICO['ativo'])
+        elif opcao == "2":
+            configurar_diagnostico(limiar_ms=input_valor("Limiar (ms): "))
+        elif opcao == "3":
+            limpar_estatisticas()
+        elif opcao == "0":
+            break
+        else:
+            print("Opção inválida!")
+            pausar()
@@ -1,12 +1,40 @@
 """
 Estruturas de dados (dataclasses) para o sistema ERP.
+
+Os modelos usam __slots__ (menos memória e acesso mais rápido em listas
+grandes). Cada modelo tem uma tupla COLUNAS_* com as colunas na ordem dos
+campos e um mapeador *_de_linha que constrói o objeto por posição.
+
+As consultas de listagem podem ler só parte das colunas (VISOES_*): as
+demais vêm como NULL na mesma posição, e o mapeador põe NAO_LIDO no campo
+(não None, que é um NULL de verdade).
 """
+from collections import UserList
 from dataclasses import dataclass, field
 from datetime import date, datetime
-from typing import Optional, List
+from typing import Optional, List, Any, Callable, Dict, Iterable, Tuple, Union
+
+
+class _NaoLido:
+    """
+    Valor dos campos que a visão da consulta não leu. Usá-lo como texto ou
+    condição levanta ValueError, em vez de passar por um valor vazio.
+    """
+    __slots__ = ()
+
+    def __repr__(self):
+        return 'NAO_LIDO'
+
+    def _erro(self, *_):
+        raise ValueError("Campo não lido pela visão da consulta (use VISAO_DETALHE)")
 
+    __bool__ = __str__ = _erro
 
-@dataclass
+
+NAO_LIDO = _NaoLido()
+
+
+@dataclass(slots=True)
 class Empresa:
     id: Optional[int] = None
     nome: str = ""
@@ -15,8 +43,18 @@ class Empresa:
     criado_em: Optional[datetime] = None
 
 
-@dataclass
+COLUNAS_EMPRESA = ('id', 'nome', 'cnpj', 'ativo', 'criado_em')
+
+
+def empresa_de_linha(row) -> Empresa:
+    """Constrói uma Empresa a partir de uma linha com COLUNAS_EMPRESA."""
+    id_, nome, cnpj, ativo, criado_em = row
+    return Empresa(id_, nome, cnpj, bool(ativo), criado_em)
+
+
+@dataclass(slots=True)
 class Operacao:
+    # Lida com VISAO_LISTA, os campos fora da visão valem NAO_LIDO
     id: Optional[int] = None
     tipo: str = ""  # COMPRA ou VENDA
     empresa_id: int = 0
@@ -33,7 +71,39 @@ class Operacao:
     empresa_nome: Optional[str] = None
 
 
-@dataclass
+# Colunas de operacoes na ordem dos campos (empresa_nome vem do JOIN, por último)
+COLUNAS_OPERACAO = (
+    'id', 'tipo', 'empresa_id', 'descricao', 'valor', 'prazo_dias',
+    'data_operacao', 'data_vencimento', 'data_liquidacao', 'status',
+    'observacao', 'criado_em',
+)
+
+
+# Visões das consultas: 'lista' traz só o que as telas de listagem exibem
+# (e cabe nos índices de cobertura); 'detalhe' traz todas as colunas.
+VISAO_LISTA = 'lista'
+VISAO_DETALHE = 'detalhe'
+
+VISOES_OPERACAO = {
+    VISAO_DETALHE: COLUNAS_OPERACAO,
+    VISAO_LISTA: ('id', 'tipo', 'empresa_id', 'valor', 'data_operacao',
+                  'data_vencimento', 'status'),
+}
+
+
+def operacao_de_linha(row, nao_lidas: Tuple[int, ...] = ()) -> Operacao:
+    """
+    Constrói uma Operacao a partir de COLUNAS_OPERACAO + empresa_nome; as
+    posições `nao_lidas` (ver posicoes_nao_lidas) viram NAO_LIDO.
+    """
+    if nao_lidas:
+        row = list(row)
+        for i in nao_lidas:
+            row[i] = NAO_LIDO
+    return Operacao(*row)
+
+
+@dataclass(slots=True)
 class ItemPedido:
     id: Optional[int] = None
     pedido_id: int = 0
@@ -46,8 +116,59 @@ class ItemPedido:
     valor_total: float = 0.0   # calculado
 
 
-@dataclass
+COLUNAS_ITEM_PEDIDO = (
+    'id', 'pedido_id', 'tipo_embalagem', 'quantidade', 'peso_por_unidade',
+    'peso_kg', 'preco_unitario', 'icms', 'valor_total',
+)
+
+
+def item_pedido_de_linha(row) -> ItemPedido:
+    """Constrói um ItemPedido a partir de uma linha com COLUNAS_ITEM_PEDIDO."""
+    (id_, pedido_id, tipo_embalagem, quantidade, peso_por_unidade,
+     peso_kg, preco_unitario, icms, valor_total) = row
+    return ItemPedido(id_, pedido_id, tipo_embalagem, quantidade,
+                      peso_por_unidade, peso_kg, preco_unitario,
+                      bool(icms), valor_total)
+
+
+class ItensSobDemanda(UserList):
+    """
+    Lista de itens de um pedido lida do banco só no primeiro acesso.
+    `carregar(pedido_id)` devolve os itens; os serviços passam um carregador
+    compartilhado pelos pedidos da mesma consulta, que busca os itens de
+    todos eles de uma vez. Fora isso, comporta-se como uma lista comum.
+    """
+
+    def __init__(self, initlist=None,
+                 carregar: Optional[Callable[[int], List[ItemPedido]]] = None,
+                 pedido_id: Optional[int] = None):
+        self._dados = None
+        self._carregar = carregar
+        self._pedido_id = pedido_id
+        if carregar is None:
+            super().__init__(initlist)
+
+    @property
+    def data(self) -> List[ItemPedido]:
+        if self._dados is None:
+            self._dados = self._carregar(self._pedido_id)
+            self._carregar = None
+        return self._dados
+
+    @data.setter
+    def data(self, valor: List[ItemPedido]):
+        self._dados = valor
+        self._carregar = None
+
+    @property
+    def carregado(self) -> bool:
+        """Indica se os itens já foram lidos (sem provocar a leitura)."""
+        return self._dados is not None
+
+
+@dataclass(slots=True)
 class Pedido:
+    # Lido com VISAO_LISTA, os campos fora da visão valem NAO_LIDO
     id: Optional[int] = None
     empresa_id: int = 0
     empresa_nome: Optional[str] = None
@@ -59,7 +180,81 @@ class Pedido:
     data_baixa: Optional[date] = None
     observacao: Optional[str] = None
     criado_em: Optional[datetime] = None
+    # Lista comum ou ItensSobDemanda (lida no primeiro acesso)
     itens: List[ItemPedido] = field(default_factory=list)
     # Campos calculados para exibição
     peso_total_kg: float = 0.0
     valor_total: float = 0.0
+
+
+# Colunas de pedidos na ordem dos campos; empresa_nome (do JOIN) é o 3º campo
+COLUNAS_PEDIDO = (
+    'id', 'empresa_id', 'data_pedido', 'prazo_dias', 'data_prevista_entrega',
+    'status', 'placa', 'data_baixa', 'observacao', 'criado_em',
+)
+
+
+VISOES_PEDIDO = {
+    VISAO_DETALHE: COLUNAS_PEDIDO,
+    VISAO_LISTA: ('id', 'empresa_id', 'data_pedido', 'data_prevista_entrega', 'status'),
+}
+
+
+def colunas_da_visao(alias: str, colunas: Tuple[str, ...],
+                     visoes: Dict[str, Tuple[str, ...]],
+                     visao: Union[str, Iterable[str]],
+                     obrigatorias: Iterable[str] = ('id',)) -> List[str]:
+    """
+    Expressões do SELECT para `colunas` (na ordem do modelo): "alias.coluna"
+    para as lidas pela visão e "NULL AS coluna" para as demais. `visao` é
+    o nome de uma visão de `visoes` ou um conjunto de colunas; as colunas
+    `obrigatorias` (chave e ordenação da paginação) são sempre lidas.
+    """
+    lidas = _colunas_lidas(colunas, visoes, visao, obrigatorias)
+    return [f"{alias}.{c}" if c in lidas else f"NULL AS {c}" for c in colunas]
+
+
+def posicoes_nao_lidas(colunas: Tuple[str, ...],
+                       visoes: Dict[str, Tuple[str, ...]],
+                       visao: Union[str, Iterable[str]],
+                       obrigatorias: Iterable[str] = ('id',)) -> Tuple[int, ...]:
+    """Posições em `colunas` que a visão não lê (o mapeador as marca NAO_LIDO)."""
+    lidas = _colunas_lidas(colunas, visoes, visao, obrigatorias)
+    return tuple(i for i, c in enumerate(colunas) if c not in lidas)
+
+
+def _colunas_lidas(colunas, visoes, visao, obrigatorias) -> set:
+    if isinstance(visao, str):
+        if visao not in visoes:
+            raise ValueError(f"Visão desconhecida: {visao}")
+        lidas = set(visoes[visao])
+    else:
+        lidas = set(visao)
+        desconhecidas = lidas - set(colunas)
+        if desconhecidas:
+            raise ValueError(f"Colunas desconhecidas: {', '.join(sorted(desconhecidas))}")
+    lidas.update(obrigatorias)
+    return lidas
+
+
+def pedido_de_linha(row, itens: Optional[List[ItemPedido]] = None,
+                    peso_total_kg: float = 0.0, valor_total: float = 0.0,
+                    nao_lidas: Tuple[int, ...] = ()) -> Pedido:
+    """
+    Constrói um Pedido a partir de uma linha com id, empresa_id, empresa_nome
+    e o restante de COLUNAS_PEDIDO, nessa ordem. `nao_lidas` são posições
+    em COLUNAS_PEDIDO (ver posicoes_nao_lidas) e viram NAO_LIDO.
+    """
+    valores = list(row[:11])
+    for i in nao_lidas:
+        # empresa_nome ocupa a 3ª posição da linha
+        valores[i if i < 2 else i + 1] = NAO_LIDO
+    return Pedido(*valores, [] if itens is None else itens,
+                  peso_total_kg, valor_total)
+
+
+@dataclass(slots=True)
+class Pagina:
+    itens: List[Any] = field(default_factory=list)
+    # Token de continuação para a próxima página (None = última página)
+    proximo: Optional[Any] = None
@@ -0,0 +1,120 @@
+"""
+Arquivamento de registros encerrados antigos no arquivo morto.
+
+Operações LIQUIDADAS/CANCELADAS e pedidos BAIXADOS/CANCELADOS anteriores
+à data de corte saem do banco principal e vão para o arquivo morto
+(database.caminho_arquivo()), em lotes. Assim os índices e varreduras das
+telas do dia a dia ficam só com os dados vivos; o histórico completo
+continua disponível pelas consultas com historico=True.
+
+Cada lote é copiado (INSERT OR IGNORE) e só então apagado do banco
+principal, em transações separadas: com WAL o COMMIT não é atômico entre
+dois arquivos, e nesta ordem uma interrupção no meio deixa no máximo uma
+cópia duplicada, que a próxima execução resolve, nunca um registro perdido.
+"""
+import time
+from datetime import date, timedelta
+from typing import Dict, Optional
+
+from database import anexar_arquivo, colunas_tabela, get_connection, transacao
+
+# Registros movidos por transação
+TAMANHO_LOTE = 5000
+
+# Idade padrão (em dias) dos registros arquivados
+DIAS_MANTIDOS = 365
+
+# Seleção dos ids de cada lote (a cópia e a exclusão usam a tabela temp)
+_LOTE_OPERACOES = '''
+    INSERT INTO temp.ids_arquivamento (id)
+    SELECT id FROM main.operacoes
+    WHERE status IN ('LIQUIDADO', 'CANCELADO') AND data_vencimento < ?
+    LIMIT ?
+'''
+
+_LOTE_PEDIDOS = '''
+    INSERT INTO temp.ids_arquivamento (id)
+    SELECT id FROM main.pedidos
+    WHERE status IN ('BAIXADO', 'CANCELADO') AND data_pedido < ?
+    LIMIT ?
+'''
+
+
+def _copiar(cursor, tabela: str, chave: str = 'id'):
+    """Copia para o arquivo morto as linhas de `tabela` do lote atual."""
+    colunas = ', '.join(colunas_tabela(tabela))
+    cursor.execute(f'''
+        INSERT OR IGNORE INTO arquivo.{tabela} ({colunas})
+        SELECT {colunas} FROM main.{tabela}
+        WHERE {chave} IN (SELECT id FROM temp.ids_arquivamento)
+    ''')
+    return cursor.rowcount
+
+
+def _apagar(cursor, tabela: str, chave: str = 'id'):
+    """Apaga do banco principal as linhas do lote que já estão no arquivo."""
+    cursor.execute(f'''
+        DELETE FROM main.{tabela}
+        WHERE {chave} IN (SELECT id FROM temp.ids_arquivamento)
+          AND id IN (SELECT id FROM arquivo.{tabela})
+    ''')
+    return cursor.rowcount
+
+
+def _mover_em_lotes(selecao: str, corte: str, lote: int, tabelas) -> Dict[str, int]:
+    """
+    Move lotes selecionados por `selecao` até não restar nenhum.
+    `tabelas` é [(tabela, coluna que referencia o id do lote)], na ordem
+    de cópia; a exclusão segue a ordem inversa (filhos antes do pai).
+    """
+    movidos = {tabela: 0 for tabela, _ in tabelas}
+    conn = get_connection()
+    while True:
+        with transacao():
+            cursor = conn.cursor()
+            cursor.execute('DELETE FROM temp.ids_arquivamento')
+            cursor.execute(selecao, (corte, lote))
+            if cursor.rowcount == 0:
+                return movidos
+            for tabela, chave in tabelas:
+                _copiar(cursor, tabela, chave)
+        with transacao():
+            cursor = conn.cursor()
+            apagados = 0
+            for tabela, chave in reversed(tabelas):
+                quantidade = _apagar(cursor, tabela, chave)
+                movidos[tabela] += quantidade
+                apagados += quantidade
+        if not apagados:
+            # Nada saiu do banco principal: repetir selecionaria o mesmo lote
+            return movidos
+
+
+def arquivar(data_corte: Optional[date] = None, lote: int = TAMANHO_LOTE) -> Dict:
+    """
+    Move para o arquivo morto as operações encerradas com vencimento e os
+    pedidos encerrados com data do pedido anteriores a `data_corte`
+    (padrão: hoje - DIAS_MANTIDOS). Pedidos levam seus itens.
+
+    Retorna as quantidades movidas (operacoes, pedidos, itens_pedido) e
+    o tempo gasto em segundos. Operações e pedidos em aberto nunca são
+    arquivados.
+    """
+    if data_corte is None:
+        data_corte = date.today() - timedelta(days=DIAS_MANTIDOS)
+    inicio = time.perf_counter()
+
+    anexar_arquivo(criar=True)
+    get_connection().execute(
+        'CREATE TEMP TABLE IF NOT EXISTS ids_arquivamento (id INTEGER PRIMARY KEY)')
+
+    corte = data_corte.isoformat()
+    resultado = _mover_em_lotes(_LOTE_OPERACOES, corte, lote, [('operacoes', 'id')])
+    resultado.update(_mover_em_lotes(
+        _LOTE_PEDIDOS, corte, lote, [('pedidos', 'id'), ('itens_pedido', 'pedido_id')]))
+    if any(resultado.values()):
+        # Sem estatísticas o planejador escolhe mal os índices do arquivo
+        # nas consultas de histórico (UNION ALL com o banco principal)
+        get_connection().execute('ANALYZE arquivo')
+    resultado['segundos'] = time.perf_counter() - inicio
+    return resultado
@@ -0,0 +1,185 @@
+"""
+Busca textual em descrições/observações de operações e observações de pedidos.
+
+Usa os índices FTS5 operacoes_fts e pedidos_fts (mantidos por triggers,
+ver database.BUSCAS_FTS): a busca percorre só as listas de ocorrência das
+palavras procuradas, em vez de um LIKE sobre todas as linhas. Se o SQLite
+não tiver FTS5, cai para LIKE com o mesmo formato de resultado.
+
+Registros movidos para o arquivo morto saem dos índices FTS junto com a
+linha (trigger de DELETE); com historico=True eles são procurados por LIKE
+nas tabelas do arquivo, que é consultado raramente.
+"""
+import re
+from typing import Dict, List
+
+from database import anexar_arquivo, get_connection, existe_tabela, tabela_historico
+
+# Resultados por busca
+LIMITE_BUSCA = 20
+
+# Ocorrências mais recentes consideradas no ranking, por tabela. O bm25 é
+# calculado por ocorrência; palavras muito comuns ("soja") casariam centenas
+# de milhares de linhas, então só as JANELA_RANKING mais novas são
+# ranqueadas. Abaixo disso o ranking cobre todas (ver ranking_parcial).
+JANELA_RANKING = 1000
+
+# Palavras da busca (letras/dígitos; pontuação separa palavras, como no índice)
+_RE_PALAVRA = re.compile(r'\w+')
+
+# O FTS5 devolve as ocorrências mais recentes (ordem de rowid, sem custo de
+# ordenação); o bm25 ordena só essas e as melhores são juntadas às tabelas.
+_OPERACOES_FTS = '''
+    SELECT 'OPERACAO' AS origem, o.id, o.tipo, e.nome AS empresa_nome,
+           o.status, o.valor, o.data_vencimento AS data,
+           f.trecho, f.relevancia
+    FROM (
+        SELECT rowid, bm25(operacoes_fts) AS relevancia,
+               snippet(operacoes_fts, -1, '[', ']', '...', 10) AS trecho
+        FROM operacoes_fts
+        WHERE operacoes_fts MATCH :expressao
+        ORDER BY rowid DESC
+        LIMIT :janela
+    ) f
+    CROSS JOIN operacoes o ON o.id = f.rowid
+    JOIN empresas e ON e.id = o.empresa_id
+    ORDER BY f.relevancia
+    LIMIT :limite
+'''
+
+_PEDIDOS_FTS = '''
+    SELECT 'PEDIDO' AS origem, p.id, 'PEDIDO' AS tipo, e.nome AS empresa_nome,
+           p.status, NULL AS valor, p.data_pedido AS data,
+           f.trecho, f.relevancia
+    FROM (
+        SELECT rowid, bm25(pedidos_fts) AS relevancia,
+               snippet(pedidos_fts, -1, '[', ']', '...', 10) AS trecho
+        FROM pedidos_fts
+        WHERE pedidos_fts MATCH :expressao
+        ORDER BY rowid DESC
+        LIMIT :janela
+    ) f
+    CROSS JOIN pedidos p ON p.id = f.rowid
+    JOIN empresas e ON e.id = p.empresa_id
+    ORDER BY f.relevancia
+    LIMIT :limite
+'''
+
+# Ocorrências de cada índice, contadas só até passar da janela
+_CONTAR_FTS = '''
+    SELECT count(*) FROM (
+        SELECT 1 FROM {indice} WHERE {indice} MATCH :expressao LIMIT :janela + 1
+    )
+'''
+
+_OPERACOES_LIKE = '''
+    SELECT 'OPERACAO' AS origem, o.id, o.tipo, e.nome AS empresa_nome,
+           o.status, o.valor, o.data_vencimento AS data,
+           COALESCE(o.descricao, '') || ' ' || COALESCE(o.observacao, '') AS trecho,
+           0 AS relevancia
+    FROM {tabela} o
+    JOIN empresas e ON e.id = o.empresa_id
+    WHERE {filtro}
+    ORDER BY o.id DESC
+    LIMIT ?
+'''
+
+_PEDIDOS_LIKE = '''
+    SELECT 'PEDIDO' AS origem, p.id, 'PEDIDO' AS tipo, e.nome AS empresa_nome,
+           p.status, NULL AS valor, p.data_pedido AS data,
+           p.observacao AS trecho, 0 AS relevancia
+    FROM {tabela} p
+    JOIN empresas e ON e.id = p.empresa_id
+    WHERE {filtro}
+    ORDER BY p.id DESC
+    LIMIT ?
+'''
+
+
+def _expressao_fts(palavras: List[str]) -> str:
+    """Todas as palavras; a última também como prefixo: soja lot -> "soja" AND "lot"*."""
+    return ' AND '.join([f'"{palavra}"' for palavra in palavras[:-1]]
+                        + [f'"{palavras[-1]}"*'])
+
+
+def _buscar_like(palavras: List[str], limite: int,
+                 operacoes: str = 'operacoes', pedidos: str = 'pedidos') -> List[Dict]:
+    """
+    Alternativa sem FTS5 (e busca no arquivo morto): cada palavra deve
+    aparecer em algum dos campos. `operacoes`/`pedidos` são as tabelas ou
+    views consultadas.
+    """
+    cursor = get_connection().cursor()
+    resultados = []
+    for sql, tabela, campos in ((_OPERACOES_LIKE, operacoes, ('o.descricao', 'o.observacao')),
+                                (_PEDIDOS_LIKE, pedidos, ('p.observacao',))):
+        filtro = ' AND '.join(
+            '(' + ' OR '.join(f'{campo} LIKE ?' for campo in campos) + ')'
+            for _ in palavras
+        )
+        params = [f'%{palavra}%' for palavra in palavras for _ in campos]
+        cursor.execute(sql.format(tabela=tabela, filtro=filtro), (*params, limite))
+        resultados.extend(dict(row) for row in cursor.fetchall())
+    return resultados[:limite]
+
+
+def pesquisar_texto(termo: str, limite: int = LIMITE_BUSCA,
+                    historico: bool = False) -> List[Dict]:
+    """
+    Procura as palavras de `termo` (todas; a última pode estar incompleta)
+    nas descrições e observações de operações e nas observações de pedidos.
+    Com historico=True inclui os registros do arquivo morto, listados
+    depois dos ativos (sem ranking: busca por LIKE).
+
+    Retorna até `limite` dicts ordenados por relevância (bm25), com origem
+    ('OPERACAO' ou 'PEDIDO'), id, tipo, empresa_nome, status, valor
+    (None para pedidos), data (vencimento ou data do pedido) e trecho
+    (texto encontrado, com as palavras entre colchetes).
+
+    O ranking cobre todas as ocorrências só até JANELA_RANKING por tabela;
+    acima disso são ranqueadas apenas as JANELA_RANKING mais recentes e
+    uma ocorrência antiga mais relevante pode ficar de fora. Use
+    ranking_parcial(termo) para saber se foi o caso.
+    """
+    palavras = _RE_PALAVRA.findall(termo)
+    if not palavras:
+        return []
+
+    historico = historico and anexar_arquivo()
+    if not (existe_tabela('operacoes_fts') and existe_tabela('pedidos_fts')):
+        return _buscar_like(palavras, limite, tabela_historico('operacoes', historico),
+                            tabela_historico('pedidos', historico))
+
+    params = {'expressao': _expressao_fts(palavras), 'janela': JANELA_RANKING,
+              'limite': limite}
+    cursor = get_connection().cursor()
+    resultados = []
+    for sql in (_OPERACOES_FTS, _PEDIDOS_FTS):
+        cursor.execute(sql, params)
+        resultados.extend(dict(row) for row in cursor.fetchall())
+
+    # bm25: quanto menor, mais relevante
+    resultados.sort(key=lambda r: r['relevancia'])
+    if historico and len(resultados) < limite:
+        # Arquivados não estão no FTS; relevância 0 os deixa após os ativos
+        resultados.extend(_buscar_like(palavras, limite - len(resultados),
+                                       'arquivo.operacoes', 'arquivo.pedidos'))
+    return resultados[:limite]
+
+
+def ranking_parcial(termo: str) -> bool:
+    """
+    Indica se `termo` casa mais de JANELA_RANKING ocorrências em alguma
+    tabela ativa, ou seja, se pesquisar_texto ranqueou só as mais recentes.
+    Conta no máximo JANELA_RANKING + 1 ocorrências por índice.
+    """
+    palavras = _RE_PALAVRA.findall(termo)
+    if not palavras or not (existe_tabela('operacoes_fts') and existe_tabela('pedidos_fts')):
+        return False
+    params = {'expressao': _expressao_fts(palavras), 'janela': JANELA_RANKING}
+    cursor = get_connection().cursor()
+    for indice in ('operacoes_fts', 'pedidos_fts'):
+        cursor.execute(_CONTAR_FTS.format(indice=indice), params)
+        if cursor.fetchone()[0] > JANELA_RANKING:
+            return True
+    return False
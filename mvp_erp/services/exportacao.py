@@ -0,0 +1,234 @@
+"""
+Serviço de exportação de relatórios para CSV e Excel (XLSX).
+
+As linhas são lidas do banco em lotes (iterar_*) e gravadas uma a uma,
+então a memória usada não cresce com o tamanho do histórico. O XLSX é
+escrito diretamente como um pacote SpreadsheetML compactado (zipfile),
+sem dependências externas.
+"""
+import csv
+import re
+import zipfile
+from datetime import date, datetime
+from typing import Callable, Dict, Iterable, Iterator, List, Tuple
+from xml.sax.saxutils import escape
+
+from services.operacoes import iterar_operacoes
+from services.financeiro import iterar_contas_a_pagar, iterar_contas_a_receber
+from services.pedidos import iterar_pedidos, LABEL_EMBALAGEM
+
+FORMATOS = ('csv', 'xlsx')
+
+# Tipos de coluna: define a formatação no CSV e o tipo da célula no XLSX
+TEXTO, NUMERO, INTEIRO, DATA = 'texto', 'numero', 'inteiro', 'data'
+
+# Data zero das datas seriais do Excel
+_EPOCA_EXCEL = date(1899, 12, 30)
+
+# Caracteres de controle não permitidos em XML 1.0
+_RE_INVALIDO_XML = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+# ==================== CONJUNTOS ====================
+
+_COLUNAS_OPERACAO = [
+    ('ID', INTEIRO), ('Tipo', TEXTO), ('Empresa', TEXTO), ('Descrição', TEXTO),
+    ('Valor', NUMERO), ('Prazo (dias)', INTEIRO), ('Data', DATA),
+    ('Vencimento', DATA), ('Liquidação', DATA), ('Status', TEXTO),
+    ('Observação', TEXTO),
+]
+
+
+def _linhas_operacao(operacoes) -> Iterator[tuple]:
+    for op in operacoes:
+        yield (op.id, op.tipo, op.empresa_nome, op.descricao, op.valor,
+               op.prazo_dias, op.data_operacao, op.data_vencimento,
+               op.data_liquidacao, op.status, op.observacao)
+
+
+_COLUNAS_PEDIDO = [
+    ('Pedido', INTEIRO), ('Cliente', TEXTO), ('Data', DATA),
+    ('Prazo (dias)', INTEIRO), ('Entrega prevista', DATA), ('Status', TEXTO),
+    ('Placa', TEXTO), ('Baixa', DATA), ('Observação', TEXTO),
+    ('Embalagem', TEXTO), ('Quantidade', NUMERO), ('Peso (kg)', NUMERO),
+    ('Preço/kg', NUMERO), ('ICMS', TEXTO), ('Valor item', NUMERO),
+]
+
+
+def _linhas_pedidos(historico: bool) -> Iterator[tuple]:
+    """Uma linha por item; pedidos sem itens geram uma linha só com o cabeçalho."""
+    for p in iterar_pedidos(historico=historico):
+        cabecalho = (p.id, p.empresa_nome, p.data_pedido, p.prazo_dias,
+                     p.data_prevista_entrega, p.status, p.placa, p.data_baixa,
+                     p.observacao)
+        if not p.itens:
+            yield cabecalho + (None,) * 6
+        for item in p.itens:
+            yield cabecalho + (
+                LABEL_EMBALAGEM.get(item.tipo_embalagem, item.tipo_embalagem),
+                item.quantidade, item.peso_kg, item.preco_unitario,
+                'Sim' if item.icms else 'Não', item.valor_total,
+            )
+
+
+# nome: (título, colunas, função(historico) que gera as linhas).
+# Contas a pagar/receber são só as abertas, que nunca vão para o arquivo morto.
+CONJUNTOS: Dict[str, Tuple[str, List[Tuple[str, str]], Callable[[bool], Iterable[tuple]]]] = {
+    'operacoes': ('Operações', _COLUNAS_OPERACAO,
+                  lambda historico: _linhas_operacao(iterar_operacoes(historico=historico))),
+    'contas_a_pagar': ('Contas a Pagar', _COLUNAS_OPERACAO,
+                       lambda historico: _linhas_operacao(iterar_contas_a_pagar())),
+    'contas_a_receber': ('Contas a Receber', _COLUNAS_OPERACAO,
+                         lambda historico: _linhas_operacao(iterar_contas_a_receber())),
+    'pedidos': ('Pedidos', _COLUNAS_PEDIDO, _linhas_pedidos),
+}
+
+
+# ==================== CSV ====================
+
+def _texto_csv(valor, tipo: str) -> str:
+    """Formata uma célula no padrão brasileiro (vírgula decimal, DD/MM/AAAA)."""
+    if valor is None:
+        return ''
+    if tipo == NUMERO:
+        return f"{valor:.2f}".replace('.', ',')
+    if tipo == DATA:
+        if isinstance(valor, str):
+            try:
+                valor = date.fromisoformat(valor[:10])
+            except ValueError:
+                return valor
+        return valor.strftime('%d/%m/%Y')
+    return str(valor)
+
+
+def _escrever_csv(caminho: str, colunas, linhas: Iterable[tuple]) -> int:
+    """Grava o CSV (';' e UTF-8 com BOM, como o Excel em português espera)."""
+    tipos = [tipo for _, tipo in colunas]
+    total = 0
+    with open(caminho, 'w', newline='', encoding='utf-8-sig') as arquivo:
+        escritor = csv.writer(arquivo, delimiter=';')
+        escritor.writerow([nome for nome, _ in colunas])
+        for linha in linhas:
+            escritor.writerow([_texto_csv(v, t) for v, t in zip(linha, tipos)])
+            total += 1
+    return total
+
+
+# ==================== XLSX ====================
+
+_CONTENT_TYPES = '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">
+<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>
+<Default Extension="xml" ContentType="application/xml"/>
+<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>
+<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>
+<Override PartName="/xl/styles.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>
+</Types>'''
+
+_RELS = '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>
+</Relationships>'''
+
+_WORKBOOK = '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">
+<sheets><sheet name="{nome}" sheetId="1" r:id="rId1"/></sheets>
+</workbook>'''
+
+_WORKBOOK_RELS = '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>
+<Relationship Id="rId2" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles" Target="styles.xml"/>
+</Relationships>'''
+
+# Estilos: 0 = padrão, 1 = data (formato 14), 2 = número com 2 casas (formato 4),
+# 3 = cabeçalho em negrito
+_STYLES = '''<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">
+<fonts count="2"><font><sz val="11"/><name val="Calibri"/></font><font><b/><sz val="11"/><name val="Calibri"/></font></fonts>
+<fills count="2"><fill><patternFill patternType="none"/></fill><fill><patternFill patternType="gray125"/></fill></fills>
+<borders count="1"><border><left/><right/><top/><bottom/><diagonal/></border></borders>
+<cellStyleXfs count="1"><xf numFmtId="0" fontId="0" fillId="0" borderId="0"/></cellStyleXfs>
+<cellXfs count="4">
+<xf numFmtId="0" fontId="0" fillId="0" borderId="0" xfId="0"/>
+<xf numFmtId="14" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>
+<xf numFmtId="4" fontId="0" fillId="0" borderId="0" xfId="0" applyNumberFormat="1"/>
+<xf numFmtId="0" fontId="1" fillId="0" borderId="0" xfId="0" applyFont="1"/>
+</cellXfs>
+</styleSheet>'''
+
+
+def _celula_texto(valor, estilo: int = 0) -> str:
+    texto = escape(_RE_INVALIDO_XML.sub('', str(valor)))
+    atributo = f' s="{estilo}"' if estilo else ''
+    return f'<c t="inlineStr"{atributo}><is><t xml:space="preserve">{texto}</t></is></c>'
+
+
+def _celula_xlsx(valor, tipo: str) -> str:
+    """Converte um valor na célula SpreadsheetML do tipo da coluna."""
+    if valor is None:
+        return '<c/>'
+    if tipo == NUMERO:
+        return f'<c s="2"><v>{float(valor)!r}</v></c>'
+    if tipo == INTEIRO:
+        return f'<c><v>{int(valor)}</v></c>'
+    if tipo == DATA:
+        if isinstance(valor, datetime):
+            valor = valor.date()
+        if isinstance(valor, str):
+            try:
+                valor = date.fromisoformat(valor[:10])
+            except ValueError:
+                return _celula_texto(valor)
+        return f'<c s="1"><v>{(valor - _EPOCA_EXCEL).days}</v></c>'
+    return _celula_texto(valor)
+
+
+def _escrever_xlsx(caminho: str, titulo: str, colunas, linhas: Iterable[tuple]) -> int:
+    """Grava o XLSX escrevendo a planilha linha a linha dentro do zip."""
+    tipos = [tipo for _, tipo in colunas]
+    total = 0
+    with zipfile.ZipFile(caminho, 'w', compression=zipfile.ZIP_DEFLATED) as pacote:
+        pacote.writestr('[Content_Types].xml', _CONTENT_TYPES)
+        pacote.writestr('_rels/.rels', _RELS)
+        # Nome de aba: até 31 caracteres, sem []:*?/\
+        nome_aba = escape(re.sub(r'[\[\]:*?/\\]', '', titulo)[:31])
+        pacote.writestr('xl/workbook.xml', _WORKBOOK.format(nome=nome_aba))
+        pacote.writestr('xl/_rels/workbook.xml.rels', _WORKBOOK_RELS)
+        pacote.writestr('xl/styles.xml', _STYLES)
+
+        with pacote.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as planilha:
+            planilha.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+                b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                b'<sheetData>'
+            )
+            cabecalho = ''.join(_celula_texto(nome, 3) for nome, _ in colunas)
+            planilha.write(f'<row>{cabecalho}</row>'.encode('utf-8'))
+            for linha in linhas:
+                celulas = ''.join(_celula_xlsx(v, t) for v, t in zip(linha, tipos))
+                planilha.write(f'<row>{celulas}</row>'.encode('utf-8'))
+                total += 1
+            planilha.write(b'</sheetData></worksheet>')
+    return total
+
+
+# ==================== API ====================
+
+def exportar(conjunto: str, caminho: str, formato: str = 'csv',
+             historico: bool = False) -> int:
+    """
+    Exporta um dos CONJUNTOS para `caminho` no formato 'csv' ou 'xlsx'.
+    Com historico=True inclui os registros do arquivo morto.
+    Retorna a quantidade de linhas de dados gravadas.
+    """
+    if conjunto not in CONJUNTOS:
+        raise ValueError(f"Conjunto inválido: {conjunto}")
+    if formato not in FORMATOS:
+        raise ValueError("Formato deve ser csv ou xlsx")
+
+    titulo, colunas, gerar_linhas = CONJUNTOS[conjunto]
+    if formato == 'csv':
+        return _escrever_csv(caminho, colunas, gerar_linhas(historico))
+    return _escrever_xlsx(caminho, titulo, colunas, gerar_linhas(historico))
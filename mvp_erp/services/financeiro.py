@@ -5,11 +5,34 @@ Regra de negócio:
 - COMPRA gera conta a PAGAR (saída de dinheiro)
 - VENDA gera conta a RECEBER (entrada de dinheiro)
 """
-from datetime import date
-from typing import List, Dict
+from datetime import date, timedelta
+from typing import Iterator, List, Dict, Optional
 
-from database import get_connection
-from models import Operacao
+from database import get_connection, verificar_agregado, RECALCULAR_SALDOS
+from models import Operacao, Pagina, VISAO_DETALHE
+from services.operacoes import (
+    iterar_operacoes, paginar_operacoes, Visao, TAMANHO_LOTE, TAMANHO_PAGINA
+)
+
+
+def iterar_contas_a_pagar(apenas_abertas: bool = True,
+                          lote: int = TAMANHO_LOTE) -> Iterator[Operacao]:
+    """Percorre as contas a pagar (COMPRA) em lotes, por vencimento."""
+    return iterar_operacoes(tipo='COMPRA',
+                            status='ABERTO' if apenas_abertas else None,
+                            lote=lote)
+
+
+def paginar_contas_a_pagar(apenas_abertas: bool = True,
+                           limite: int = TAMANHO_PAGINA,
+                           apos: Optional[tuple] = None,
+                           empresa_nome: Optional[str] = None,
+                           visao: Visao = VISAO_DETALHE) -> Pagina:
+    """Retorna uma página de contas a pagar (ver paginar_operacoes)."""
+    return paginar_operacoes(tipo='COMPRA',
+                             status='ABERTO' if apenas_abertas else None,
+                             limite=limite, apos=apos,
+                             empresa_nome=empresa_nome, visao=visao)
 
 
 def listar_contas_a_pagar(apenas_abertas: bool = True) -> List[Operacao]:
@@ -17,40 +40,27 @@ def listar_contas_a_pagar(apenas_abertas: bool = True) -> List[Operacao]:
     Lista contas a pagar (operações de COMPRA).
     Compras representam saída de dinheiro.
     """
-    conn = get_connection()
-    cursor = conn.cursor()
+    return list(iterar_contas_a_pagar(apenas_abertas))
+
+
+def iterar_contas_a_receber(apenas_abertas: bool = True,
+                            lote: int = TAMANHO_LOTE) -> Iterator[Operacao]:
+    """Percorre as contas a receber (VENDA) em lotes, por vencimento."""
+    return iterar_operacoes(tipo='VENDA',
+                            status='ABERTO' if apenas_abertas else None,
+                            lote=lote)
 
-    query = '''
-        SELECT o.*, e.nome as empresa_nome
-        FROM operacoes o
-        JOIN empresas e ON o.empresa_id = e.id
-        WHERE o.tipo = 'COMPRA'
-    '''
-
-    if apenas_abertas:
-        query += " AND o.status = 'ABERTO'"
-
-    query += ' ORDER BY o.data_vencimento'
-
-    cursor.execute(query)
-    rows = cursor.fetchall()
-    conn.close()
-
-    return [Operacao(
-        id=row['id'],
-        tipo=row['tipo'],
-        empresa_id=row['empresa_id'],
-        descricao=row['descricao'],
-        valor=row['valor'],
-        prazo_dias=row['prazo_dias'],
-        data_operacao=row['data_operacao'],
-        data_vencimento=row['data_vencimento'],
-        data_liquidacao=row['data_liquidacao'],
-        status=row['status'],
-        observacao=row['observacao'],
-        criado_em=row['criado_em'],
-        empresa_nome=row['empresa_nome']
-    ) for row in rows]
+
+def paginar_contas_a_receber(apenas_abertas: bool = True,
+                             limite: int = TAMANHO_PAGINA,
+                             apos: Optional[tuple] = None,
+                             empresa_nome: Optional[str] = None,
+                             visao: Visao = VISAO_DETALHE) -> Pagina:
+    """Retorna uma página de contas a receber (ver paginar_operacoes)."""
+    return paginar_operacoes(tipo='VENDA',
+                             status='ABERTO' if apenas_abertas else None,
+                             limite=limite, apos=apos,
+                             empresa_nome=empresa_nome, visao=visao)
 
 
 def listar_contas_a_receber(apenas_abertas: bool = True) -> List[Operacao]:
@@ -58,75 +68,27 @@ def listar_contas_a_receber(apenas_abertas: bool = True) -> List[Operacao]:
     Lista contas a receber (operações de VENDA).
     Vendas representam entrada de dinheiro.
     """
-    conn = get_connection()
-    cursor = conn.cursor()
+    return list(iterar_contas_a_receber(apenas_abertas))
 
-    query = '''
-        SELECT o.*, e.nome as empresa_nome
-        FROM operacoes o
-        JOIN empresas e ON o.empresa_id = e.id
-        WHERE o.tipo = 'VENDA'
-    '''
-
-    if apenas_abertas:
-        query += " AND o.status = 'ABERTO'"
-
-    query += ' ORDER BY o.data_vencimento'
-
-    cursor.execute(query)
-    rows = cursor.fetchall()
-    conn.close()
-
-    return [Operacao(
-        id=row['id'],
-        tipo=row['tipo'],
-        empresa_id=row['empresa_id'],
-        descricao=row['descricao'],
-        valor=row['valor'],
-        prazo_dias=row['prazo_dias'],
-        data_operacao=row['data_operacao'],
-        data_vencimento=row['data_vencimento'],
-        data_liquidacao=row['data_liquidacao'],
-        status=row['status'],
-        observacao=row['observacao'],
-        criado_em=row['criado_em'],
-        empresa_nome=row['empresa_nome']
-    ) for row in rows]
 
+def iterar_vencidas(lote: int = TAMANHO_LOTE) -> Iterator[Operacao]:
+    """Percorre as operações vencidas em lotes, por vencimento."""
+    return iterar_operacoes(status='ABERTO', vencimento_antes=date.today(), lote=lote)
 
-def listar_vencidas() -> List[Operacao]:
-    """Lista todas as operações vencidas (data de vencimento < hoje)."""
-    hoje = date.today().isoformat()
 
-    conn = get_connection()
-    cursor = conn.cursor()
+def paginar_vencidas(limite: int = TAMANHO_PAGINA,
+                     apos: Optional[tuple] = None,
+                     empresa_nome: Optional[str] = None,
+                     visao: Visao = VISAO_DETALHE) -> Pagina:
+    """Retorna uma página de operações vencidas (ver paginar_operacoes)."""
+    return paginar_operacoes(status='ABERTO', vencimento_antes=date.today(),
+                             limite=limite, apos=apos,
+                             empresa_nome=empresa_nome, visao=visao)
 
-    cursor.execute('''
-        SELECT o.*, e.nome as empresa_nome
-        FROM operacoes o
-        JOIN empresas e ON o.empresa_id = e.id
-        WHERE o.status = 'ABERTO' AND o.data_vencimento < ?
-        ORDER BY o.data_vencimento
-    ''', (hoje,))
 
-    rows = cursor.fetchall()
-    conn.close()
-
-    return [Operacao(
-        id=row['id'],
-        tipo=row['tipo'],
-        empresa_id=row['empresa_id'],
-        descricao=row['descricao'],
-        valor=row['valor'],
-        prazo_dias=row['prazo_dias'],
-        data_operacao=row['data_operacao'],
-        data_vencimento=row['data_vencimento'],
-        data_liquidacao=row['data_liquidacao'],
-        status=row['status'],
-        observacao=row['observacao'],
-        criado_em=row['criado_em'],
-        empresa_nome=row['empresa_nome']
-    ) for row in rows]
+def listar_vencidas() -> List[Operacao]:
+    """Lista todas as operações vencidas (data de vencimento < hoje)."""
+    return list(iterar_vencidas())
 
 
 def resumo_financeiro() -> Dict:
@@ -136,25 +98,22 @@ def resumo_financeiro() -> Dict:
     - Total a receber (vendas abertas)
     - Saldo projetado
     - Operações vencidas
+
+    Os totais em aberto vêm de saldos_operacoes (mantida por triggers);
+    as vencidas são uma consulta de intervalo no índice de abertas.
     """
     conn = get_connection()
     cursor = conn.cursor()
 
-    # Total a pagar
-    cursor.execute('''
-        SELECT COALESCE(SUM(valor), 0) as total
-        FROM operacoes
-        WHERE tipo = 'COMPRA' AND status = 'ABERTO'
-    ''')
-    total_pagar = cursor.fetchone()['total']
-
-    # Total a receber
+    # Totais a pagar (COMPRA) e a receber (VENDA)
     cursor.execute('''
-        SELECT COALESCE(SUM(valor), 0) as total
-        FROM operacoes
-        WHERE tipo = 'VENDA' AND status = 'ABERTO'
+        SELECT tipo, total
+        FROM saldos_operacoes
+        WHERE status = 'ABERTO'
     ''')
-    total_receber = cursor.fetchone()['total']
+    totais = {row['tipo']: row['total'] for row in cursor.fetchall()}
+    total_pagar = totais.get('COMPRA', 0.0)
+    total_receber = totais.get('VENDA', 0.0)
 
     # Vencidas
     hoje = date.today().isoformat()
@@ -165,8 +124,6 @@ def resumo_financeiro() -> Dict:
     ''', (hoje,))
     vencidas = cursor.fetchone()
 
-    conn.close()
-
     return {
         'total_a_pagar': total_pagar,
         'total_a_receber': total_receber,
@@ -174,3 +131,104 @@ def resumo_financeiro() -> Dict:
         'vencidas_qtd': vencidas['qtd'],
         'vencidas_valor': vencidas['total']
     }
+
+
+# Faixas de atraso do relatório de aging: (rótulo, dias mínimo, dias máximo)
+FAIXAS_AGING = (
+    ('1-7', 1, 7),
+    ('8-15', 8, 15),
+    ('16-30', 16, 30),
+    ('31-60', 31, 60),
+    ('60+', 61, None),
+)
+
+
+def relatorio_aging(data_base: Optional[date] = None) -> List[Dict]:
+    """
+    Agrupa as operações vencidas em aberto por tipo e empresa, somando o
+    valor em cada faixa de dias de atraso (FAIXAS_AGING).
+
+    Uma única consulta agrupada percorre o intervalo de vencimentos no
+    índice de abertas. Os limites de cada faixa são datas calculadas aqui,
+    então o banco só compara data_vencimento, sem conversão por linha.
+
+    Retorna uma lista de dicts (tipo, empresa_id, empresa_nome, faixas,
+    quantidade, total), com `faixas` na ordem de FAIXAS_AGING, ordenada
+    por tipo e maior total.
+    """
+    data_base = data_base or date.today()
+
+    somas = []
+    params = []
+    for _, minimo, maximo in FAIXAS_AGING:
+        # Atraso entre minimo e maximo dias = vencimento entre os limites
+        ate = (data_base - timedelta(days=minimo)).isoformat()
+        if maximo is None:
+            somas.append('SUM(CASE WHEN o.data_vencimento <= ? THEN o.valor ELSE 0.0 END)')
+            params.append(ate)
+        else:
+            somas.append('SUM(CASE WHEN o.data_vencimento BETWEEN ? AND ? '
+                         'THEN o.valor ELSE 0.0 END)')
+            params.extend(((data_base - timedelta(days=maximo)).isoformat(), ate))
+    colunas = ', '.join(f'{soma} AS faixa_{i}' for i, soma in enumerate(somas))
+
+    cursor = get_connection().cursor()
+    cursor.execute(f'''
+        SELECT o.tipo, o.empresa_id, e.nome AS empresa_nome,
+               COUNT(*) AS quantidade, SUM(o.valor) AS total, {colunas}
+        FROM operacoes o
+        JOIN empresas e ON e.id = o.empresa_id
+        WHERE o.status = 'ABERTO' AND o.data_vencimento < ?
+        GROUP BY o.tipo, o.empresa_id
+    ''', (*params, data_base.isoformat()))
+
+    relatorio = [{
+        'tipo': row['tipo'],
+        'empresa_id': row['empresa_id'],
+        'empresa_nome': row['empresa_nome'],
+        'faixas': list(row[5:]),
+        'quantidade': row['quantidade'],
+        'total': row['total'],
+    } for row in cursor]
+
+    relatorio.sort(key=lambda linha: (linha['tipo'], -linha['total']))
+    return relatorio
+
+
+def verificar_saldos(corrigir: bool = False, tolerancia: float = 0.005) -> List[Dict]:
+    """
+    Recalcula os saldos por tipo/status a partir de operacoes e compara
+    com saldos_operacoes. Retorna as divergências encontradas
+    (tipo, status, quantidade/total gravados e recalculados).
+    Com corrigir=True, regrava a tabela de saldos a partir do recálculo.
+    """
+    def divergencias(conn) -> List[Dict]:
+        gravados = {
+            (row['tipo'], row['status']): (row['quantidade'], row['total'])
+            for row in conn.execute('SELECT * FROM saldos_operacoes')
+        }
+        recalculados = {
+            (row['tipo'], row['status']): (row['quantidade'], row['total'])
+            for row in conn.execute('''
+                SELECT tipo, status, COUNT(*) AS quantidade, SUM(valor) AS total
+                FROM operacoes
+                GROUP BY tipo, status
+            ''')
+        }
+
+        encontradas = []
+        for chave in sorted(set(gravados) | set(recalculados)):
+            qtd_gravada, total_gravado = gravados.get(chave, (0, 0.0))
+            qtd_real, total_real = recalculados.get(chave, (0, 0.0))
+            if qtd_gravada != qtd_real or abs(total_gravado - total_real) > tolerancia:
+                encontradas.append({
+                    'tipo': chave[0],
+                    'status': chave[1],
+                    'quantidade_gravada': qtd_gravada,
+                    'quantidade_real': qtd_real,
+                    'total_gravado': total_gravado,
+                    'total_real': total_real,
+                })
+        return encontradas
+
+    return verificar_agregado(divergencias, lambda _: RECALCULAR_SALDOS, corrigir)
@@ -0,0 +1,181 @@
+"""
+Serviço de importação em lote de operações (compra/venda).
+
+Cada linha é validada em Python, os nomes de empresa são resolvidos por
+um mapa carregado uma única vez, e as linhas válidas são gravadas com
+executemany em transações de TAMANHO_LOTE linhas (um fsync por lote,
+não por linha).
+"""
+import csv
+import math
+import re
+import time
+from datetime import date, timedelta
+from typing import Dict, Iterable, Optional
+
+from database import transacao
+from services.operacoes import listar_empresas
+from utils.helpers import parse_data
+
+# Linhas gravadas por transação
+TAMANHO_LOTE = 5000
+
+# Colunas aceitas no CSV (cabeçalho obrigatório; as opcionais podem faltar)
+COLUNAS_OBRIGATORIAS = ('tipo', 'empresa', 'valor')
+COLUNAS_OPCIONAIS = ('prazo_dias', 'data_operacao', 'descricao', 'observacao')
+
+_INSERT = '''
+    INSERT INTO operacoes
+    (tipo, empresa_id, descricao, valor, prazo_dias, data_operacao, data_vencimento, observacao)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+
+def _mapa_empresas() -> Dict[str, tuple]:
+    """Retorna {NOME: (id, ativo)} de todas as empresas (do cache de empresas)."""
+    return {empresa.nome: (empresa.id, empresa.ativo)
+            for empresa in listar_empresas(apenas_ativas=False)}
+
+
+# Valor com vírgula decimal: 1234,56 ou com milhares agrupados, 1.234,56
+_RE_VALOR_VIRGULA = re.compile(r'[-+]?(\d{1,3}(\.\d{3})+|\d+),\d+')
+
+
+def _converter_valor(texto: str) -> float:
+    """
+    Aceita 1234.56, 1.234,56 ou R$ 1.234,56. Com vírgula, o ponto só vale
+    como separador de milhares (1,234.56 é rejeitado, não lido como 1,23).
+    """
+    texto = texto.replace('R$', '').strip()
+    if ',' in texto:
+        if not _RE_VALOR_VIRGULA.fullmatch(texto):
+            raise ValueError(texto)
+        texto = texto.replace('.', '').replace(',', '.')
+    return float(texto)
+
+
+def _validar(linha: dict, empresas: Dict[str, tuple], hoje: date,
+             datas: Dict[str, date]) -> tuple:
+    """
+    Converte uma linha do arquivo na tupla de parâmetros do INSERT.
+    Levanta ValueError com o motivo da rejeição.
+    `datas` guarda as datas já convertidas (poucas distintas por arquivo).
+    """
+    tipo = (linha.get('tipo') or '').strip().upper()
+    if tipo not in ('COMPRA', 'VENDA'):
+        raise ValueError(f"tipo inválido: {linha.get('tipo')!r}")
+
+    nome = (linha.get('empresa') or '').strip().upper()
+    if nome not in empresas:
+        raise ValueError(f"empresa não cadastrada: {nome!r}")
+    empresa_id, ativa = empresas[nome]
+    if not ativa:
+        raise ValueError(f"empresa desativada: {nome!r}")
+
+    try:
+        valor = _converter_valor(linha.get('valor') or '')
+    except ValueError:
+        raise ValueError(f"valor inválido: {linha.get('valor')!r}")
+    # float() também aceita nan e inf
+    if not math.isfinite(valor):
+        raise ValueError(f"valor inválido: {linha.get('valor')!r}")
+    if valor <= 0:
+        raise ValueError("valor deve ser maior que zero")
+
+    prazo_txt = (linha.get('prazo_dias') or '').strip()
+    try:
+        prazo_dias = int(prazo_txt) if prazo_txt else 7
+    except ValueError:
+        raise ValueError(f"prazo inválido: {prazo_txt!r}")
+    if prazo_dias < 0:
+        raise ValueError("prazo não pode ser negativo")
+
+    data_txt = (linha.get('data_operacao') or '').strip()
+    data_operacao = datas.get(data_txt) if data_txt else hoje
+    if data_operacao is None:
+        try:
+            data_operacao = datas[data_txt] = parse_data(data_txt)
+        except ValueError:
+            raise ValueError(f"data inválida: {data_txt!r}")
+
+    try:
+        data_vencimento = data_operacao + timedelta(days=prazo_dias)
+    except OverflowError:
+        # Vencimento além do ano 9999
+        raise ValueError(f"prazo inválido: {prazo_txt!r}")
+    return (tipo, empresa_id, (linha.get('descricao') or '').strip() or None,
+            valor, prazo_dias, data_operacao.isoformat(),
+            data_vencimento.isoformat(),
+            (linha.get('observacao') or '').strip() or None)
+
+
+def importar_operacoes(linhas: Iterable[dict], tamanho_lote: int = TAMANHO_LOTE,
+                       primeira_linha: int = 1) -> Dict:
+    """
+    Importa operações a partir de dicionários com as chaves de
+    COLUNAS_OBRIGATORIAS/COLUNAS_OPCIONAIS (valores em texto).
+
+    Retorna um resumo:
+    - importadas: quantidade gravada
+    - rejeitadas: lista de (número da linha, motivo)
+    - segundos / linhas_por_segundo: tempo total e vazão
+    """
+    inicio = time.perf_counter()
+    empresas = _mapa_empresas()
+    hoje = date.today()
+    datas = {}
+
+    importadas = 0
+    rejeitadas = []
+    lote = []
+
+    def gravar():
+        nonlocal importadas
+        with transacao() as conn:
+            conn.executemany(_INSERT, lote)
+        importadas += len(lote)
+        lote.clear()
+
+    for numero, linha in enumerate(linhas, start=primeira_linha):
+        try:
+            lote.append(_validar(linha, empresas, hoje, datas))
+        except ValueError as e:
+            rejeitadas.append((numero, str(e)))
+            continue
+        if len(lote) >= tamanho_lote:
+            gravar()
+    if lote:
+        gravar()
+
+    segundos = time.perf_counter() - inicio
+    total = importadas + len(rejeitadas)
+    return {
+        'importadas': importadas,
+        'rejeitadas': rejeitadas,
+        'segundos': segundos,
+        'linhas_por_segundo': total / segundos if segundos > 0 else 0.0,
+    }
+
+
+def importar_operacoes_csv(caminho: str, delimitador: Optional[str] = None,
+                           tamanho_lote: int = TAMANHO_LOTE) -> Dict:
+    """
+    Importa operações de um arquivo CSV com cabeçalho.
+    O delimitador (';' ou ',') é detectado quando não informado.
+    Levanta ValueError se faltar alguma coluna obrigatória.
+    """
+    with open(caminho, newline='', encoding='utf-8-sig') as arquivo:
+        if delimitador is None:
+            amostra = arquivo.readline()
+            delimitador = ';' if amostra.count(';') >= amostra.count(',') else ','
+            arquivo.seek(0)
+
+        leitor = csv.DictReader(arquivo, delimiter=delimitador)
+        cabecalho = [c.strip().lower() for c in (leitor.fieldnames or [])]
+        faltando = [c for c in COLUNAS_OBRIGATORIAS if c not in cabecalho]
+        if faltando:
+            raise ValueError(f"Colunas obrigatórias ausentes: {', '.join(faltando)}")
+        leitor.fieldnames = cabecalho
+
+        # Linha 1 é o cabeçalho
+        return importar_operacoes(leitor, tamanho_lote, primeira_linha=2)
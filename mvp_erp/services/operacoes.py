@@ -1,79 +1,190 @@
 """
 Serviço de operações: cadastro de empresas e registro de compra/venda.
 """
+import json
+import re
 from datetime import date, timedelta
-from typing import List, Optional
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
 
-from database import get_connection
-from models import Empresa, Operacao
+import database
+from database import (
+    get_connection, transacao, existe_tabela, tabela_historico, CNPJ_NORMALIZADO,
+    SUPORTA_RETURNING
+)
+from models import (
+    Empresa, Operacao, Pagina,
+    COLUNAS_EMPRESA, COLUNAS_OPERACAO, VISOES_OPERACAO, VISAO_DETALHE,
+    colunas_da_visao, posicoes_nao_lidas, empresa_de_linha, operacao_de_linha
+)
+
+# Linhas lidas do cursor por vez nas listagens em streaming
+TAMANHO_LOTE = 500
+
+# Itens por página nas listagens paginadas
+TAMANHO_PAGINA = 50
+
+# Máximo de ids por consulta IN (...) sem json_each; abaixo do limite antigo
+# de 999 variáveis
+TAMANHO_LOTE_IN = 500
+
+_SELECT_EMPRESA = f"SELECT {', '.join(COLUNAS_EMPRESA)} FROM empresas"
 
 
 # ==================== EMPRESAS ====================
 
-def cadastrar_empresa(nome: str, cnpj: Optional[str] = None) -> int:
-    """Cadastra uma nova empresa e retorna o ID."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        'INSERT INTO empresas (nome, cnpj) VALUES (?, ?)',
-        (nome.upper(), cnpj)
-    )
-    conn.commit()
-    empresa_id = cursor.lastrowid
-    conn.close()
-    return empresa_id
+# Cache em memória do cadastro de empresas (muda pouco e é lido por quase
+# toda tela). Carregado na primeira leitura; invalidado pelas escritas deste
+# módulo e revalidado por PRAGMA data_version, que muda quando outra conexão
+# (outro terminal) grava no banco.
+_cache_empresas = {
+    'validade': None,   # (geração da conexão, data_version) da carga atual
+    'por_id': {},       # id -> Empresa
+    'por_nome': {},     # NOME -> id
+    'ordenadas': [],    # todas as empresas, por nome
+    'acertos': 0,
+    'falhas': 0,
+}
 
 
-def listar_empresas(apenas_ativas: bool = True) -> List[Empresa]:
-    """Lista todas as empresas cadastradas."""
+def _validade_cache(conn) -> tuple:
+    versao = conn.execute('PRAGMA data_version').fetchone()[0]
+    return (database.geracao_conexao(), versao)
+
+
+def _empresas_em_cache() -> dict:
+    """Retorna o cache de empresas, recarregando-o se estiver inválido."""
     conn = get_connection()
-    cursor = conn.cursor()
+    validade = _validade_cache(conn)
+    cache = _cache_empresas
+    if cache['validade'] == validade:
+        cache['acertos'] += 1
+        return cache
 
-    if apenas_ativas:
-        cursor.execute('SELECT * FROM empresas WHERE ativo = 1 ORDER BY nome')
-    else:
-        cursor.execute('SELECT * FROM empresas ORDER BY nome')
+    cache['falhas'] += 1
+    ordenadas = [empresa_de_linha(row)
+                 for row in conn.execute(_SELECT_EMPRESA + ' ORDER BY nome')]
+    cache['ordenadas'] = ordenadas
+    cache['por_id'] = {empresa.id: empresa for empresa in ordenadas}
+    cache['por_nome'] = {empresa.nome: empresa.id for empresa in ordenadas}
+    cache['validade'] = validade
+    return cache
+
+
+def invalidar_cache_empresas():
+    """Descarta o cache de empresas; a próxima leitura recarrega do banco."""
+    _cache_empresas['validade'] = None
+
+
+def estatisticas_cache_empresas() -> Dict:
+    """Retorna acertos, falhas (recargas) e quantidade de empresas em cache."""
+    return {
+        'acertos': _cache_empresas['acertos'],
+        'falhas': _cache_empresas['falhas'],
+        'empresas': len(_cache_empresas['por_id']),
+    }
+
+
+def cadastrar_empresa(nome: str, cnpj: Optional[str] = None) -> int:
+    """Cadastra uma nova empresa e retorna o ID."""
+    with transacao() as conn:
+        cursor = conn.execute(
+            'INSERT INTO empresas (nome, cnpj) VALUES (?, ?)',
+            (nome.upper(), cnpj)
+        )
+    invalidar_cache_empresas()
+    return cursor.lastrowid
 
-    rows = cursor.fetchall()
-    conn.close()
 
-    return [Empresa(
-        id=row['id'],
-        nome=row['nome'],
-        cnpj=row['cnpj'],
-        ativo=bool(row['ativo']),
-        criado_em=row['criado_em']
-    ) for row in rows]
+def listar_empresas(apenas_ativas: bool = True) -> List[Empresa]:
+    """Lista todas as empresas cadastradas, em ordem alfabética."""
+    ordenadas = _empresas_em_cache()['ordenadas']
+    if apenas_ativas:
+        return [empresa for empresa in ordenadas if empresa.ativo]
+    return list(ordenadas)
 
 
 def buscar_empresa(empresa_id: int) -> Optional[Empresa]:
     """Busca uma empresa pelo ID."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute('SELECT * FROM empresas WHERE id = ?', (empresa_id,))
-    row = cursor.fetchone()
-    conn.close()
+    return _empresas_em_cache()['por_id'].get(empresa_id)
 
-    if row:
-        return Empresa(
-            id=row['id'],
-            nome=row['nome'],
-            cnpj=row['cnpj'],
-            ativo=bool(row['ativo']),
-            criado_em=row['criado_em']
-        )
-    return None
+
+def buscar_empresa_por_nome(nome: str) -> Optional[Empresa]:
+    """Busca uma empresa pelo nome exato (sem diferenciar maiúsculas)."""
+    cache = _empresas_em_cache()
+    empresa_id = cache['por_nome'].get(nome.strip().upper())
+    return cache['por_id'].get(empresa_id)
+
+
+def pesquisar_empresas(termo: str, limite: int = 10,
+                       apenas_ativas: bool = True) -> List[Empresa]:
+    """
+    Busca empresas por trecho do nome ou do CNPJ, para seleção rápida.
+
+    Ordem do resultado: CNPJ começando pelos dígitos digitados, nomes
+    começando pelo termo (índice NOCASE) e, por fim, nomes que contêm o
+    termo (FTS5 trigram quando disponível; senão, varredura do cache).
+    """
+    # Nomes são gravados em maiúsculas; LIKE/NOCASE só ignoram caixa em ASCII
+    termo = termo.strip().replace('%', '').replace('_', '').upper()
+    if not termo:
+        return []
+
+    conn = get_connection()
+    cache = _empresas_em_cache()
+    por_id = cache['por_id']
+    encontrados = []
+
+    def incluir(ids):
+        for empresa_id in ids:
+            if len(encontrados) >= limite:
+                break
+            if empresa_id not in encontrados and empresa_id in por_id:
+                encontrados.append(empresa_id)
+
+    digitos = re.sub(r'\D', '', termo)
+    if len(digitos) >= 2 and not re.search(r'[A-Z]', termo):
+        # ':' é o primeiro caractere depois de '9': intervalo = prefixo
+        incluir(row[0] for row in conn.execute(f'''
+            SELECT id FROM empresas
+            WHERE {CNPJ_NORMALIZADO} >= ? AND {CNPJ_NORMALIZADO} < ?
+              AND (ativo = 1 OR ?)
+            LIMIT ?
+        ''', (digitos, digitos + ':', not apenas_ativas, limite)))
+
+    if len(encontrados) < limite:
+        incluir(row[0] for row in conn.execute('''
+            SELECT id FROM empresas
+            WHERE nome LIKE ? AND (ativo = 1 OR ?)
+            ORDER BY nome COLLATE NOCASE
+            LIMIT ?
+        ''', (termo + '%', not apenas_ativas, limite)))
+
+    if len(encontrados) < limite:
+        if len(termo) >= 3 and existe_tabela('empresas_fts'):
+            # Trigram só indexa trechos de 3+ caracteres; CROSS JOIN fixa o
+            # FTS como tabela externa (as correspondências guiam a junção)
+            incluir(row[0] for row in conn.execute('''
+                SELECT e.id FROM empresas_fts f
+                CROSS JOIN empresas e ON e.id = f.rowid
+                WHERE empresas_fts MATCH ? AND (e.ativo = 1 OR ?)
+                ORDER BY e.nome
+                LIMIT ?
+            ''', ('"' + termo.replace('"', '""') + '"', not apenas_ativas,
+                  limite + len(encontrados))))
+        else:
+            incluir(empresa.id for empresa in cache['ordenadas']
+                    if termo in empresa.nome.upper()
+                    and (empresa.ativo or not apenas_ativas))
+
+    return [por_id[empresa_id] for empresa_id in encontrados[:limite]]
 
 
 def desativar_empresa(empresa_id: int) -> bool:
     """Desativa uma empresa (não exclui do banco)."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute('UPDATE empresas SET ativo = 0 WHERE id = ?', (empresa_id,))
-    conn.commit()
-    affected = cursor.rowcount
-    conn.close()
-    return affected > 0
+    with transacao() as conn:
+        cursor = conn.execute('UPDATE empresas SET ativo = 0 WHERE id = ?', (empresa_id,))
+    invalidar_cache_empresas()
+    return cursor.rowcount > 0
 
 
 # ==================== OPERAÇÕES ====================
@@ -99,36 +210,56 @@ def registrar_operacao(
 
     data_vencimento = data_operacao + timedelta(days=prazo_dias)
 
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute('''
-        INSERT INTO operacoes
-        (tipo, empresa_id, descricao, valor, prazo_dias, data_operacao, data_vencimento, observacao)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-    ''', (tipo, empresa_id, descricao, valor, prazo_dias,
-          data_operacao.isoformat(), data_vencimento.isoformat(), observacao))
+    with transacao() as conn:
+        cursor = conn.execute('''
+            INSERT INTO operacoes
+            (tipo, empresa_id, descricao, valor, prazo_dias, data_operacao, data_vencimento, observacao)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', (tipo, empresa_id, descricao, valor, prazo_dias,
+              data_operacao.isoformat(), data_vencimento.isoformat(), observacao))
+    return cursor.lastrowid
 
-    conn.commit()
-    operacao_id = cursor.lastrowid
-    conn.close()
-    return operacao_id
 
+_SELECT_OPERACAO = '''
+    SELECT {colunas}, e.nome as empresa_nome
+    FROM {tabela} o
+    JOIN empresas e ON o.empresa_id = e.id
+'''
 
-def listar_operacoes(
-    status: Optional[str] = None,
-    tipo: Optional[str] = None,
-    empresa_id: Optional[int] = None
-) -> List[Operacao]:
-    """Lista operações com filtros opcionais."""
-    conn = get_connection()
-    cursor = conn.cursor()
+# Nome de visão (models.VISOES_OPERACAO) ou conjunto de colunas
+Visao = Union[str, Iterable[str]]
+
+
+# Colunas lidas em qualquer visão (chave e ordenação da paginação)
+_OBRIGATORIAS_OPERACAO = ('id', 'data_vencimento')
 
-    query = '''
-        SELECT o.*, e.nome as empresa_nome
-        FROM operacoes o
-        JOIN empresas e ON o.empresa_id = e.id
-        WHERE 1=1
-    '''
+
+def _select_operacao(historico: bool = False, visao: Visao = VISAO_DETALHE) -> str:
+    """
+    SELECT das operações com as colunas da visão (as demais vêm NULL);
+    com historico=True inclui as do arquivo morto.
+    """
+    colunas = colunas_da_visao('o', COLUNAS_OPERACAO, VISOES_OPERACAO, visao,
+                               obrigatorias=_OBRIGATORIAS_OPERACAO)
+    return _SELECT_OPERACAO.format(colunas=', '.join(colunas),
+                                   tabela=tabela_historico('operacoes', historico))
+
+
+def _nao_lidas_operacao(visao: Visao) -> tuple:
+    """Posições que operacao_de_linha marca NAO_LIDO para a visão."""
+    return posicoes_nao_lidas(COLUNAS_OPERACAO, VISOES_OPERACAO, visao,
+                              obrigatorias=_OBRIGATORIAS_OPERACAO)
+
+
+def _filtros_operacao(
+    status: Optional[str],
+    tipo: Optional[str],
+    empresa_id: Optional[int],
+    vencimento_antes: Optional[date],
+    empresa_nome: Optional[str] = None
+) -> Tuple[str, list]:
+    """Monta a cláusula WHERE e os parâmetros das listagens de operações."""
+    query = ' WHERE 1=1'
     params = []
 
     if status:
@@ -143,58 +274,111 @@ def listar_operacoes(
         query += ' AND o.empresa_id = ?'
         params.append(empresa_id)
 
-    query += ' ORDER BY o.data_vencimento'
-
-    cursor.execute(query, params)
-    rows = cursor.fetchall()
-    conn.close()
-
-    return [Operacao(
-        id=row['id'],
-        tipo=row['tipo'],
-        empresa_id=row['empresa_id'],
-        descricao=row['descricao'],
-        valor=row['valor'],
-        prazo_dias=row['prazo_dias'],
-        data_operacao=row['data_operacao'],
-        data_vencimento=row['data_vencimento'],
-        data_liquidacao=row['data_liquidacao'],
-        status=row['status'],
-        observacao=row['observacao'],
-        criado_em=row['criado_em'],
-        empresa_nome=row['empresa_nome']
-    ) for row in rows]
-
-
-def buscar_operacao(operacao_id: int) -> Optional[Operacao]:
-    """Busca uma operação pelo ID."""
+    if vencimento_antes:
+        query += ' AND o.data_vencimento < ?'
+        params.append(vencimento_antes.isoformat())
+
+    if empresa_nome:
+        query += ' AND e.nome LIKE ?'
+        params.append(f'%{empresa_nome}%')
+
+    return query, params
+
+
+def iterar_operacoes(
+    status: Optional[str] = None,
+    tipo: Optional[str] = None,
+    empresa_id: Optional[int] = None,
+    vencimento_antes: Optional[date] = None,
+    lote: int = TAMANHO_LOTE,
+    empresa_nome: Optional[str] = None,
+    historico: bool = False,
+    visao: Visao = VISAO_DETALHE
+) -> Iterator[Operacao]:
+    """
+    Percorre as operações filtradas em ordem de vencimento, lendo
+    `lote` linhas por vez do banco (memória constante). Com
+    historico=True inclui as operações arquivadas; visao=VISAO_LISTA
+    lê só as colunas das listagens (as demais valem NAO_LIDO).
+    """
+    where, params = _filtros_operacao(status, tipo, empresa_id, vencimento_antes,
+                                      empresa_nome)
+    nao_lidas = _nao_lidas_operacao(visao)
+    cursor = get_connection().execute(
+        _select_operacao(historico, visao) + where + ' ORDER BY o.data_vencimento, o.id',
+        params
+    )
+    while True:
+        rows = cursor.fetchmany(lote)
+        if not rows:
+            break
+        for row in rows:
+            yield operacao_de_linha(row, nao_lidas)
+
+
+def paginar_operacoes(
+    status: Optional[str] = None,
+    tipo: Optional[str] = None,
+    empresa_id: Optional[int] = None,
+    vencimento_antes: Optional[date] = None,
+    limite: int = TAMANHO_PAGINA,
+    apos: Optional[tuple] = None,
+    empresa_nome: Optional[str] = None,
+    historico: bool = False,
+    visao: Visao = VISAO_DETALHE
+) -> Pagina:
+    """
+    Retorna uma página de operações em ordem de vencimento.
+
+    Paginação por chave (keyset): `apos` é o token (data_vencimento, id)
+    devolvido em `Pagina.proximo` pela página anterior; (data, 0) começa
+    na primeira operação com vencimento >= data. O custo de cada página
+    independe de quantas páginas vieram antes. `empresa_nome` filtra por
+    trecho do nome da empresa; historico=True inclui as arquivadas e
+    `visao` escolhe as colunas lidas (ver iterar_operacoes).
+    """
+    where, params = _filtros_operacao(status, tipo, empresa_id, vencimento_antes,
+                                      empresa_nome)
+    if apos:
+        where += ' AND (o.data_vencimento, o.id) > (?, ?)'
+        params.extend(apos)
+
+    rows = get_connection().execute(
+        _select_operacao(historico, visao) + where
+        + ' ORDER BY o.data_vencimento, o.id LIMIT ?',
+        params + [limite + 1]
+    ).fetchall()
+
+    nao_lidas = _nao_lidas_operacao(visao)
+    itens = [operacao_de_linha(row, nao_lidas) for row in rows[:limite]]
+    proximo = None
+    if len(rows) > limite:
+        ultimo = itens[-1]
+        proximo = (ultimo.data_vencimento, ultimo.id)
+    return Pagina(itens=itens, proximo=proximo)
+
+
+def listar_operacoes(
+    status: Optional[str] = None,
+    tipo: Optional[str] = None,
+    empresa_id: Optional[int] = None,
+    historico: bool = False,
+    visao: Visao = VISAO_DETALHE
+) -> List[Operacao]:
+    """Lista operações com filtros opcionais."""
+    return list(iterar_operacoes(status=status, tipo=tipo, empresa_id=empresa_id,
+                                 historico=historico, visao=visao))
+
+
+def buscar_operacao(operacao_id: int, historico: bool = False) -> Optional[Operacao]:
+    """Busca uma operação pelo ID (com historico=True, também no arquivo morto)."""
     conn = get_connection()
     cursor = conn.cursor()
-    cursor.execute('''
-        SELECT o.*, e.nome as empresa_nome
-        FROM operacoes o
-        JOIN empresas e ON o.empresa_id = e.id
-        WHERE o.id = ?
-    ''', (operacao_id,))
+    cursor.execute(_select_operacao(historico) + ' WHERE o.id = ?', (operacao_id,))
     row = cursor.fetchone()
-    conn.close()
 
     if row:
-        return Operacao(
-            id=row['id'],
-            tipo=row['tipo'],
-            empresa_id=row['empresa_id'],
-            descricao=row['descricao'],
-            valor=row['valor'],
-            prazo_dias=row['prazo_dias'],
-            data_operacao=row['data_operacao'],
-            data_vencimento=row['data_vencimento'],
-            data_liquidacao=row['data_liquidacao'],
-            status=row['status'],
-            observacao=row['observacao'],
-            criado_em=row['criado_em'],
-            empresa_nome=row['empresa_nome']
-        )
+        return operacao_de_linha(row)
     return None
 
 
@@ -203,29 +387,126 @@ def liquidar_operacao(operacao_id: int, data_liquidacao: Optional[date] = None)
     if data_liquidacao is None:
         data_liquidacao = date.today()
 
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute('''
-        UPDATE operacoes
-        SET status = 'LIQUIDADO', data_liquidacao = ?
-        WHERE id = ? AND status = 'ABERTO'
-    ''', (data_liquidacao.isoformat(), operacao_id))
-    conn.commit()
-    affected = cursor.rowcount
-    conn.close()
-    return affected > 0
+    with transacao() as conn:
+        cursor = conn.execute('''
+            UPDATE operacoes
+            SET status = 'LIQUIDADO', data_liquidacao = ?
+            WHERE id = ? AND status = 'ABERTO'
+        ''', (data_liquidacao.isoformat(), operacao_id))
+    return cursor.rowcount > 0
 
 
 def cancelar_operacao(operacao_id: int) -> bool:
     """Cancela uma operação aberta."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute('''
-        UPDATE operacoes
-        SET status = 'CANCELADO'
-        WHERE id = ? AND status = 'ABERTO'
-    ''', (operacao_id,))
-    conn.commit()
-    affected = cursor.rowcount
-    conn.close()
-    return affected > 0
+    with transacao() as conn:
+        cursor = conn.execute('''
+            UPDATE operacoes
+            SET status = 'CANCELADO'
+            WHERE id = ? AND status = 'ABERTO'
+        ''', (operacao_id,))
+    return cursor.rowcount > 0
+
+
+# ==================== OPERAÇÕES EM LOTE ====================
+
+# Resultado por id de liquidar_operacoes/cancelar_operacoes. Além destes,
+# o resultado pode ser o status atual da operação que não estava aberta
+# ('LIQUIDADO' ou 'CANCELADO').
+RESULTADO_OK = 'OK'
+RESULTADO_INEXISTENTE = 'INEXISTENTE'
+
+
+def _linhas_por_ids(conn, sql: str, params: list, ids: List[int]) -> list:
+    """Executa `sql` + ' AND o.id IN (...)' em lotes de TAMANHO_LOTE_IN ids."""
+    linhas = []
+    for inicio in range(0, len(ids), TAMANHO_LOTE_IN):
+        lote = ids[inicio:inicio + TAMANHO_LOTE_IN]
+        marcadores = ', '.join('?' * len(lote))
+        linhas.extend(conn.execute(f'{sql} AND o.id IN ({marcadores})', params + lote))
+    return linhas
+
+
+def _alterar_abertas(atribuicoes: str, valores: list,
+                     operacao_ids: Optional[Iterable[int]],
+                     tipo: Optional[str], empresa_id: Optional[int],
+                     vencimento_antes: Optional[date]) -> Dict[int, str]:
+    """
+    Aplica `SET atribuicoes` às operações abertas escolhidas por ids e/ou
+    filtros com um único UPDATE ... RETURNING, numa transação. Os ids vão
+    como um array JSON (json_each), então a quantidade não muda o SQL.
+    Sem RETURNING (SQLite < 3.35) os ids são selecionados em lotes de IN
+    (...) e atualizados com executemany, na mesma transação.
+    """
+    if operacao_ids is None and not (tipo or empresa_id or vencimento_antes):
+        raise ValueError("Informe os ids ou ao menos um filtro")
+
+    where, params = _filtros_operacao('ABERTO', tipo, empresa_id, vencimento_antes)
+    ids = None
+    if operacao_ids is not None:
+        ids = list(dict.fromkeys(operacao_ids))
+        if not ids:
+            return {}
+
+    with transacao() as conn:
+        if not SUPORTA_RETURNING:
+            selecao = 'SELECT o.id FROM operacoes o' + where
+            linhas = (conn.execute(selecao, params) if ids is None
+                      else _linhas_por_ids(conn, selecao, params, ids))
+            alteradas = [row[0] for row in linhas]
+            conn.executemany(f'UPDATE operacoes SET {atribuicoes} WHERE id = ?',
+                             [valores + [operacao_id] for operacao_id in alteradas])
+        else:
+            if ids is not None:
+                where += ' AND o.id IN (SELECT value FROM json_each(?))'
+                params.append(json.dumps(ids))
+            alteradas = [row[0] for row in conn.execute(
+                f'UPDATE operacoes AS o SET {atribuicoes}{where} RETURNING id',
+                valores + params)]
+        if ids is None:
+            return {operacao_id: RESULTADO_OK for operacao_id in sorted(alteradas)}
+
+        # Motivo dos ids que ficaram de fora: inexistentes ou já encerrados
+        resultado = dict.fromkeys(ids, RESULTADO_INEXISTENTE)
+        resultado.update(dict.fromkeys(alteradas, RESULTADO_OK))
+        restantes = [i for i in ids if resultado[i] != RESULTADO_OK]
+        if restantes and not SUPORTA_RETURNING:
+            for row in _linhas_por_ids(conn, 'SELECT o.id, o.status FROM operacoes o WHERE 1=1',
+                                       [], restantes):
+                resultado[row[0]] = row[1]
+        elif restantes:
+            for row in conn.execute(
+                    'SELECT id, status FROM operacoes '
+                    'WHERE id IN (SELECT value FROM json_each(?))',
+                    (json.dumps(restantes),)):
+                resultado[row[0]] = row[1]
+    return resultado
+
+
+def liquidar_operacoes(operacao_ids: Optional[Iterable[int]] = None,
+                       data_liquidacao: Optional[date] = None,
+                       tipo: Optional[str] = None,
+                       empresa_id: Optional[int] = None,
+                       vencimento_antes: Optional[date] = None) -> Dict[int, str]:
+    """
+    Liquida de uma vez as operações abertas indicadas por `operacao_ids`
+    e/ou pelos filtros (ex.: todas as VENDA abertas da empresa X com
+    vencimento antes de D). Tudo ocorre numa única transação.
+
+    Retorna {id: resultado}: RESULTADO_OK para as liquidadas e, para os ids
+    informados que não foram alterados, RESULTADO_INEXISTENTE ou o status
+    atual da operação. Sem ids nem filtros levanta ValueError.
+    """
+    if data_liquidacao is None:
+        data_liquidacao = date.today()
+    return _alterar_abertas("status = 'LIQUIDADO', data_liquidacao = ?",
+                            [data_liquidacao.isoformat()],
+                            operacao_ids, tipo, empresa_id, vencimento_antes)
+
+
+def cancelar_operacoes(operacao_ids: Optional[Iterable[int]] = None,
+                       tipo: Optional[str] = None,
+                       empresa_id: Optional[int] = None,
+                       vencimento_antes: Optional[date] = None) -> Dict[int, str]:
+    """Cancela em lote as operações abertas; mesmos critérios e retorno de liquidar_operacoes."""
+    return _alterar_abertas("status = 'CANCELADO'", [],
+                            operacao_ids, tipo, empresa_id, vencimento_antes)
@@ -3,10 +3,17 @@ Serviço de pedidos do ERP.
 Gerencia cadastro, consulta e baixa de pedidos com itens.
 """
 from datetime import date, datetime
-from typing import Optional, List
+from typing import Optional, List, Dict, Iterator, Iterable, Tuple, Union
 
-from database import get_connection
-from models import Pedido, ItemPedido
+from database import (
+    get_connection, transacao, tabela_historico, anexar_arquivo, verificar_agregado,
+    RECALCULAR_TOTAIS_PEDIDOS
+)
+from models import (
+    Pedido, ItemPedido, ItensSobDemanda, Pagina,
+    COLUNAS_PEDIDO, COLUNAS_ITEM_PEDIDO, VISOES_PEDIDO, VISAO_DETALHE,
+    colunas_da_visao, posicoes_nao_lidas, pedido_de_linha, item_pedido_de_linha
+)
 
 # Pesos padrão por tipo de embalagem (kg por unidade)
 PESO_POR_EMBALAGEM = {
@@ -16,6 +23,15 @@ PESO_POR_EMBALAGEM = {
     "FARDO_10x1": 10.0,   # 10 pacotes de 1kg
 }
 
+# Máximo de ids por consulta IN (...); abaixo do limite antigo de 999 variáveis
+TAMANHO_LOTE_IN = 500
+
+# Pedidos lidos do cursor por vez nas listagens em streaming
+TAMANHO_LOTE = 500
+
+# Pedidos por página nas listagens paginadas
+TAMANHO_PAGINA = 50
+
 LABEL_EMBALAGEM = {
     "AGRANEL":    "A Granel (kg)",
     "BAG":        "Big Bag",
@@ -34,43 +50,40 @@ def calcular_item(tipo_embalagem: str, quantidade: float,
     return {"peso_kg": peso_kg, "valor_total": valor_total}
 
 
-def cadastrar_pedido(empresa_id: int, prazo_dias: int,
-                     data_prevista_entrega: Optional[date],
-                     observacao: Optional[str] = None) -> int:
-    """Cria um novo pedido e retorna seu ID."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute('''
-        INSERT INTO pedidos
-            (empresa_id, data_pedido, prazo_dias, data_prevista_entrega, observacao)
-        VALUES (?, ?, ?, ?, ?)
-    ''', (
+_INSERT_PEDIDO = '''
+    INSERT INTO pedidos
+        (empresa_id, data_pedido, prazo_dias, data_prevista_entrega, observacao)
+    VALUES (?, ?, ?, ?, ?)
+'''
+
+_INSERT_ITEM = '''
+    INSERT INTO itens_pedido
+        (pedido_id, tipo_embalagem, quantidade, peso_por_unidade,
+         peso_kg, preco_unitario, icms, valor_total)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+
+def _params_pedido(empresa_id: int, prazo_dias: int,
+                   data_prevista_entrega: Optional[date],
+                   observacao: Optional[str]) -> tuple:
+    """Parâmetros de _INSERT_PEDIDO."""
+    return (
         empresa_id,
         date.today().isoformat(),
         prazo_dias,
         data_prevista_entrega.isoformat() if data_prevista_entrega else None,
         observacao,
-    ))
-    pedido_id = cursor.lastrowid
-    conn.commit()
-    conn.close()
-    return pedido_id
+    )
 
 
-def adicionar_item_pedido(pedido_id: int, tipo_embalagem: str,
-                          quantidade: float, peso_por_unidade: float,
-                          preco_unitario: float, icms: bool) -> int:
-    """Adiciona um item a um pedido existente e retorna o ID do item."""
+def _params_item(pedido_id: int, tipo_embalagem: str,
+                 quantidade: float, peso_por_unidade: float,
+                 preco_unitario: float, icms: bool) -> tuple:
+    """Calcula o item e retorna os parâmetros de _INSERT_ITEM."""
     calc = calcular_item(tipo_embalagem, quantidade, peso_por_unidade,
                          preco_unitario, icms)
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute('''
-        INSERT INTO itens_pedido
-            (pedido_id, tipo_embalagem, quantidade, peso_por_unidade,
-             peso_kg, preco_unitario, icms, valor_total)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-    ''', (
+    return (
         pedido_id,
         tipo_embalagem,
         quantidade,
@@ -79,139 +92,312 @@ def adicionar_item_pedido(pedido_id: int, tipo_embalagem: str,
         preco_unitario,
         1 if icms else 0,
         calc["valor_total"],
-    ))
-    item_id = cursor.lastrowid
-    conn.commit()
-    conn.close()
-    return item_id
-
-
-def _montar_pedido(row, itens_rows) -> Pedido:
-    """Constrói um objeto Pedido a partir das linhas do banco."""
-    itens = []
-    peso_total = 0.0
-    valor_total = 0.0
-    for i in itens_rows:
-        item = ItemPedido(
-            id=i["id"],
-            pedido_id=i["pedido_id"],
-            tipo_embalagem=i["tipo_embalagem"],
-            quantidade=i["quantidade"],
-            peso_por_unidade=i["peso_por_unidade"],
-            peso_kg=i["peso_kg"],
-            preco_unitario=i["preco_unitario"],
-            icms=bool(i["icms"]),
-            valor_total=i["valor_total"],
-        )
-        itens.append(item)
-        peso_total += item.peso_kg
-        valor_total += item.valor_total
-
-    return Pedido(
-        id=row["id"],
-        empresa_id=row["empresa_id"],
-        empresa_nome=row["empresa_nome"],
-        data_pedido=row["data_pedido"],
-        prazo_dias=row["prazo_dias"],
-        data_prevista_entrega=row["data_prevista_entrega"],
-        status=row["status"],
-        placa=row["placa"],
-        data_baixa=row["data_baixa"],
-        observacao=row["observacao"],
-        criado_em=row["criado_em"],
-        itens=itens,
-        peso_total_kg=peso_total,
-        valor_total=valor_total,
     )
 
 
-def listar_pedidos(empresa_id: Optional[int] = None,
-                   status: Optional[str] = None) -> List[Pedido]:
-    """Lista pedidos com filtros opcionais."""
-    conn = get_connection()
-    cursor = conn.cursor()
+def cadastrar_pedido(empresa_id: int, prazo_dias: int,
+                     data_prevista_entrega: Optional[date],
+                     observacao: Optional[str] = None) -> int:
+    """Cria um novo pedido e retorna seu ID."""
+    with transacao() as conn:
+        cursor = conn.execute(_INSERT_PEDIDO, _params_pedido(
+            empresa_id, prazo_dias, data_prevista_entrega, observacao))
+    return cursor.lastrowid
 
-    query = '''
-        SELECT p.*, e.nome AS empresa_nome
-        FROM pedidos p
-        JOIN empresas e ON e.id = p.empresa_id
-        WHERE 1=1
-    '''
+
+def adicionar_item_pedido(pedido_id: int, tipo_embalagem: str,
+                          quantidade: float, peso_por_unidade: float,
+                          preco_unitario: float, icms: bool) -> int:
+    """Adiciona um item a um pedido existente e retorna o ID do item."""
+    with transacao() as conn:
+        cursor = conn.execute(_INSERT_ITEM, _params_item(
+            pedido_id, tipo_embalagem, quantidade, peso_por_unidade,
+            preco_unitario, icms))
+    return cursor.lastrowid
+
+
+def criar_pedido_completo(empresa_id: int, prazo_dias: int,
+                          data_prevista_entrega: Optional[date],
+                          itens: Iterable[dict],
+                          observacao: Optional[str] = None) -> int:
+    """
+    Cria o pedido e todos os seus itens numa única transação e retorna o ID.
+
+    Cada item é um dict com as chaves tipo_embalagem, quantidade,
+    peso_por_unidade, preco_unitario e icms (os argumentos de
+    adicionar_item_pedido). Se qualquer item falhar, nada é gravado.
+    """
+    with transacao() as conn:
+        cursor = conn.execute(_INSERT_PEDIDO, _params_pedido(
+            empresa_id, prazo_dias, data_prevista_entrega, observacao))
+        pedido_id = cursor.lastrowid
+        conn.executemany(_INSERT_ITEM, [
+            _params_item(
+                pedido_id, item["tipo_embalagem"], item["quantidade"],
+                item["peso_por_unidade"], item["preco_unitario"], item["icms"])
+            for item in itens
+        ])
+    return pedido_id
+
+
+# Nome de visão (models.VISOES_PEDIDO) ou conjunto de colunas
+Visao = Union[str, Iterable[str]]
+
+
+def _colunas_select_pedido(visao: Visao = VISAO_DETALHE) -> str:
+    """
+    Colunas do cabeçalho na ordem de models.pedido_de_linha (as que a
+    visão não lê vêm NULL), seguidas dos totais gravados (mantidos pelos
+    triggers de itens_pedido).
+    """
+    colunas = colunas_da_visao('p', COLUNAS_PEDIDO, VISOES_PEDIDO, visao)
+    colunas.insert(2, "e.nome AS empresa_nome")
+    return ", ".join(colunas + ["p.peso_total_kg", "p.valor_total"])
+
+_SELECT_ITENS = f"SELECT {', '.join(COLUNAS_ITEM_PEDIDO)} FROM {{tabela}}"
+
+
+def _montar_pedido(row, itens: Optional[List[ItemPedido]] = None,
+                   nao_lidas: Tuple[int, ...] = ()) -> Pedido:
+    """
+    Constrói um Pedido a partir da linha do cabeçalho (com os totais
+    gravados) e seus itens; sem itens, só cabeçalho e totais. `nao_lidas`:
+    colunas fora da visão (NAO_LIDO).
+    """
+    return pedido_de_linha(row, itens, row["peso_total_kg"], row["valor_total"], nao_lidas)
+
+
+def _select_itens(historico: bool = False) -> str:
+    return _SELECT_ITENS.format(tabela=tabela_historico('itens_pedido', historico))
+
+
+def _buscar_itens(cursor, pedido_ids: List[int],
+                  historico: bool = False) -> Dict[int, List[ItemPedido]]:
+    """
+    Busca os itens de vários pedidos com consultas IN (...) em lotes
+    e agrupa os itens por pedido_id numa única passada.
+    """
+    select_itens = _select_itens(historico)
+    itens_por_pedido = {pedido_id: [] for pedido_id in pedido_ids}
+    for inicio in range(0, len(pedido_ids), TAMANHO_LOTE_IN):
+        lote = pedido_ids[inicio:inicio + TAMANHO_LOTE_IN]
+        marcadores = ", ".join("?" * len(lote))
+        cursor.execute(f"{select_itens} WHERE pedido_id IN ({marcadores})", lote)
+        for row in cursor.fetchall():
+            item = item_pedido_de_linha(row)
+            itens_por_pedido[item.pedido_id].append(item)
+    return itens_por_pedido
+
+
+class _LoteItens:
+    """
+    Carregador dos itens de um lote de pedidos da mesma consulta: o
+    primeiro acesso a Pedido.itens de qualquer um deles busca os itens de
+    todos (ver _buscar_itens); lotes nunca acessados não leem itens.
+    """
+
+    def __init__(self, pedido_ids: List[int], historico: bool = False):
+        self._pedido_ids = pedido_ids
+        self._historico = historico
+        self._itens: Optional[Dict[int, List[ItemPedido]]] = None
+
+    def itens(self, pedido_id: int) -> List[ItemPedido]:
+        if self._itens is None:
+            self._itens = _buscar_itens(get_connection().cursor(),
+                                        self._pedido_ids, self._historico)
+        # Cada pedido guarda a própria lista; o lote não precisa mais dela
+        return self._itens.pop(pedido_id, [])
+
+
+def _consulta_pedidos(empresa_id: Optional[int], status: Optional[str],
+                      antes_de: Optional[int] = None,
+                      empresa_nome: Optional[str] = None,
+                      historico: bool = False,
+                      visao: Visao = VISAO_DETALHE) -> Tuple[str, list]:
+    """
+    Monta o SELECT das listagens de pedidos, ordenado por id decrescente.
+    CROSS JOIN mantém pedidos no laço externo (percorrido na ordem do id):
+    com o histórico, o ramo do arquivo morto começaria por empresas e
+    ordenaria o resultado em B-tree temporária.
+    """
+    pedidos = tabela_historico('pedidos', historico)
+    filtros = ""
     params = []
     if empresa_id:
-        query += " AND p.empresa_id = ?"
+        filtros += " AND p.empresa_id = ?"
         params.append(empresa_id)
     if status:
-        query += " AND p.status = ?"
+        filtros += " AND p.status = ?"
         params.append(status)
-    query += " ORDER BY p.id DESC"
+    if antes_de:
+        filtros += " AND p.id < ?"
+        params.append(antes_de)
+    if empresa_nome:
+        filtros += " AND e.nome LIKE ?"
+        params.append(f"%{empresa_nome}%")
 
-    cursor.execute(query, params)
-    pedido_rows = cursor.fetchall()
+    query = f'''
+        SELECT {_colunas_select_pedido(visao)}
+        FROM {pedidos} p
+        CROSS JOIN empresas e ON e.id = p.empresa_id
+        WHERE 1=1 {filtros}
+        ORDER BY p.id DESC
+    '''
+    return query, params
 
-    pedidos = []
-    for row in pedido_rows:
-        cursor.execute(
-            "SELECT * FROM itens_pedido WHERE pedido_id = ?", (row["id"],)
-        )
-        itens_rows = cursor.fetchall()
-        pedidos.append(_montar_pedido(row, itens_rows))
 
-    conn.close()
-    return pedidos
+def _montar_lote(rows, apenas_totais: bool, historico: bool = False,
+                 visao: Visao = VISAO_DETALHE) -> List[Pedido]:
+    """
+    Monta os pedidos de um lote de linhas lidas com `visao`. Os itens são
+    lidos no primeiro acesso a .itens, de uma vez para o lote inteiro.
+    """
+    nao_lidas = posicoes_nao_lidas(COLUNAS_PEDIDO, VISOES_PEDIDO, visao)
+    if apenas_totais:
+        return [_montar_pedido(row, nao_lidas=nao_lidas) for row in rows]
+    lote = _LoteItens([row["id"] for row in rows], historico)
+    return [_montar_pedido(row, ItensSobDemanda(carregar=lote.itens, pedido_id=row["id"]),
+                           nao_lidas)
+            for row in rows]
 
 
-def buscar_pedido(pedido_id: int) -> Optional[Pedido]:
-    """Busca um pedido pelo ID."""
+def iterar_pedidos(empresa_id: Optional[int] = None,
+                   status: Optional[str] = None,
+                   apenas_totais: bool = False,
+                   lote: int = TAMANHO_LOTE,
+                   historico: bool = False,
+                   visao: Visao = VISAO_DETALHE) -> Iterator[Pedido]:
+    """
+    Percorre os pedidos filtrados (mais recentes primeiro) lendo `lote`
+    pedidos por vez; os itens de cada lote vêm numa consulta só, no
+    primeiro acesso a .itens de um dos pedidos do lote.
+    Com historico=True inclui os pedidos arquivados; visao=VISAO_LISTA
+    lê só as colunas das listagens (as demais valem NAO_LIDO).
+    """
+    conn = get_connection()
+    query, params = _consulta_pedidos(empresa_id, status, historico=historico,
+                                      visao=visao)
+    cursor = conn.execute(query, params)
+    while True:
+        rows = cursor.fetchmany(lote)
+        if not rows:
+            break
+        yield from _montar_lote(rows, apenas_totais, historico, visao)
+
+
+def paginar_pedidos(empresa_id: Optional[int] = None,
+                    status: Optional[str] = None,
+                    apenas_totais: bool = False,
+                    limite: int = TAMANHO_PAGINA,
+                    apos: Optional[int] = None,
+                    empresa_nome: Optional[str] = None,
+                    historico: bool = False,
+                    visao: Visao = VISAO_DETALHE) -> Pagina:
+    """
+    Retorna uma página de pedidos (mais recentes primeiro).
+    Paginação por chave: `apos` é o id devolvido em `Pagina.proximo`
+    (a página começa no primeiro pedido com id < apos).
+    `empresa_nome` filtra por trecho do nome do cliente; historico=True
+    inclui os pedidos arquivados e `visao` escolhe as colunas lidas.
+    """
+    conn = get_connection()
+    query, params = _consulta_pedidos(empresa_id, status, antes_de=apos,
+                                      empresa_nome=empresa_nome, historico=historico,
+                                      visao=visao)
+    rows = conn.execute(query + " LIMIT ?", params + [limite + 1]).fetchall()
+
+    pedidos = _montar_lote(rows[:limite], apenas_totais, historico, visao)
+    proximo = pedidos[-1].id if len(rows) > limite else None
+    return Pagina(itens=pedidos, proximo=proximo)
+
+
+def listar_pedidos(empresa_id: Optional[int] = None,
+                   status: Optional[str] = None,
+                   apenas_totais: bool = False,
+                   historico: bool = False,
+                   visao: Visao = VISAO_DETALHE) -> List[Pedido]:
+    """
+    Lista pedidos com filtros opcionais.
+    Peso e valor totais vêm gravados no pedido; com apenas_totais=True os
+    pedidos são retornados sem a lista de itens.
+    """
+    return list(iterar_pedidos(empresa_id, status, apenas_totais, historico=historico,
+                               visao=visao))
+
+
+def buscar_pedido(pedido_id: int, historico: bool = False) -> Optional[Pedido]:
+    """Busca um pedido pelo ID (com historico=True, também no arquivo morto)."""
     conn = get_connection()
     cursor = conn.cursor()
 
-    cursor.execute('''
-        SELECT p.*, e.nome AS empresa_nome
-        FROM pedidos p
+    cursor.execute(f'''
+        SELECT {_colunas_select_pedido()}
+        FROM {tabela_historico('pedidos', historico)} p
         JOIN empresas e ON e.id = p.empresa_id
         WHERE p.id = ?
     ''', (pedido_id,))
     row = cursor.fetchone()
     if not row:
-        conn.close()
         return None
-
-    cursor.execute(
-        "SELECT * FROM itens_pedido WHERE pedido_id = ?", (pedido_id,)
-    )
-    itens_rows = cursor.fetchall()
-    pedido = _montar_pedido(row, itens_rows)
-    conn.close()
-    return pedido
+    return _montar_lote([row], apenas_totais=False, historico=historico)[0]
 
 
 def atualizar_data_entrega(pedido_id: int, nova_data: date) -> bool:
     """Atualiza a data prevista de entrega de um pedido."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        "UPDATE pedidos SET data_prevista_entrega = ? WHERE id = ?",
-        (nova_data.isoformat(), pedido_id)
-    )
-    atualizado = cursor.rowcount > 0
-    conn.commit()
-    conn.close()
-    return atualizado
+    with transacao() as conn:
+        cursor = conn.execute(
+            "UPDATE pedidos SET data_prevista_entrega = ? WHERE id = ?",
+            (nova_data.isoformat(), pedido_id)
+        )
+    return cursor.rowcount > 0
 
 
 def baixar_pedido(pedido_id: int, placa: str) -> bool:
     """Registra a baixa (carregamento) de um pedido."""
-    conn = get_connection()
-    cursor = conn.cursor()
-    cursor.execute(
-        '''UPDATE pedidos
-           SET status = 'BAIXADO', placa = ?, data_baixa = ?
-           WHERE id = ? AND status = 'ABERTO'
-        ''',
-        (placa.upper().strip(), date.today().isoformat(), pedido_id)
-    )
-    atualizado = cursor.rowcount > 0
-    conn.commit()
-    conn.close()
-    return atualizado
+    with transacao() as conn:
+        cursor = conn.execute(
+            '''UPDATE pedidos
+               SET status = 'BAIXADO', placa = ?, data_baixa = ?
+               WHERE id = ? AND status = 'ABERTO'
+            ''',
+            (placa.upper().strip(), date.today().isoformat(), pedido_id)
+        )
+    return cursor.rowcount > 0
+
+
+def verificar_totais_pedidos(corrigir: bool = False,
+                             tolerancia: float = 0.005) -> List[Dict]:
+    """
+    Soma os itens de cada pedido (banco principal e arquivo morto) e
+    compara com peso_total_kg/valor_total gravados. Retorna as divergências
+    (banco, pedido_id, totais gravados e recalculados).
+    Com corrigir=True, regrava os totais de todos os pedidos do banco
+    divergente a partir dos itens (também serve de carga inicial).
+    """
+    schemas = ['main'] + (['arquivo'] if anexar_arquivo() else [])
+
+    def divergencias(conn) -> List[Dict]:
+        encontradas = []
+        for schema in schemas:
+            encontradas.extend(dict(row) for row in conn.execute(f'''
+                SELECT ? AS banco, p.id AS pedido_id,
+                       p.peso_total_kg AS peso_gravado,
+                       COALESCE(SUM(i.peso_kg), 0) AS peso_real,
+                       p.valor_total AS valor_gravado,
+                       COALESCE(SUM(i.valor_total), 0) AS valor_real
+                FROM {schema}.pedidos p
+                LEFT JOIN {schema}.itens_pedido i ON i.pedido_id = p.id
+                GROUP BY p.id
+                HAVING peso_gravado IS NULL OR valor_gravado IS NULL
+                    OR ABS(peso_gravado - peso_real) > ?
+                    OR ABS(valor_gravado - valor_real) > ?
+                ORDER BY p.id
+            ''', (schema, tolerancia, tolerancia)))
+        return encontradas
+
+    def reconstrucao(encontradas: List[Dict]) -> List[str]:
+        # Só os bancos com divergência são regravados
+        return [RECALCULAR_TOTAIS_PEDIDOS.format(schema=banco)
+                for banco in dict.fromkeys(d['banco'] for d in encontradas)]
+
+    return verificar_agregado(divergencias, reconstrucao, corrigir)
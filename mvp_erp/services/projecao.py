@@ -0,0 +1,128 @@
+"""
+Projeção de fluxo de caixa dia a dia a partir das operações em aberto.
+
+O banco agrupa as abertas por tipo e vencimento (varredura ordenada do
+índice parcial de abertas, sem materializar operações); aqui os totais
+são distribuídos em um vetor de dias e acumulados numa única passada.
+Com NumPy instalado a distribuição/acumulação é vetorizada; sem ele,
+usa-se Python puro com o mesmo resultado.
+
+O resultado fica em cache até a tabela mudar (PRAGMA data_version para
+escritas de outras conexões, total_changes para as desta) ou o dia virar.
+"""
+from datetime import date, timedelta
+from itertools import accumulate
+from typing import Dict
+
+try:
+    import numpy as np
+except ImportError:  # opcional: sem NumPy usa o caminho em Python puro
+    np = None
+
+import database
+from database import get_connection
+
+# Horizonte padrão da projeção, em dias a partir de hoje
+DIAS_PROJECAO = 90
+
+# {(dias, usar_numpy): (chave de validade, projeção)}
+_cache = {}
+
+
+def _totais_por_vencimento(fim: date):
+    """Retorna [(tipo, data_vencimento, soma)] das abertas com vencimento até `fim`."""
+    # O índice parcial (tipo, data_vencimento, ..., valor) cobre a consulta e
+    # já entrega os grupos em ordem; sem estatísticas (antes do primeiro
+    # ANALYZE) o planejador poderia preferir idx_operacoes_status_lista, que
+    # não entrega os grupos em ordem e exige agrupar em B-tree temporária.
+    cursor = get_connection().execute('''
+        SELECT tipo, data_vencimento, SUM(valor)
+        FROM operacoes INDEXED BY idx_operacoes_abertas_tipo_lista
+        WHERE status = 'ABERTO' AND tipo IN ('COMPRA', 'VENDA')
+          AND data_vencimento <= ?
+        GROUP BY tipo, data_vencimento
+    ''', (fim.isoformat(),))
+    return cursor.fetchall()
+
+
+def _distribuir_python(linhas, hoje: date, dias: int):
+    """Soma entradas/saídas por dia (vencidas caem no dia 0)."""
+    entradas = [0.0] * dias
+    saidas = [0.0] * dias
+    ordinal_hoje = hoje.toordinal()
+    for tipo, vencimento, soma in linhas:
+        deslocamento = max(vencimento.toordinal() - ordinal_hoje, 0)
+        if tipo == 'VENDA':
+            entradas[deslocamento] += soma
+        else:
+            saidas[deslocamento] += soma
+    saldo = list(accumulate(e - s for e, s in zip(entradas, saidas)))
+    return entradas, saidas, saldo
+
+
+def _distribuir_numpy(linhas, hoje: date, dias: int):
+    """Mesmo que _distribuir_python, com bincount/cumsum do NumPy."""
+    if not linhas:
+        zeros = [0.0] * dias
+        return zeros, list(zeros), list(zeros)
+    tipos, vencimentos, somas = zip(*linhas)
+    deslocamentos = (np.array(vencimentos, dtype='datetime64[D]')
+                     - np.datetime64(hoje, 'D')).astype(np.int64)
+    np.maximum(deslocamentos, 0, out=deslocamentos)
+    somas = np.array(somas, dtype=np.float64)
+    venda = np.array(tipos) == 'VENDA'
+    entradas = np.bincount(deslocamentos[venda], somas[venda], minlength=dias)
+    saidas = np.bincount(deslocamentos[~venda], somas[~venda], minlength=dias)
+    saldo = np.cumsum(entradas - saidas)
+    return entradas.tolist(), saidas.tolist(), saldo.tolist()
+
+
+def projetar_fluxo_caixa(dias: int = DIAS_PROJECAO, usar_numpy: bool = True) -> Dict:
+    """
+    Projeta a posição de caixa para cada dia de hoje até hoje + dias - 1.
+
+    Vendas abertas entram e compras abertas saem na data de vencimento;
+    as já vencidas são consideradas no dia de hoje. Retorna um dict com:
+    - datas, entradas, saidas, saldo: tuplas com um valor por dia
+      (saldo é o acumulado de entradas - saídas)
+    - saldo_final, menor_saldo, data_menor_saldo
+    - vencimentos_invalidos: textos de data_vencimento que não são datas
+      (o conversor do banco os devolve como str); essas operações ficam
+      fora da projeção em vez de derrubá-la
+    """
+    if dias < 1:
+        raise ValueError("A projeção deve ter ao menos 1 dia")
+    usar_numpy = usar_numpy and np is not None
+
+    conn = get_connection()
+    hoje = date.today()
+    versao = conn.execute('PRAGMA data_version').fetchone()[0]
+    validade = (database.geracao_conexao(), versao, conn.total_changes, hoje)
+    em_cache = _cache.get((dias, usar_numpy))
+    if em_cache and em_cache[0] == validade:
+        return em_cache[1]
+
+    linhas = []
+    invalidos = set()
+    for linha in _totais_por_vencimento(hoje + timedelta(days=dias - 1)):
+        if isinstance(linha[1], date):
+            linhas.append(linha)
+        else:
+            invalidos.add(linha[1])
+    distribuir = _distribuir_numpy if usar_numpy else _distribuir_python
+    entradas, saidas, saldo = distribuir(linhas, hoje, dias)
+
+    menor = min(range(dias), key=saldo.__getitem__)
+    datas = tuple(hoje + timedelta(days=i) for i in range(dias))
+    projecao = {
+        'datas': datas,
+        'entradas': tuple(entradas),
+        'saidas': tuple(saidas),
+        'saldo': tuple(saldo),
+        'saldo_final': saldo[-1],
+        'menor_saldo': saldo[menor],
+        'data_menor_saldo': datas[menor],
+        'vencimentos_invalidos': tuple(sorted(invalidos)),
+    }
+    _cache[(dias, usar_numpy)] = (validade, projecao)
+    return projecao
@@ -2,26 +2,39 @@
 Funções utilitárias para o sistema ERP.
 """
 from datetime import datetime, date
-import os
+from functools import lru_cache
+
+from utils import render
+
+# Valores formatados guardados por formatar_moeda/formatar_data: as telas
+# redesenham as mesmas páginas e as datas se repetem muito entre as linhas
+TAMANHO_CACHE_FORMATOS = 4096
 
 
 def limpar_tela():
-    """Limpa a tela do terminal."""
-    os.system('cls' if os.name == 'nt' else 'clear')
+    """Limpa a tela do terminal (sequência ANSI, sem criar processo)."""
+    render.limpar_tela()
 
 
+@lru_cache(maxsize=TAMANHO_CACHE_FORMATOS)
 def formatar_moeda(valor: float) -> str:
-    """Formata um valor como moeda brasileira."""
-    return f"R$ {valor:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+    """Formata um valor como moeda brasileira (memorizado)."""
+    # Agrupa milhares com '_' para trocar só dois caracteres
+    return f"R$ {valor:_.2f}".replace(".", ",").replace("_", ".")
 
 
+@lru_cache(maxsize=TAMANHO_CACHE_FORMATOS)
 def formatar_data(data) -> str:
-    """Formata uma data para exibição (DD/MM/AAAA)."""
+    """
+    Formata uma data para exibição (DD/MM/AAAA), memorizado. As colunas de
+    data já chegam do banco como date; texto ISO (de expressões como MIN())
+    ainda é aceito.
+    """
     if data is None:
         return "-"
     if isinstance(data, str):
         try:
-            data = datetime.strptime(data, "%Y-%m-%d").date()
+            data = date.fromisoformat(data)
         except ValueError:
             return data
     return data.strftime("%d/%m/%Y")
@@ -103,10 +116,5 @@ def pausar():
 
 
 def cabecalho(titulo: str):
-    """Exibe um cabeçalho formatado."""
-    limpar_tela()
-    largura = 50
-    print("=" * largura)
-    print(f"{titulo.center(largura)}")
-    print("=" * largura)
-    print()
+    """Limpa a tela e exibe um cabeçalho formatado, numa única escrita."""
+    render.exibir(render.moldura(titulo), limpar=True)
@@ -0,0 +1,138 @@
+"""
+Saída de tela do ERP: limpeza por sequência ANSI e tabelas montadas em
+buffer.
+
+Cada print() é uma escrita no terminal, e os consoles de máquinas antigas
+redesenham a cada uma; os.system('clear') ainda cria um processo por tela.
+Aqui a tela inteira (cabeçalho, tabela, rodapé) é montada em memória e
+enviada com uma única write(), precedida da sequência de limpeza.
+"""
+import os
+import shutil
+import sys
+from dataclasses import dataclass
+from typing import Any, Callable, Iterable, List, Optional, Sequence
+
+# Cursor no início, apaga a tela e o histórico de rolagem
+SEQUENCIA_LIMPAR = "\033[H\033[2J\033[3J"
+
+# Largura mínima de uma coluna flexível ao encolher a tabela
+LARGURA_MINIMA = 10
+
+# Separador entre colunas
+SEPARADOR = " "
+
+_terminal = {'ansi': None}   # None = ainda não verificado
+
+
+def _suporta_ansi() -> bool:
+    """Indica se a saída é um terminal que entende ANSI (verificado uma vez)."""
+    if _terminal['ansi'] is None:
+        suporta = sys.stdout.isatty() and os.environ.get("TERM") != "dumb"
+        if suporta and os.name == 'nt':
+            # Liga o processamento de sequências VT no console do Windows 10+
+            os.system('')
+        _terminal['ansi'] = suporta
+    return _terminal['ansi']
+
+
+def limpar_tela():
+    """Limpa a tela do terminal (sem efeito se a saída não é um terminal)."""
+    if _suporta_ansi():
+        sys.stdout.write(SEQUENCIA_LIMPAR)
+        sys.stdout.flush()
+
+
+def exibir(*blocos: str, limpar: bool = False):
+    """
+    Escreve os blocos de texto, um por linha, numa única write().
+    Com limpar=True a tela é limpa antes, na mesma escrita.
+    """
+    texto = "\n".join(blocos) + "\n"
+    if limpar and _suporta_ansi():
+        texto = SEQUENCIA_LIMPAR + texto
+    sys.stdout.write(texto)
+    sys.stdout.flush()
+
+
+def moldura(titulo: str, largura: int = 50) -> str:
+    """Título centralizado entre linhas de '=' (cabeçalho das telas)."""
+    return f"{'=' * largura}\n{titulo.center(largura)}\n{'=' * largura}\n"
+
+
+def largura_terminal() -> int:
+    """Colunas do terminal (80 se não for possível descobrir)."""
+    return shutil.get_terminal_size((80, 24)).columns
+
+
+@dataclass(slots=True)
+class Coluna:
+    titulo: str
+    largura: int
+    alinhamento: str = '<'   # '<' esquerda, '>' direita, '^' centro
+    # Converte o valor da célula em texto (padrão: str, None vira vazio)
+    formato: Optional[Callable[[Any], str]] = None
+    # Encolhe quando a tabela não cabe no terminal (colunas de texto longo)
+    flexivel: bool = False
+
+
+def _larguras(colunas: Sequence[Coluna], maximo: Optional[int]) -> List[int]:
+    """Larguras finais: as colunas flexíveis cedem espaço até caber em `maximo`."""
+    larguras = [c.largura for c in colunas]
+    if maximo is None:
+        return larguras
+    excesso = sum(larguras) + len(SEPARADOR) * (len(colunas) - 1) - maximo
+    for i, coluna in enumerate(colunas):
+        if excesso <= 0:
+            break
+        if coluna.flexivel:
+            reducao = min(excesso, larguras[i] - LARGURA_MINIMA)
+            if reducao > 0:
+                larguras[i] -= reducao
+                excesso -= reducao
+    return larguras
+
+
+def _texto(valor) -> str:
+    return "" if valor is None else str(valor)
+
+
+def _modelo(colunas: Sequence[Coluna], larguras: List[int]) -> str:
+    """
+    Modelo de str.format de uma linha. Textos alinhados à esquerda/centro
+    são cortados na largura (precisão do formato); à direita (números)
+    nunca: um valor maior que a coluna perde o alinhamento, não dígitos.
+    """
+    return SEPARADOR.join(
+        f"{{:{c.alinhamento}{n}}}" if c.alinhamento == '>' else f"{{:{c.alinhamento}{n}.{n}}}"
+        for c, n in zip(colunas, larguras))
+
+
+def tabela(colunas: Sequence[Coluna], linhas: Iterable[Sequence],
+           totais: Optional[Sequence] = None, recuo: str = "",
+           largura_maxima: Optional[int] = None) -> str:
+    """
+    Monta a tabela inteira num único texto: títulos, separador, uma linha
+    por sequência de valores de `linhas` e, se dado, separador e a linha de
+    `totais` (mesmas colunas; None deixa a célula vazia). `largura_maxima`
+    (padrão: largura do terminal; sem limite fora de um terminal) encolhe
+    as colunas flexíveis.
+    """
+    if largura_maxima is None and _suporta_ansi():
+        largura_maxima = largura_terminal() - len(recuo)
+    larguras = _larguras(colunas, largura_maxima)
+    modelo = _modelo(colunas, larguras).format
+    conversores = [c.formato or _texto for c in colunas]
+    separador = recuo + "-" * (sum(larguras) + len(SEPARADOR) * (len(colunas) - 1))
+
+    partes = [recuo + modelo(*[c.titulo for c in colunas]).rstrip(), separador]
+    partes.extend(
+        recuo + modelo(*[converter(v) for converter, v in zip(conversores, linha)]).rstrip()
+        for linha in linhas
+    )
+    partes.append(separador)
+    if totais is not None:
+        partes.append(recuo + modelo(*[
+            "" if v is None else converter(v)
+            for converter, v in zip(conversores, totais)]).rstrip())
+    return "\n".join(partes)